@@ -0,0 +1,323 @@
+from __future__ import annotations
+
+from ..phases.solid_phase_set import SolidPhaseSet
+from ..core.heating import HeatingSchedule
+from ..core.reaction_result import ReactionResult
+from ..core.gillespie_runner import get_step_times
+from .reaction_step_analyzer import ReactionStepAnalyzer, AnalysisMode, AnalysisQuantity
+
+from ..computing.schemas.ca_result_schema import RxnCAResultDoc
+
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+class _P2Quantile():
+    # Streaming estimate of one quantile at every point of a time series, using the
+    # P-squared algorithm (Jain & Chlamtac, 1985). Five markers are kept per point
+    # instead of the observations themselves, so memory does not grow with the
+    # number of realizations. Until five observations are in, they are stored and
+    # the quantile is computed exactly.
+
+    def __init__(self, q: float, size: int):
+        self.q = q
+        self.size = size
+        self.count = 0
+        self._initial = []
+        self._heights = None
+        self._positions = None
+        self._desired = np.array([1, 1 + 2 * q, 1 + 4 * q, 3 + 2 * q, 5])
+        self._increments = np.array([0, q / 2, q, (1 + q) / 2, 1])
+
+    def add(self, xs: np.ndarray) -> None:
+        self.count += 1
+        if self._heights is None:
+            self._initial.append(np.array(xs, dtype=np.float64))
+            if len(self._initial) == 5:
+                self._heights = np.sort(np.array(self._initial), axis=0)
+                self._positions = np.tile(np.arange(1, 6, dtype=np.float64)[:, None], (1, self.size))
+                self._initial = []
+            return
+
+        q = self._heights
+        n = self._positions
+
+        q[0] = np.minimum(q[0], xs)
+        q[4] = np.maximum(q[4], xs)
+
+        # The cell containing each observation; markers above it move up by one
+        k = np.clip((q[1:4] <= xs).sum(axis=0), 0, 3)
+        n += np.arange(5)[:, None] > k[None, :]
+        self._desired = self._desired + self._increments
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for i in range(1, 4):
+                d = self._desired[i] - n[i]
+                move_up = (d >= 1) & (n[i + 1] - n[i] > 1)
+                move_down = (d <= -1) & (n[i - 1] - n[i] < -1)
+                to_move = move_up | move_down
+                if not to_move.any():
+                    continue
+
+                d = np.where(move_up, 1.0, -1.0)
+                parabolic = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i]) +
+                    (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+                )
+                neighbor_q = np.where(move_up, q[i + 1], q[i - 1])
+                neighbor_n = np.where(move_up, n[i + 1], n[i - 1])
+                linear = q[i] + d * (neighbor_q - q[i]) / (neighbor_n - n[i])
+
+                use_parabolic = (q[i - 1] < parabolic) & (parabolic < q[i + 1])
+                new_q = np.where(use_parabolic, parabolic, linear)
+
+                q[i] = np.where(to_move, new_q, q[i])
+                n[i] = np.where(to_move, n[i] + d, n[i])
+
+    @property
+    def value(self) -> np.ndarray:
+        if self._heights is None:
+            if len(self._initial) == 0:
+                return np.full(self.size, np.nan)
+            return np.quantile(np.array(self._initial), self.q, axis=0)
+        return self._heights[2].copy()
+
+
+class _PhaseStats():
+    # Running mean, variance and quantiles of one phase's amount at every step
+
+    def __init__(self, size: int, quantiles: Iterable[float]):
+        self.count = 0
+        self.mean = np.zeros(size)
+        self.m2 = np.zeros(size)
+        self.quantiles = { q: _P2Quantile(q, size) for q in quantiles }
+
+    def add(self, xs: np.ndarray) -> None:
+        # Welford's update
+        self.count += 1
+        delta = xs - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (xs - self.mean)
+
+        for estimator in self.quantiles.values():
+            estimator.add(xs)
+
+    @property
+    def variance(self) -> np.ndarray:
+        if self.count < 2:
+            return np.zeros_like(self.mean)
+        return self.m2 / (self.count - 1)
+
+
+class EnsembleAggregator():
+    """Accumulates statistics of phase amounts over an ensemble of realizations
+    one realization at a time, so that the realizations never have to be held in
+    memory together. For every phase and every sampled step it keeps a running
+    mean and variance (Welford's algorithm) and streaming estimates of a set of
+    quantiles (the P-squared algorithm).
+
+    Realizations can be added as they finish (see run_sim_parallel) or read back
+    from stored result documents with from_result_doc_files.
+    """
+
+    @classmethod
+    def from_result_doc_files(cls,
+                              fnames: List[str],
+                              num_points: int = 200,
+                              **kwargs) -> EnsembleAggregator:
+        """Builds an aggregator from stored result documents, loading one document
+        at a time.
+
+        Args:
+            fnames (List[str]): The result document files
+            num_points (int, optional): The number of steps to sample. Defaults to 200.
+
+        Returns:
+            EnsembleAggregator:
+        """
+        agg = None
+        for fname in fnames:
+            doc: RxnCAResultDoc = RxnCAResultDoc.from_file(fname)
+            if agg is None:
+                step_idxs = get_sample_step_idxs(len(doc.results[0]), num_points)
+                agg = cls(doc.phases, step_idxs, heating_schedule=doc.recipe.heating_schedule, **kwargs)
+
+            for result in doc.results:
+                agg.add_result(result)
+        return agg
+
+    def __init__(self,
+                 phase_set: SolidPhaseSet,
+                 step_idxs: List[int],
+                 quantity: AnalysisQuantity = AnalysisQuantity.MOLES,
+                 mode: AnalysisMode = AnalysisMode.FRACTIONAL,
+                 quantiles: Iterable[float] = (0.05, 0.5, 0.95),
+                 heating_schedule: HeatingSchedule = None,
+                 num_sites: int = None):
+        """
+        Args:
+            phase_set (SolidPhaseSet): The phases in the simulations
+            step_idxs (List[int]): The steps at which amounts are sampled
+            quantity (AnalysisQuantity, optional): The quantity to track. Defaults to MOLES.
+            mode (AnalysisMode, optional): Absolute or fractional amounts. Defaults to FRACTIONAL.
+            quantiles (Iterable[float], optional): The quantiles to estimate. Defaults to
+            (0.05, 0.5, 0.95).
+            heating_schedule (HeatingSchedule, optional): The schedule the realizations
+            followed, used for plotting.
+            num_sites (int, optional): The number of sites in the simulations, used for
+            plotting. Read from the first result added with add_result if not provided,
+            so it must be supplied when realizations are only added with add_series.
+        """
+        self.phase_set = phase_set
+        self.step_idxs = list(step_idxs)
+        self.quantity = quantity
+        self.mode = mode
+        self.quantile_levels = tuple(quantiles)
+        self.heating_schedule = heating_schedule
+        self.num_sites = num_sites
+        # The physical time of each sampled step, taken from the first result added
+        # with add_result
+        self.step_times: List[float] = None
+
+        self.num_realizations = 0
+        self._stats: Dict[str, _PhaseStats] = {}
+        self._analyzer = ReactionStepAnalyzer(phase_set)
+
+    @property
+    def phases(self) -> List[str]:
+        return list(self._stats.keys())
+
+    def add_series(self, series: List[Dict[str, float]]) -> None:
+        """Adds one realization, given as the amount of each phase at every sampled step.
+
+        Args:
+            series (List[Dict[str, float]]): One dictionary of phase amounts per entry
+            in step_idxs
+        """
+        if len(series) != len(self.step_idxs):
+            raise ValueError(f"Expected {len(self.step_idxs)} points, got {len(series)}")
+
+        phases = set()
+        for amts in series:
+            phases.update(amts.keys())
+
+        for phase in phases:
+            if phase not in self._stats:
+                # Every earlier realization had none of this phase
+                stats = _PhaseStats(len(self.step_idxs), self.quantile_levels)
+                zeros = np.zeros(len(self.step_idxs))
+                for _ in range(self.num_realizations):
+                    stats.add(zeros)
+                self._stats[phase] = stats
+
+        for phase, stats in self._stats.items():
+            stats.add(np.array([amts.get(phase, 0.0) for amts in series], dtype=np.float64))
+
+        self.num_realizations += 1
+
+    def add_result(self, result: ReactionResult) -> None:
+        """Adds one realization from its simulation result.
+
+        Args:
+            result (ReactionResult): The result of the realization
+        """
+        series = []
+        for state in iter_states_at(result, self.step_idxs):
+            analyzer = self._analyzer.set_step_group(state)
+            if self.num_sites is None:
+                self.num_sites = analyzer.get_simulation_size()
+            series.append(analyzer.get_value_general(self.quantity, self.mode))
+
+        if self.step_times is None:
+            times = get_step_times(result, self.num_sites)
+            self.step_times = [times[idx] for idx in self.step_idxs]
+
+        self.add_series(series)
+
+    def mean(self, phase: str) -> np.ndarray:
+        return self._get_stats(phase).mean.copy()
+
+    def variance(self, phase: str) -> np.ndarray:
+        return self._get_stats(phase).variance
+
+    def std(self, phase: str) -> np.ndarray:
+        return np.sqrt(self.variance(phase))
+
+    def quantile(self, phase: str, q: float) -> np.ndarray:
+        """The estimated q-th quantile of the phase amount at every sampled step.
+
+        Args:
+            phase (str): The phase
+            q (float): One of the quantile levels the aggregator was created with
+
+        Returns:
+            np.ndarray:
+        """
+        estimators = self._get_stats(phase).quantiles
+        if q not in estimators:
+            raise ValueError(f"Quantile {q} is not tracked, choose one of {self.quantile_levels}")
+        return estimators[q].value
+
+    def confidence_interval(self, phase: str, z: float = 1.96) -> Tuple[np.ndarray, np.ndarray]:
+        """The normal-approximation confidence interval of the mean phase amount at
+        every sampled step.
+
+        Args:
+            phase (str): The phase
+            z (float, optional): The number of standard errors. Defaults to 1.96 (95%).
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The lower and upper bounds
+        """
+        mean = self.mean(phase)
+        half_width = z * self.std(phase) / np.sqrt(max(self.num_realizations, 1))
+        return mean - half_width, mean + half_width
+
+    def _get_stats(self, phase: str) -> _PhaseStats:
+        stats = self._stats.get(phase)
+        if stats is None:
+            zeros = _PhaseStats(len(self.step_idxs), self.quantile_levels)
+            zeros.count = self.num_realizations
+            return zeros
+        return stats
+
+
+def get_sample_step_idxs(result_length: int, num_points: int) -> List[int]:
+    """Chooses up to num_points evenly spaced steps, always including the last step.
+
+    Args:
+        result_length (int): The number of steps in the result
+        num_points (int): The maximum number of steps to choose
+
+    Returns:
+        List[int]:
+    """
+    interval = max(1, result_length // num_points)
+    idxs = list(range(0, result_length, interval))
+    if idxs[-1] != result_length - 1:
+        idxs.append(result_length - 1)
+    return idxs
+
+def iter_states_at(result: ReactionResult, step_idxs: List[int]):
+    """Yields the state of a result at each of step_idxs (which must be sorted),
+    replaying its diffs once instead of reconstructing every step separately.
+    The same state object is updated and yielded each time.
+
+    Args:
+        result (ReactionResult): The result to read
+        step_idxs (List[int]): The steps to yield, in increasing order
+    """
+    diffs = result._diffs
+    if len(diffs) != len(result) - 1:
+        # Compressed results only hold some steps, which are read directly
+        for step_no in step_idxs:
+            yield result.get_step(step_no)
+        return
+
+    state = result.first_step.copy()
+    pos = 0
+    for step_no in step_idxs:
+        while pos < step_no:
+            state.batch_update(diffs[pos])
+            pos += 1
+        yield state
@@ -11,14 +11,17 @@ class RxnCALayout():
     was used in the simulation.
     """
     
-    def __init__(self, step_size: int, heating_sched: HeatingSchedule):
+    def __init__(self, step_size: int, heating_sched: HeatingSchedule, time_axis: bool = False):
         """Initializes a ReactionResult with the reaction set used in the simulation
 
         Args:
             rxn_set (ScoredReactionSet):
+            time_axis (bool, optional): If True, the x axis shows physical time, with
+            tick labels. Defaults to False.
         """
         self.heating_schedule = heating_sched
         self.step_size = step_size
+        self.time_axis = time_axis
     
     def get_layout(self, y_label, title, **layout_kwargs):
         default_kwargs = dict(title={
@@ -87,6 +90,8 @@ class RxnCALayout():
                        **layout_kwargs):
         if use_heating_xaxis:
             x_label = "Temperature (K)"
+        elif self.time_axis:
+            x_label = "Time (sweeps)"
         else:
             x_label = "Reaction Coordinate (arb. units)"
 
@@ -120,6 +125,9 @@ class RxnCALayout():
                 ),
             )
 
+        if self.time_axis:
+            fig.update_layout(xaxis=dict(showticklabels=True, ticks='outside'))
+
         # if use_heating_xaxis:
         #     xs = []
         #     xlabels = []
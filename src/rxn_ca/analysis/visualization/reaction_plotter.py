@@ -1,12 +1,15 @@
 from __future__ import annotations
 
 from ..bulk_reaction_analyzer import BulkReactionAnalyzer
+from ..ensemble_aggregator import EnsembleAggregator
 from ..reaction_step_analyzer import AnalysisMode, AnalysisQuantity
 from .phase_trace_calculator import PhaseTraceCalculator, PhaseTraceConfig, PhaseTrace
 from .layout import RxnCALayout
 from .rip_plotter import RIPPlotter
 import plotly.graph_objects as go
+from plotly.colors import DEFAULT_PLOTLY_COLORS
 from ...phases.solid_phase_set import MatterPhase
+from ...core.gillespie_runner import get_step_times
 
 from pymatgen.core.composition import Composition
 
@@ -26,26 +29,73 @@ class ReactionPlotter():
                  include_heating_trace: bool = False,
                  rip_config: Dict = None,
                  phase_colors: Dict = None,
-                 focus_phases: List[str] = None):
+                 focus_phases: List[str] = None,
+                 ensemble: EnsembleAggregator = None,
+                 time_axis: bool = False):
         """Initializes a ReactionResult with the reaction set used in the simulation
 
         Args:
             rxn_set (ScoredReactionSet):
+            ensemble (EnsembleAggregator, optional): Ensemble statistics to draw with
+            plot_ensemble. If provided, bulk_analyzer may be None, in which case only
+            plot_ensemble is available.
+            time_axis (bool, optional): If True, results are plotted against physical time
+            (see get_step_times) instead of step number. Defaults to False.
         """
+        if bulk_analyzer is None and ensemble is None:
+            raise ValueError("Must provide either bulk_analyzer or ensemble")
+
         self.bulk_analyzer = bulk_analyzer
+        self.ensemble = ensemble
         self.trace_config = trace_config
-        self.trace_calculator = PhaseTraceCalculator(
-            bulk_analyzer.loaded_step_groups,
-            bulk_analyzer.step_analyzer,
-        )
         self.include_heating_trace = include_heating_trace
-        self.layout = RxnCALayout(self.bulk_analyzer.get_step_size(), self.bulk_analyzer.heating_schedule)
+        self.time_axis = time_axis
+
+        if bulk_analyzer is not None:
+            self.trace_calculator = PhaseTraceCalculator(
+                bulk_analyzer.loaded_step_groups,
+                bulk_analyzer.step_analyzer,
+            )
+            self.layout = RxnCALayout(self.bulk_analyzer.get_step_size(), self.bulk_analyzer.heating_schedule, time_axis=time_axis)
+        else:
+            if ensemble.num_sites is None:
+                raise ValueError("The ensemble must know its num_sites to be plotted, pass num_sites to EnsembleAggregator")
+            self.trace_calculator = None
+            self.layout = RxnCALayout(ensemble.num_sites, ensemble.heating_schedule, time_axis=time_axis)
         self.rip_config = rip_config
         self.phase_colors = phase_colors
         self.focus_phases = focus_phases
 
+    def _get_xs(self, step_idxs: List[int]) -> List[float]:
+        if not self.time_axis:
+            return step_idxs
+
+        times = get_step_times(self.bulk_analyzer.results[0], self.bulk_analyzer.get_step_size())
+        return [times[idx] for idx in step_idxs]
+
+    def _get_ensemble_xs(self) -> List[float]:
+        ensemble = self.ensemble
+        if not self.time_axis:
+            return ensemble.step_idxs
+
+        if ensemble.step_times is not None:
+            return ensemble.step_times
+        # Realizations added with add_series carry no timing, so every step is
+        # taken to be one site visit
+        return [idx / ensemble.num_sites for idx in ensemble.step_idxs]
+
     def get_heating_trace(self):
-        heating_xs, heating_ys = self.bulk_analyzer.heating_schedule.get_xy_for_plot(self.bulk_analyzer.result_length)
+        if self.bulk_analyzer is not None:
+            heating_xs, heating_ys = self.bulk_analyzer.heating_schedule.get_xy_for_plot(self.bulk_analyzer.result_length)
+            if self.time_axis:
+                end_time = self._get_xs([self.bulk_analyzer.result_length - 1])[0]
+                heating_xs = [x * end_time / self.bulk_analyzer.result_length for x in heating_xs]
+        else:
+            ensemble_length = self.ensemble.step_idxs[-1] + 1
+            heating_xs, heating_ys = self.ensemble.heating_schedule.get_xy_for_plot(ensemble_length)
+            if self.time_axis:
+                end_time = self._get_ensemble_xs()[-1]
+                heating_xs = [x * end_time / ensemble_length for x in heating_xs]
         return go.Scatter(
             name="Temperature",
             x=heating_xs,
@@ -65,7 +115,7 @@ class ReactionPlotter():
         default_trace = self._get_plotly_trace()
         default_trace.update(
                 name=t.name,
-                x=self.bulk_analyzer.loaded_step_idxs,
+                x=self._get_xs(self.bulk_analyzer.loaded_step_idxs),
                 y=t.ys,            
         )
         if self.phase_colors is not None:
@@ -75,7 +125,7 @@ class ReactionPlotter():
     
     def _get_rip_trace(self, pt: PhaseTrace, plotly_trace: go.Scatter):
         freq = 10
-        xs = self.bulk_analyzer.loaded_step_idxs[::freq]
+        xs = self._get_xs(self.bulk_analyzer.loaded_step_idxs)[::freq]
         ys = pt.ys[::freq]
         if pt.name in self.rip_config.get("reactants"):
             mdict = dict(symbol= "circle", size=12)
@@ -104,7 +154,7 @@ class ReactionPlotter():
             title,
         )
 
-        fig.layout.xaxis.update(autorange=False, range=(0, self.bulk_analyzer.last_loaded_step_idx))
+        fig.layout.xaxis.update(autorange=False, range=(0, self._get_xs([self.bulk_analyzer.last_loaded_step_idx])[0]))
 
 
         bg_phase_traces = []
@@ -167,7 +217,7 @@ class ReactionPlotter():
 
             all_products = list(set(products).union(set(byproducts)))
             rip_generator = RIPPlotter()
-            rip_traces = rip_generator.get_rip_traces(reactants, impurities, all_products, self.bulk_analyzer.loaded_step_idxs, phase_traces)
+            rip_traces = rip_generator.get_rip_traces(reactants, impurities, all_products, self._get_xs(self.bulk_analyzer.loaded_step_idxs), phase_traces)
             for rt in rip_traces[::-1]:
                 fig.add_trace(rt)
 
@@ -238,5 +288,95 @@ class ReactionPlotter():
             **plotting_kwargs
         )
 
+    def plot_ensemble(self,
+                      title: str = "Ensemble Phase Amounts",
+                      ylabel: str = "Fraction",
+                      band: str = "quantile",
+                      lower_quantile: float = None,
+                      upper_quantile: float = None,
+                      **plotting_kwargs):
+        """Plots the mean amount of each phase across the ensemble, surrounded by a
+        shaded band.
+
+        Args:
+            title (str, optional): The title of the plot
+            ylabel (str, optional): The label of the y axis
+            band (str, optional): "quantile" for the band between two quantiles, "std"
+            for one standard deviation around the mean, or "ci" for the 95% confidence
+            interval of the mean. Defaults to "quantile".
+            lower_quantile (float, optional): The lower quantile of a "quantile" band.
+            Defaults to the smallest quantile tracked by the ensemble.
+            upper_quantile (float, optional): The upper quantile of a "quantile" band.
+            Defaults to the largest quantile tracked by the ensemble.
+        """
+        if self.ensemble is None:
+            raise ValueError("plot_ensemble requires an EnsembleAggregator")
+
+        ensemble = self.ensemble
+        xs = self._get_ensemble_xs()
 
-        
\ No newline at end of file
+        if lower_quantile is None:
+            lower_quantile = min(ensemble.quantile_levels)
+        if upper_quantile is None:
+            upper_quantile = max(ensemble.quantile_levels)
+
+        fig = self.layout.get_plotly_fig(ylabel, title)
+        fig.layout.xaxis.update(autorange=False, range=(0, xs[-1]))
+
+        phases = [p for p in ensemble.phases if ensemble.mean(p).max() > self.trace_config.minimum_required_prevalence]
+        focus_phases = plotting_kwargs.get("focus_phases", self.focus_phases)
+
+        for idx, phase in enumerate(sorted(phases)):
+            mean = ensemble.mean(phase)
+            if band == "quantile":
+                lower = ensemble.quantile(phase, lower_quantile)
+                upper = ensemble.quantile(phase, upper_quantile)
+            elif band == "std":
+                std = ensemble.std(phase)
+                lower, upper = mean - std, mean + std
+            elif band == "ci":
+                lower, upper = ensemble.confidence_interval(phase)
+            else:
+                raise ValueError(f"Unknown band type {band}")
+
+            color = None
+            if self.phase_colors is not None:
+                color = self.phase_colors.get(phase)
+            if color is None:
+                color = DEFAULT_PLOTLY_COLORS[idx % len(DEFAULT_PLOTLY_COLORS)]
+            if focus_phases is not None and phase not in focus_phases:
+                color = ReactionPlotter.UNFOCUS_COLOR
+
+            fig.add_trace(go.Scatter(
+                x=xs,
+                y=upper,
+                mode='lines',
+                line=dict(width=0),
+                showlegend=False,
+                hoverinfo='skip',
+                legendgroup=phase,
+            ))
+            fig.add_trace(go.Scatter(
+                x=xs,
+                y=lower,
+                mode='lines',
+                line=dict(width=0),
+                fill='tonexty',
+                fillcolor=color,
+                opacity=0.2,
+                showlegend=False,
+                hoverinfo='skip',
+                legendgroup=phase,
+            ))
+            mean_trace = self._get_plotly_trace()
+            mean_trace.update(name=phase, x=xs, y=mean, legendgroup=phase)
+            mean_trace.line.update(color=color)
+            fig.add_trace(mean_trace)
+
+        if ensemble.mode == AnalysisMode.FRACTIONAL:
+            fig.layout.yaxis.update(range=(0, 1.0))
+
+        if self.include_heating_trace and ensemble.heating_schedule is not None:
+            fig.add_trace(self.get_heating_trace())
+
+        return fig
@@ -1,4 +1,4 @@
 from .reaction_controller import ReactionController
-from .reaction_result import ReactionResult
+from .reaction_result import ReactionResult, ChainedReactionResult
 from .reaction_simulation import ReactionSimulation
 from .heating import HeatingSchedule
\ No newline at end of file
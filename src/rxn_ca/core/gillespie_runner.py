@@ -0,0 +1,368 @@
+from pylattica.core import SimulationState
+from pylattica.core.constants import GENERAL, SITES
+from pylattica.discrete.state_constants import DISCRETE_OCCUPANCY
+
+from .liquid_swap_controller import LiquidSwapController, swap_chance
+from .reaction_result import ReactionResult
+from .random_streams import INTERACTIONS
+from .tau_leaping_runner import EventClass, LatticeIndex, get_event_update
+from ..phases.solid_phase_set import SolidPhaseSet
+
+from typing import Dict, List, Tuple
+
+from tqdm import tqdm
+import numpy as np
+
+FREE_SPACE = SolidPhaseSet.FREE_SPACE
+
+class GillespieRunner():
+    """Runs a LiquidSwapController event by event with a physical clock (the
+    Gillespie algorithm). Time is measured in sweeps: in one unit of time every site
+    is visited once on average, so a HeatingStep of duration d lasts d units. The
+    propensity of each class of events (see TauLeapingRunner.get_event_classes) is
+    its chance per site visit times the number of sites. The waiting time to the
+    next event is drawn from an exponential distribution with the total propensity
+    as its rate, and the event is chosen in proportion to its propensity. Visits
+    that would have changed nothing are never simulated.
+
+    The propensities are kept up to date by an InterfaceIndex, which after each
+    event only reclassifies the interfaces of the sites that changed, so the cost
+    of an event does not grow with the size of the lattice.
+
+    Results are resampled onto a grid with spacing time_resolution: step i holds
+    the state at time i * time_resolution, and all events in between are merged
+    into one step. The length of a result therefore depends on the requested
+    resolution rather than on the number of site visits.
+    """
+
+    def __init__(self, time_resolution: float = 0.05):
+        """
+        Args:
+            time_resolution (float, optional): The time between recorded steps, in
+            sweeps. Defaults to 0.05.
+        """
+        if time_resolution <= 0:
+            raise ValueError("time_resolution must be positive")
+
+        self.time_resolution = time_resolution
+
+    def as_dict(self):
+        return {
+            "time_resolution": self.time_resolution,
+        }
+
+    def run(self,
+            initial_state: SimulationState,
+            controller: LiquidSwapController,
+            num_steps: int,
+            verbose: bool = False) -> ReactionResult:
+        """Runs the simulation for as long as num_steps site visits would take.
+
+        Args:
+            initial_state (SimulationState): The starting state
+            controller (LiquidSwapController): The controller implementing the update rule
+            num_steps (int): The number of site visits. The simulated time is num_steps
+            divided by the number of sites.
+            verbose (bool, optional): Whether to show a progress bar. Defaults to False.
+
+        Returns:
+            ReactionResult: The result, with one step per time_resolution. Its metadata
+            records under "gillespie" the resolution, the simulated time and the number
+            of events.
+        """
+        result: ReactionResult = controller.instantiate_result(initial_state.copy())
+        calculator = controller.reaction_calculator
+
+        lattice = LatticeIndex(calculator.neighborhood_graph, result.live_state.site_ids())
+        num_sites = len(lattice)
+        duration = num_steps / num_sites
+        num_points = int(round(duration / self.time_resolution))
+        if controller.random_streams is None:
+            rng = np.random.default_rng(np.random.randint(0, 2 ** 31 - 1))
+        else:
+            rng = controller.random_streams.get(INTERACTIONS)
+
+        # Events are applied to a working copy and recorded once per grid interval
+        state = initial_state.copy()
+        pending = _empty_update()
+        index = InterfaceIndex(state, controller, lattice)
+
+        time = 0.0
+        num_events = 0
+        with tqdm(total=num_points, disable=(not verbose)) as progress:
+            while len(result) <= num_points:
+                channels, propensities = index.get_propensities()
+                total = propensities.sum()
+                time += rng.exponential(1 / total) if total > 0 else float("inf")
+
+                # Record the grid points passed before the event happens
+                while len(result) <= num_points and time > len(result) * self.time_resolution:
+                    result.add_step(pending)
+                    pending = _empty_update()
+                    progress.update(1)
+
+                if len(result) > num_points:
+                    break
+
+                channel = channels[int(rng.choice(len(channels), p=propensities / total))]
+                event_class = index.choose_event(channel, rng)
+                updates = get_event_update(event_class, 0, state, controller, lattice, rng)
+                state.batch_update(updates)
+                index.update(state, updates.get(SITES, {}).keys())
+                _merge_into(pending, updates)
+                num_events += 1
+
+        result.metadata["gillespie"] = {
+            "time_resolution": self.time_resolution,
+            "duration": num_points * self.time_resolution,
+            "events": num_events,
+        }
+        return result
+
+class InterfaceIndex():
+    """The sites of every phase and the (site, neighbor) pairs between every two
+    phases of a state, with the propensities of the event classes they make up
+    (see TauLeapingRunner.get_event_classes). Each propensity is the chance of the
+    event per site visit times the number of sites.
+
+    After an event only the pairs touching the sites it changed are moved between
+    classes, so keeping the index up to date takes time proportional to the
+    number of changed sites and their neighbors rather than to the lattice size.
+    """
+
+    def __init__(self, state: SimulationState, controller: LiquidSwapController, lattice: LatticeIndex):
+        """
+        Args:
+            state (SimulationState): The state to index
+            controller (LiquidSwapController): The controller implementing the update rule.
+            Its temperature and reactions must not change while the index is in use.
+            lattice (LatticeIndex): The neighbors of every site
+        """
+        self.controller = controller
+        self.calculator = controller.reaction_calculator
+        self.phase_set: SolidPhaseSet = self.calculator.rxn_set.phases
+        self.lattice = lattice
+
+        self._site_idx = { site_id: idx for idx, site_id in enumerate(lattice.site_ids.tolist()) }
+        degrees = np.bincount(lattice.src, minlength=len(lattice))
+        self._out_starts = np.concatenate([[0], np.cumsum(degrees)])
+        in_order = np.argsort(lattice.dst, kind="stable")
+        in_starts = np.concatenate([[0], np.cumsum(np.bincount(lattice.dst, minlength=len(lattice)))])
+        self._in_pairs = [in_order[in_starts[i]:in_starts[i + 1]] for i in range(len(lattice))]
+        self._max_weight = float(lattice.visit_weights.max()) if len(lattice.visit_weights) > 0 else 1.0
+
+        self._codes: Dict[str, int] = {}
+        self._phases: List[str] = []
+        self._swap_probs: List[float] = []
+        self._interactions: Dict[Tuple[int, int], Tuple[float, List]] = {}
+
+        occupancy = [state.get_site_state(site_id)[DISCRETE_OCCUPANCY] for site_id in lattice.site_ids.tolist()]
+        self.site_codes = np.array([self._get_code(phase) for phase in occupancy], dtype=int)
+
+        # Each site is in the member list of its phase, and each pair in that of its
+        # pair type, at the position recorded for it, so that either can be moved in
+        # constant time
+        self._site_members: Dict[int, List[int]] = {}
+        self._site_pos = np.zeros(len(lattice), dtype=int)
+        for idx, code in enumerate(self.site_codes.tolist()):
+            self._add(self._site_members.setdefault(code, []), self._site_pos, idx)
+
+        self._pair_members: Dict[Tuple[int, int], List[int]] = {}
+        self._pair_weights: Dict[Tuple[int, int], float] = {}
+        self._pair_pos = np.zeros(len(lattice.src), dtype=int)
+
+        # Pairs are grouped by type in one pass rather than added one at a time
+        num_codes = len(self._phases)
+        pair_codes = self.site_codes[lattice.src] * num_codes + self.site_codes[lattice.dst]
+        order = np.argsort(pair_codes, kind="stable")
+        pair_types, starts, counts = np.unique(pair_codes[order], return_index=True, return_counts=True)
+        weights = np.bincount(pair_codes, weights=lattice.visit_weights)
+        for pair_code, start, count in zip(pair_types.tolist(), starts.tolist(), counts.tolist()):
+            pair_type = (pair_code // num_codes, pair_code % num_codes)
+            members = order[start:start + count]
+            self._pair_members[pair_type] = members.tolist()
+            self._pair_pos[members] = np.arange(count)
+            self._pair_weights[pair_type] = float(weights[pair_code])
+
+    def _get_code(self, phase: str) -> int:
+        if phase not in self._codes:
+            self._codes[phase] = len(self._phases)
+            self._phases.append(phase)
+            if phase == FREE_SPACE:
+                self._swap_probs.append(0.0)
+            else:
+                self._swap_probs.append(swap_chance(self.controller.temperature / self.phase_set.get_melting_point(phase)))
+        return self._codes[phase]
+
+    def _get_interactions(self, pair_type: Tuple[int, int]) -> Tuple[float, List]:
+        if pair_type not in self._interactions:
+            phase, nb_phase = self._phases[pair_type[0]], self._phases[pair_type[1]]
+            self._interactions[pair_type] = self.calculator.phase_interactions(phase, nb_phase)
+        return self._interactions[pair_type]
+
+    @staticmethod
+    def _add(members: List[int], positions: np.ndarray, item: int) -> None:
+        positions[item] = len(members)
+        members.append(item)
+
+    @staticmethod
+    def _remove(members: List[int], positions: np.ndarray, item: int) -> None:
+        last = members.pop()
+        if last != item:
+            members[positions[item]] = last
+            positions[last] = positions[item]
+
+    def _pair_type(self, pair: int) -> Tuple[int, int]:
+        return (int(self.site_codes[self.lattice.src[pair]]), int(self.site_codes[self.lattice.dst[pair]]))
+
+    def _add_pair(self, pair: int) -> None:
+        pair_type = self._pair_type(pair)
+        self._add(self._pair_members.setdefault(pair_type, []), self._pair_pos, pair)
+        self._pair_weights[pair_type] = self._pair_weights.get(pair_type, 0.0) + self.lattice.visit_weights[pair]
+
+    def _remove_pair(self, pair: int) -> None:
+        pair_type = self._pair_type(pair)
+        members = self._pair_members[pair_type]
+        self._remove(members, self._pair_pos, pair)
+        # Reset rather than subtract once empty, so rounding errors cannot accumulate
+        if len(members) == 0:
+            self._pair_weights[pair_type] = 0.0
+        else:
+            self._pair_weights[pair_type] -= self.lattice.visit_weights[pair]
+
+    def get_propensities(self) -> Tuple[List[Tuple], np.ndarray]:
+        """The propensity of every channel through which the state can change: swaps
+        of the sites of a phase, ("swap", code), and interactions at the pairs of a
+        pair type, ("pair", pair_type).
+
+        Returns:
+            Tuple[List[Tuple], np.ndarray]: The channels and their propensities
+        """
+        channels = []
+        propensities = []
+        for code, members in self._site_members.items():
+            if len(members) > 0 and self._swap_probs[code] > 0:
+                channels.append(("swap", code))
+                propensities.append(len(members) * self._swap_probs[code])
+
+        for pair_type, weight in self._pair_weights.items():
+            if weight <= 0 or self._phases[pair_type[0]] == FREE_SPACE:
+                continue
+            total, interactions = self._get_interactions(pair_type)
+            active = sum([score for score, _, _ in interactions])
+            if active > 0:
+                channels.append(("pair", pair_type))
+                propensities.append(weight * (1 - self._swap_probs[pair_type[0]]) * active / total)
+
+        return channels, np.array(propensities, dtype=float)
+
+    def choose_event(self, channel: Tuple, rng) -> EventClass:
+        """Chooses where an event of a channel happens, and for pairs which
+        interaction it carries out.
+
+        Args:
+            channel (Tuple): The channel, as returned by get_propensities
+            rng: The generator to draw from
+
+        Returns:
+            EventClass: A class holding only the chosen site (and neighbor)
+        """
+        kind, key = channel
+        if kind == "swap":
+            members = self._site_members[key]
+            site_idx = members[int(rng.integers(len(members)))]
+            return EventClass(
+                rate=0.0,
+                site_phase=self._phases[key],
+                nb_phase=None,
+                sites=self.lattice.site_ids[[site_idx]],
+            )
+
+        _, interactions = self._get_interactions(key)
+        scores = np.array([score for score, _, _ in interactions])
+        _, with_neighbor, rxns = interactions[int(rng.choice(len(interactions), p=scores / scores.sum()))]
+
+        # Pairs are visited in proportion to their weights
+        members = self._pair_members[key]
+        while True:
+            pair = members[int(rng.integers(len(members)))]
+            if rng.random() * self._max_weight <= self.lattice.visit_weights[pair]:
+                break
+
+        return EventClass(
+            rate=0.0,
+            site_phase=self._phases[key[0]],
+            nb_phase=self._phases[key[1]],
+            sites=self.lattice.site_ids[[self.lattice.src[pair]]],
+            nbs=self.lattice.site_ids[[self.lattice.dst[pair]]],
+            with_neighbor=with_neighbor,
+            reactions=rxns,
+        )
+
+    def update(self, state: SimulationState, site_ids) -> None:
+        """Reclassifies the sites given, and the pairs they belong to, after they
+        were updated.
+
+        Args:
+            state (SimulationState): The updated state
+            site_ids: The ids of the sites that were updated
+        """
+        changed = {}
+        for site_id in site_ids:
+            idx = self._site_idx[site_id]
+            code = self._get_code(state.get_site_state(site_id)[DISCRETE_OCCUPANCY])
+            if code != self.site_codes[idx]:
+                changed[idx] = code
+
+        if len(changed) == 0:
+            return
+
+        pairs = set()
+        for idx in changed:
+            pairs.update(range(self._out_starts[idx], self._out_starts[idx + 1]))
+            pairs.update(self._in_pairs[idx].tolist())
+
+        for pair in pairs:
+            self._remove_pair(pair)
+
+        for idx, code in changed.items():
+            self._remove(self._site_members[int(self.site_codes[idx])], self._site_pos, idx)
+            self.site_codes[idx] = code
+            self._add(self._site_members.setdefault(code, []), self._site_pos, idx)
+
+        for pair in pairs:
+            self._add_pair(pair)
+
+def get_step_times(result: ReactionResult, num_sites: int) -> List[float]:
+    """The physical time of every step of a result, in sweeps. Results run with a
+    GillespieRunner record their time resolution; otherwise every step is one site
+    visit. Each segment of a chained result starts with the state the previous one
+    ended with, so the two steps share a time.
+
+    Args:
+        result (ReactionResult): The result
+        num_sites (int): The number of sites in the simulation
+
+    Returns:
+        List[float]:
+    """
+    time_per_step = result.metadata.get("time_resolution", 1 / num_sites)
+    segments = result.metadata.get("segments")
+    if segments is None:
+        return [i * time_per_step for i in range(len(result))]
+
+    times = []
+    start_time = 0.0
+    for segment in segments:
+        times.extend([start_time + i * time_per_step for i in range(segment["num_steps"] + 1)])
+        start_time = times[-1]
+    return times
+
+def _empty_update() -> Dict:
+    return { SITES: {}, GENERAL: {} }
+
+def _merge_into(pending: Dict, updates: Dict) -> None:
+    # Site updates may set only some of a site's keys, so they are merged per site
+    for site_id, site_updates in updates.get(SITES, {}).items():
+        pending[SITES].setdefault(site_id, {}).update(site_updates)
+    pending[GENERAL].update(updates.get(GENERAL, {}))
@@ -1,4 +1,5 @@
-from typing import List
+from typing import List, Tuple, Union
+from bisect import bisect_right
 
 from monty.json import MSONable
 import numpy as np
@@ -42,6 +43,22 @@ class HeatingStep(RecipeStep):
 class RegrindStep(RecipeStep):
     pass
 
+class HeatingSegment(MSONable):
+    """A run of consecutive HeatingSteps at the same temperature, produced by
+    HeatingSchedule.compile. A segment is simulated as one continuous run.
+    """
+
+    def __init__(self, temperature: int, duration: float, step_indices: List[int]):
+        """
+        Args:
+            temperature (int): The temperature of the segment
+            duration (float): The total duration of the merged steps
+            step_indices (List[int]): The indices (in HeatingSchedule.steps) of the merged steps
+        """
+        self.temperature = temperature
+        self.duration = duration
+        self.step_indices = step_indices
+
 class HeatingSchedule(MSONable):
     """Captures the information of a heating schedule, e.g. ramping up
     to a particular temperature, holding, and then cooling back down
@@ -59,7 +76,57 @@ class HeatingSchedule(MSONable):
         return cls(steps)
 
     def __init__(self, steps):
-        self.steps: List[HeatingStep] = steps
+        self.steps = steps
+
+    @property
+    def steps(self) -> Tuple[Union[HeatingStep, RegrindStep], ...]:
+        # Read-only so that the index used by temp_at cannot go stale. Assigning a new
+        # list of steps rebuilds the index.
+        return self._steps
+
+    @steps.setter
+    def steps(self, steps: List[Union[HeatingStep, RegrindStep]]) -> None:
+        self._steps = tuple(steps)
+        self._temp_index = None
+
+    def compile(self, merge: bool = True) -> List[Union[HeatingSegment, RegrindStep]]:
+        """Collapses runs of consecutive HeatingSteps with the same temperature into
+        single HeatingSegments. RegrindSteps are kept in place and always end the
+        current segment.
+
+        Args:
+            merge (bool, optional): If False, every HeatingStep becomes its own
+            segment. Defaults to True.
+
+        Returns:
+            List[Union[HeatingSegment, RegrindStep]]:
+        """
+        compiled = []
+        for idx, step in enumerate(self.steps):
+            if isinstance(step, HeatingStep):
+                prev = compiled[-1] if len(compiled) > 0 else None
+                if merge and isinstance(prev, HeatingSegment) and prev.temperature == step.temperature:
+                    prev.duration += step.duration
+                    prev.step_indices.append(idx)
+                else:
+                    compiled.append(HeatingSegment(step.temperature, step.duration, [idx]))
+            else:
+                compiled.append(step)
+        return compiled
+
+    def _get_temp_index(self):
+        # Cumulative end points of each same-temperature segment, for bisection in temp_at
+        if self._temp_index is None:
+            ends = []
+            temps = []
+            tallied = 0
+            for segment in self.compile():
+                if isinstance(segment, HeatingSegment):
+                    tallied += segment.duration
+                    ends.append(tallied)
+                    temps.append(segment.temperature)
+            self._temp_index = (ends, temps)
+        return self._temp_index
 
     @property
     def temperature_steps(self):
@@ -70,11 +137,10 @@ class HeatingSchedule(MSONable):
         return list(set([s.temperature for s in self.temperature_steps]))
     
     def temp_at(self, step_idx):
-        tallied = 0
-        for step in self.temperature_steps:
-            tallied += step.duration
-            if tallied > step_idx:
-                return step.temperature
+        ends, temps = self._get_temp_index()
+        idx = bisect_right(ends, step_idx)
+        if idx < len(temps):
+            return temps[idx]
     
     def temp_at_percent_complete(self, percent_complete):
         total_steps = sum([step.duration for step in self.steps])
@@ -15,6 +15,7 @@ from .reaction_result import ReactionResult
 from .constants import VOLUME, REACTION_CHOSEN
 from ..reactions import ScoredReactionSet
 from .reaction_calculator import ReactionCalculator
+from .random_streams import RandomStreams, SITE_SELECTION, SWAPS
 
 def swap_chance(tm_frac):
     num = (20*tm_frac - 18.5)
@@ -30,10 +31,18 @@ class LiquidSwapController(BasicController):
     def __init__(self,
         structure: PeriodicStructure,
         rxn_calculator: ReactionCalculator,
+        random_streams: RandomStreams = None,
     ) -> None:
         self.structure = structure
         self.reaction_calculator = rxn_calculator
         self.temperature = None
+        # Without streams, the global random and numpy.random generators are used
+        self.random_streams = random_streams
+
+    def get_random_site(self, state: SimulationState):
+        if self.random_streams is None:
+            return super().get_random_site(state)
+        return int(self.random_streams.get(SITE_SELECTION).integers(state.size))
 
     def set_rxn_set(self, rxn_set: ScoredReactionSet):
         self.reaction_calculator.set_rxn_set(rxn_set)
@@ -45,8 +54,6 @@ class LiquidSwapController(BasicController):
         return ReactionResult(starting_state)
 
     def get_state_update(self, site_id: int, prev_state: SimulationState):
-        np.random.seed(None)
-
         site_state = prev_state.get_site_state(site_id)
         species = site_state[DISCRETE_OCCUPANCY]
         updates = {}
@@ -59,23 +66,35 @@ class LiquidSwapController(BasicController):
         
         diff = self.temperature / self.reaction_calculator.rxn_set.phases.get_melting_point(species)
 
-        if species == SolidPhaseSet.FREE_SPACE or random.random() < swap_chance(diff):
-            nb_ids = self.reaction_calculator.neighborhood_graph.neighbors_of(site_id)
-
-            other_id = random.choice(nb_ids)
-            other_state = prev_state.get_site_state(other_id)
+        if species == SolidPhaseSet.FREE_SPACE or self._random(SWAPS) < swap_chance(diff):
+            # Sorted so that the choice depends only on the state of the generator
+            nb_ids = [nb_id for nb_id, _ in self.reaction_calculator.neighbors_of(site_id)]
 
-            updates[SITES] = {
-                site_id: {
-                    DISCRETE_OCCUPANCY: other_state[DISCRETE_OCCUPANCY],
-                    VOLUME: other_state[VOLUME]
-                },
-                other_id: {
-                    DISCRETE_OCCUPANCY: site_state[DISCRETE_OCCUPANCY],
-                    VOLUME: site_state[VOLUME]                    
-                }
-            }
+            if self.random_streams is None:
+                other_id = random.choice(nb_ids)
+            else:
+                other_id = nb_ids[int(self.random_streams.get(SWAPS).integers(len(nb_ids)))]
+            updates[SITES] = self.get_swap_update(site_id, other_id, prev_state)
         else:
             updates = self.reaction_calculator.get_state_update(site_id, prev_state)
 
         return updates
+
+    def get_swap_update(self, site_id: int, other_id: int, prev_state: SimulationState):
+        site_state = prev_state.get_site_state(site_id)
+        other_state = prev_state.get_site_state(other_id)
+        return {
+            site_id: {
+                DISCRETE_OCCUPANCY: other_state[DISCRETE_OCCUPANCY],
+                VOLUME: other_state[VOLUME]
+            },
+            other_id: {
+                DISCRETE_OCCUPANCY: site_state[DISCRETE_OCCUPANCY],
+                VOLUME: site_state[VOLUME]
+            }
+        }
+
+    def _random(self, stream: str) -> float:
+        if self.random_streams is None:
+            return random.random()
+        return self.random_streams.get(stream).random()
@@ -0,0 +1,422 @@
+from __future__ import annotations
+
+from .heating import HeatingSchedule, RegrindStep
+from .liquid_swap_controller import swap_chance
+from .recipe import ReactionRecipe
+from .reaction_calculator import ReactionCalculator
+from ..phases.solid_phase_set import SolidPhaseSet, MatterPhase
+from ..reactions import ReactionLibrary, ScoredReaction
+from ..analysis.reaction_step_analyzer import ReactionStepAnalyzer, AnalysisQuantity, AnalysisMode
+from ..analysis.visualization.phase_trace_calculator import PhaseTraceCalculator, PhaseTraceConfig, PhaseTrace
+
+from typing import Dict, List
+
+import numpy as np
+
+FREE_SPACE = SolidPhaseSet.FREE_SPACE
+
+class _VolumeAnalyzer(ReactionStepAnalyzer):
+    # A ReactionStepAnalyzer reading phase volumes from a dictionary instead of
+    # simulation states, so mean-field amounts are converted exactly as lattice
+    # amounts are
+
+    def __init__(self, phase_set: SolidPhaseSet, volumes: Dict[str, float]) -> None:
+        super().__init__(phase_set)
+        self._volumes = volumes
+
+    def get_all_absolute_phase_volumes(self):
+        return dict(self._volumes)
+
+
+class MeanFieldState():
+    """The composition of a well-mixed system: the fraction of lattice sites held
+    by each phase (including free space), the volume of each phase per site, and
+    the volume of each gas evolved per site.
+    """
+
+    def __init__(self, site_fractions: Dict[str, float], volumes: Dict[str, float], gases: Dict[str, float] = None):
+        self.site_fractions = site_fractions
+        self.volumes = volumes
+        self.gases = gases if gases is not None else {}
+
+    def copy(self) -> MeanFieldState:
+        return MeanFieldState(dict(self.site_fractions), dict(self.volumes), dict(self.gases))
+
+    def site_volume(self, phase: str) -> float:
+        """The mean volume of a site holding phase.
+
+        Args:
+            phase (str): The phase
+
+        Returns:
+            float:
+        """
+        frac = self.site_fractions.get(phase, 0.0)
+        if frac <= 0:
+            return 1.0
+        return self.volumes.get(phase, 0.0) / frac
+
+    def phase_volumes(self) -> Dict[str, float]:
+        vols = { p: v for p, v in self.volumes.items() if p != FREE_SPACE and v > 0 }
+        for gas, vol in self.gases.items():
+            vols[gas] = vols.get(gas, 0.0) + vol
+        return vols
+
+
+class MeanFieldResult():
+    """The trajectory of a mean-field run, sampled at regular points of the heating
+    schedule. Amounts are reported for a lattice of num_sites sites so that they
+    can be compared directly with lattice results.
+    """
+
+    def __init__(self,
+                 phase_set: SolidPhaseSet,
+                 times: List[float],
+                 states: List[MeanFieldState],
+                 temperatures: List[int],
+                 num_sites: int):
+        """
+        Args:
+            phase_set (SolidPhaseSet): The phases in the system
+            times (List[float]): The time of each sample, in schedule steps
+            states (List[MeanFieldState]): The state at each sample
+            temperatures (List[int]): The temperature at each sample
+            num_sites (int): The number of lattice sites amounts are scaled to
+        """
+        self.phase_set = phase_set
+        self.times = times
+        self.states = states
+        self.temperatures = temperatures
+        self.num_sites = num_sites
+
+    def __len__(self):
+        return len(self.times)
+
+    def get_phase_volumes(self, idx: int) -> Dict[str, float]:
+        return { p: v * self.num_sites for p, v in self.states[idx].phase_volumes().items() }
+
+    def get_values(self,
+                   quantity: AnalysisQuantity = AnalysisQuantity.MOLES,
+                   mode: AnalysisMode = AnalysisMode.FRACTIONAL,
+                   include_matter_phases: List[MatterPhase] = None) -> List[Dict[str, float]]:
+        """The amount of each phase at every sample, computed as ReactionStepAnalyzer
+        computes it for a lattice state.
+
+        Args:
+            quantity (AnalysisQuantity, optional): The quantity. Defaults to MOLES.
+            mode (AnalysisMode, optional): Absolute or fractional. Defaults to FRACTIONAL.
+            include_matter_phases (List[MatterPhase], optional): If provided, only phases
+            in these states of matter (at the sample's temperature) are included.
+
+        Returns:
+            List[Dict[str, float]]:
+        """
+        return [
+            _VolumeAnalyzer(self.phase_set, self.get_phase_volumes(idx)).get_value_general(
+                quantity,
+                mode,
+                include_matter_phases=include_matter_phases,
+                temperature=self.temperatures[idx]
+            ) for idx in range(len(self))
+        ]
+
+    def values_at(self,
+                  time: float,
+                  quantity: AnalysisQuantity = AnalysisQuantity.MOLES,
+                  mode: AnalysisMode = AnalysisMode.FRACTIONAL) -> Dict[str, float]:
+        """The amount of each phase at the sample nearest to time.
+
+        Args:
+            time (float): The time, in schedule steps
+
+        Returns:
+            Dict[str, float]:
+        """
+        idx = int(np.argmin(np.abs(np.array(self.times) - time)))
+        return _VolumeAnalyzer(self.phase_set, self.get_phase_volumes(idx)).get_value_general(quantity, mode)
+
+    def get_traces(self,
+                   trace_config: PhaseTraceConfig,
+                   quantity: AnalysisQuantity = AnalysisQuantity.MOLES,
+                   mode: AnalysisMode = AnalysisMode.FRACTIONAL,
+                   matter_phases: List[MatterPhase] = [MatterPhase.SOLID, MatterPhase.LIQUID]) -> List[PhaseTrace]:
+        """Builds phase traces the same way PhaseTraceCalculator does for lattice results.
+
+        Args:
+            trace_config (PhaseTraceConfig): Which phases to include
+
+        Returns:
+            List[PhaseTrace]:
+        """
+        analyses = self.get_values(quantity, mode, include_matter_phases=matter_phases)
+        return PhaseTraceCalculator(None, None).get_traces(analyses, trace_config)
+
+
+class MeanFieldSolver():
+    """Evolves the composition of a well-mixed system with the same update rule as
+    LiquidSwapController and ReactionCalculator, averaged over the neighborhood.
+
+    Every site is assumed to see neighbors drawn at random from the whole system, so
+    the expected outcome of an update at a site of phase A is a function of the
+    site fractions alone. Each schedule step (one update per site) then moves
+    expected amounts of sites and volume between phases:
+
+    1. With probability swap_chance(T / Tm_A) the site swaps instead of reacting,
+    which does not change the composition.
+    2. Otherwise one neighbor is looked at (ReactionCalculator only keeps the
+    interactions with the last of its shuffled neighbors), which holds phase B with
+    probability x_B. An interaction is chosen with probability proportional to its
+    score among those open with B (with B and a gas from the atmosphere, with the
+    atmosphere if B is free space, or with B alone), decomposition of the site, and
+    doing nothing (twice the inertia).
+    3. A reaction is chosen in proportion to competitiveness, and each site in the
+    interaction converts with probability (stoichiometric fraction / site volume)
+    to a product chosen in proportion to its stoichiometry. Gaseous products are
+    counted as evolved gas and leave the site as it was.
+
+    The resulting ordinary differential equations are integrated with substeps
+    explicit Euler steps per schedule step.
+    """
+
+    def __init__(self,
+                 reaction_lib: ReactionLibrary,
+                 inertia: float = 2.0,
+                 atmospheric_species: List[str] = None,
+                 substeps: int = 20):
+        """
+        Args:
+            reaction_lib (ReactionLibrary): The reactions available at each temperature
+            inertia (float, optional): The score of doing nothing, as in ReactionCalculator.
+            Defaults to 2.0.
+            atmospheric_species (List[str], optional): Gases supplied by the atmosphere.
+            Defaults to the atmospheric phases of each recipe passed to run, or to none
+            for run_schedule. If provided, run raises for recipes with a different
+            atmosphere.
+            substeps (int, optional): Integration steps per schedule step. Defaults to 20.
+        """
+        self.reaction_lib = reaction_lib
+        self.phase_set: SolidPhaseSet = reaction_lib.phases
+        self.inertia = inertia
+        self.atmospheric_species = list(atmospheric_species) if atmospheric_species is not None else None
+        # Scores interactions exactly as the lattice update rule does
+        self.reaction_calculator = ReactionCalculator(None, inertia=inertia, atmospheric_species=self.atmospheric_species or [])
+        self.substeps = substeps
+
+    def get_initial_state(self, reactant_amounts: Dict[str, float], packing_fraction: float = 1.0) -> MeanFieldState:
+        """The state corresponding to SetupRandomNoise: precursors fill packing_fraction
+        of the sites in proportion to their volumes, each site holding a volume of 1.
+
+        Args:
+            reactant_amounts (Dict[str, float]): The molar amounts of the precursors
+            packing_fraction (float, optional): Defaults to 1.0.
+
+        Returns:
+            MeanFieldState:
+        """
+        vols = self.phase_set.mole_amts_to_vols(reactant_amounts)
+        total = sum(vols.values())
+        site_fractions = { p: v / total * packing_fraction for p, v in vols.items() }
+        site_fractions[FREE_SPACE] = 1 - packing_fraction
+        volumes = { p: f for p, f in site_fractions.items() if p != FREE_SPACE }
+        return MeanFieldState(site_fractions, volumes)
+
+    def run(self, recipe: ReactionRecipe, samples_per_step: int = 1) -> MeanFieldResult:
+        """Runs a recipe's heating schedule from its precursors.
+
+        Args:
+            recipe (ReactionRecipe): The recipe to run
+            samples_per_step (int, optional): The number of samples recorded per schedule
+            step. Defaults to 1.
+
+        Returns:
+            MeanFieldResult:
+        """
+        atmosphere = recipe.atmospheric_phases
+        if self.atmospheric_species is not None and set(self.atmospheric_species) != set(atmosphere):
+            raise ValueError(f"The solver's atmosphere {self.atmospheric_species} does not match the recipe's {atmosphere}")
+
+        state = self.get_initial_state(recipe.reactant_amounts, recipe.packing_fraction)
+        return self.run_schedule(
+            state,
+            recipe.heating_schedule,
+            num_sites=recipe.simulation_size ** 3,
+            samples_per_step=samples_per_step,
+            atmospheric_species=atmosphere
+        )
+
+    def run_schedule(self,
+                     state: MeanFieldState,
+                     heating_schedule: HeatingSchedule,
+                     num_sites: int = 15 ** 3,
+                     samples_per_step: int = 1,
+                     atmospheric_species: List[str] = None) -> MeanFieldResult:
+        """Runs a heating schedule from a given state.
+
+        Args:
+            state (MeanFieldState): The starting state
+            heating_schedule (HeatingSchedule): The schedule to follow
+            num_sites (int, optional): The lattice size amounts are reported for.
+            samples_per_step (int, optional): Samples recorded per schedule step.
+            atmospheric_species (List[str], optional): Gases supplied by the atmosphere.
+            Defaults to the solver's.
+
+        Returns:
+            MeanFieldResult:
+        """
+        if atmospheric_species is None:
+            atmospheric_species = self.atmospheric_species or []
+        self.reaction_calculator.atmospheric_species = list(atmospheric_species)
+
+        state = state.copy()
+        time = 0.0
+        first_temp = next((s.temperature for s in heating_schedule.temperature_steps), None)
+
+        times = [time]
+        states = [state.copy()]
+        temps = [first_temp]
+
+        substeps_per_sample = max(1, self.substeps // samples_per_step)
+        dt = 1 / self.substeps
+
+        for segment in heating_schedule.compile():
+            if isinstance(segment, RegrindStep):
+                state = self._regrind(state)
+                times.append(time)
+                states.append(state.copy())
+                temps.append(temps[-1])
+                continue
+
+            self.reaction_calculator.set_rxn_set(self.reaction_lib.get_rxns_at_temp(segment.temperature))
+            num_substeps = int(round(segment.duration * self.substeps))
+            for substep in range(num_substeps):
+                self._step(state, segment.temperature, dt)
+                time += dt
+                if (substep + 1) % substeps_per_sample == 0 or substep == num_substeps - 1:
+                    times.append(time)
+                    states.append(state.copy())
+                    temps.append(segment.temperature)
+
+        return MeanFieldResult(self.phase_set, times, states, temps, num_sites)
+
+    def _regrind(self, state: MeanFieldState) -> MeanFieldState:
+        # As in HeatingScheduleRunner: phases above 1% of the moles are laid out on a
+        # fresh, fully packed lattice and the evolved gases are forgotten
+        moles = _VolumeAnalyzer(self.phase_set, state.phase_volumes()).get_all_mole_fractions()
+        kept = { p: amt for p, amt in moles.items() if amt > 0.01 and not self.phase_set.is_gas(p) }
+        return self.get_initial_state(kept, 1.0)
+
+    def _step(self, state: MeanFieldState, temperature: int, dt: float) -> None:
+        d_sites: Dict[str, float] = {}
+        d_vols: Dict[str, float] = {}
+        d_gases: Dict[str, float] = {}
+
+        def convert(phase: str, rate: float, rxn: ScoredReaction):
+            # rate sites of phase take part in rxn; each converts with the probability
+            # ReactionCalculator.should_reaction_proceed gives it
+            site_vol = state.site_volume(phase)
+            proceed = min(1.0, rxn.solid_reactant_stoich_fraction(phase) / site_vol)
+            if proceed <= 0:
+                return
+
+            products = list(rxn.products)
+            stoichs = np.array([rxn.product_stoich(p) for p in products])
+            for product, p_prob in zip(products, stoichs / stoichs.sum()):
+                converted = rate * proceed * p_prob
+                product_vol = rxn.convert_reactant_amt_to_product_amt(phase, site_vol, product)
+                if self.phase_set.is_gas(product):
+                    d_gases[product] = d_gases.get(product, 0.0) + converted * product_vol
+                    continue
+
+                d_sites[phase] = d_sites.get(phase, 0.0) - converted
+                d_vols[phase] = d_vols.get(phase, 0.0) - converted * site_vol
+                d_sites[product] = d_sites.get(product, 0.0) + converted
+                d_vols[product] = d_vols.get(product, 0.0) + converted * product_vol
+
+        for phase, frac in list(state.site_fractions.items()):
+            if phase == FREE_SPACE or frac <= 0:
+                continue
+
+            react_prob = 1 - swap_chance(temperature / self.phase_set.get_melting_point(phase))
+            for nb_phase, nb_frac in state.site_fractions.items():
+                if nb_frac <= 0:
+                    continue
+
+                total, interactions = self.reaction_calculator.phase_interactions(phase, nb_phase)
+                for score, with_neighbor, rxns in interactions:
+                    rate = frac * react_prob * nb_frac * score / total
+                    comps = np.array([r.competitiveness for r in rxns])
+                    for rxn, r_prob in zip(rxns, comps / comps.sum()):
+                        convert(phase, rate * r_prob, rxn)
+                        if with_neighbor:
+                            convert(nb_phase, rate * r_prob, rxn)
+
+        # Scale the step down if it would empty any phase
+        scale = 1.0
+        for phase, change in d_sites.items():
+            frac = state.site_fractions.get(phase, 0.0)
+            if change * dt < -frac and change < 0:
+                scale = min(scale, frac / (-change * dt))
+
+        for phase, change in d_sites.items():
+            state.site_fractions[phase] = max(0.0, state.site_fractions.get(phase, 0.0) + change * dt * scale)
+        for phase, change in d_vols.items():
+            state.volumes[phase] = max(0.0, state.volumes.get(phase, 0.0) + change * dt * scale)
+        for gas, change in d_gases.items():
+            state.gases[gas] = state.gases.get(gas, 0.0) + change * dt * scale
+
+
+def get_calibration_report(mean_field_result: MeanFieldResult,
+                           lattice_results: List,
+                           phase_set: SolidPhaseSet,
+                           quantity: AnalysisQuantity = AnalysisQuantity.MOLES,
+                           mode: AnalysisMode = AnalysisMode.FRACTIONAL,
+                           num_points: int = 50) -> Dict:
+    """Compares a mean-field trajectory with lattice realizations of the same recipe.
+    The lattice amounts are averaged over the realizations at up to num_points steps,
+    and each step is matched with the mean-field sample nearest to it in schedule
+    time (one schedule step being one update per site).
+
+    Args:
+        mean_field_result (MeanFieldResult): The mean-field trajectory
+        lattice_results (List[ReactionResult]): The lattice realizations
+        phase_set (SolidPhaseSet): The phases in the simulations
+        quantity (AnalysisQuantity, optional): The quantity compared. Defaults to MOLES.
+        mode (AnalysisMode, optional): Absolute or fractional. Defaults to FRACTIONAL.
+        num_points (int, optional): The number of steps compared. Defaults to 50.
+
+    Returns:
+        Dict: Per phase, the root mean square and largest absolute error over the
+        trajectory and the final amounts in both, plus the largest of each error
+        over all phases
+    """
+    from ..analysis.ensemble_aggregator import EnsembleAggregator, get_sample_step_idxs
+
+    step_idxs = get_sample_step_idxs(len(lattice_results[0]), num_points)
+    agg = EnsembleAggregator(phase_set, step_idxs, quantity=quantity, mode=mode, quantiles=())
+    for result in lattice_results:
+        agg.add_result(result)
+
+    num_sites = agg.num_sites
+    times = [idx / num_sites for idx in step_idxs]
+    mf_values = [mean_field_result.values_at(t, quantity, mode) for t in times]
+
+    phases = set(agg.phases)
+    for values in mf_values:
+        phases.update([p for p, v in values.items() if v > 0])
+
+    report = { "phases": {} }
+    for phase in sorted(phases):
+        lattice = agg.mean(phase)
+        mean_field = np.array([v.get(phase, 0.0) for v in mf_values])
+        errors = mean_field - lattice
+        report["phases"][phase] = {
+            "rmse": float(np.sqrt(np.mean(errors ** 2))),
+            "max_abs_error": float(np.max(np.abs(errors))),
+            "final_lattice": float(lattice[-1]),
+            "final_mean_field": float(mean_field[-1]),
+        }
+
+    report["num_realizations"] = agg.num_realizations
+    report["max_rmse"] = max([p["rmse"] for p in report["phases"].values()], default=0.0)
+    report["max_abs_error"] = max([p["max_abs_error"] for p in report["phases"].values()], default=0.0)
+    return report
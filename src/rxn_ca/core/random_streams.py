@@ -0,0 +1,63 @@
+import numpy as np
+import random
+
+from typing import Dict
+
+# Each source of randomness in the update rule draws from its own stream
+SITE_SELECTION = "site_selection"
+SWAPS = "swaps"
+INTERACTIONS = "interactions"
+REACTIONS = "reactions"
+REGRINDS = "regrinds"
+
+# The order matters: stream i is seeded with the i-th child of the root seed, so
+# new streams are only ever appended
+STREAM_NAMES = (SITE_SELECTION, SWAPS, INTERACTIONS, REACTIONS, REGRINDS)
+
+class RandomStreams():
+    """A set of independent, seeded random number generators, one for each source
+    of randomness in the automaton (which site is updated next, whether and where
+    a liquid site swaps, which interaction a site takes part in, how the chosen
+    reaction proceeds, and how a reground sample is laid out).
+
+    Two simulations given streams with the same seed visit sites in the same order
+    even if their update rules make different choices (e.g. because they run at
+    different temperatures), since one stream running ahead of the other does not
+    shift the rest. This is what makes paired comparisons between recipes
+    (common random numbers) low in variance.
+    """
+
+    def __init__(self, seed: int = None):
+        """
+        Args:
+            seed (int, optional): The root seed. If None, fresh entropy is used.
+        """
+        self.seed = seed
+        children = np.random.SeedSequence(seed).spawn(len(STREAM_NAMES))
+        self._generators: Dict[str, np.random.Generator] = {
+            name: np.random.default_rng(child) for name, child in zip(STREAM_NAMES, children)
+        }
+
+    def get(self, name: str) -> np.random.Generator:
+        return self._generators[name]
+
+    def get_state(self) -> Dict:
+        return { name: gen.bit_generator.state for name, gen in self._generators.items() }
+
+    def set_state(self, state: Dict) -> None:
+        for name, gen_state in state.items():
+            self._generators[name].bit_generator.state = gen_state
+
+
+def seed_global_generators(seed: int = None) -> None:
+    """Reseeds numpy's and Python's global random number generators, which the
+    automaton draws from when it isn't given RandomStreams. Processes forked from
+    the same parent inherit its numpy state, so each realization run in a worker
+    must call this before starting, or the realizations would make the same choices.
+
+    Args:
+        seed (int, optional): The seed. If None, fresh entropy is used.
+    """
+    state = np.random.SeedSequence(seed).generate_state(2)
+    np.random.seed(state)
+    random.seed((int(state[0]) << 32) | int(state[1]))
@@ -13,17 +13,18 @@ from .normalizers import normalize
 from ..phases.solid_phase_set import SolidPhaseSet
 from .reaction_result import ReactionResult
 from .constants import VOLUME, GASES_EVOLVED, REACTION_CHOSEN
+from .random_streams import RandomStreams, INTERACTIONS, REACTIONS
 from ..reactions import ScoredReactionSet, ScoredReaction
 
 from dataclasses import dataclass, field
 from copy import copy
 
-def choose_from_list(choices, scores):
+def choose_from_list(choices, scores, rng = np.random):
     scores: np.array = np.array(scores)
     normalized: np.array = normalize(scores)
     idxs: np.array = np.array(range(0,len(choices)))
 
-    chosen_idx = np.random.choice(idxs, p=normalized)
+    chosen_idx = rng.choice(idxs, p=normalized)
 
     return choices[chosen_idx]    
 
@@ -49,11 +50,37 @@ class ReactionCalculator():
         scored_rxns: ScoredReactionSet = None,
         inertia = 2.0,
         atmospheric_species = [],
+        random_streams: RandomStreams = None,
     ) -> None:
         self.rxn_set = scored_rxns
         self.inertia = inertia
         self.neighborhood_graph = neighborhood_graph
+        self._neighbors: Dict[int, Tuple[Tuple[int, float], ...]] = {}
         self.atmospheric_species = copy(atmospheric_species)
+        # Without streams, the global random and numpy.random generators are used
+        self.random_streams = random_streams
+
+    def _get_rng(self, stream: str):
+        if self.random_streams is None:
+            return np.random
+        return self.random_streams.get(stream)
+
+    def neighbors_of(self, site_id: int) -> Tuple[Tuple[int, float], ...]:
+        """Returns the (neighbor id, distance) pairs of a site, sorted by neighbor id.
+        The graph reports neighbors in an order that changes from call to call, so
+        they are sorted once per site and cached.
+
+        Args:
+            site_id (int): The site of interest
+
+        Returns:
+            Tuple[Tuple[int, float], ...]:
+        """
+        neighbors = self._neighbors.get(site_id)
+        if neighbors is None:
+            neighbors = tuple(sorted(self.neighborhood_graph.neighbors_of(site_id, include_weights=True)))
+            self._neighbors[site_id] = neighbors
+        return neighbors
 
     def set_rxn_set(self, rxn_set: ScoredReactionSet):
         self.rxn_set = rxn_set
@@ -67,19 +94,31 @@ class ReactionCalculator():
 
         if selected_interaction.is_no_op:
             return updates
-        
-        updates[GENERAL] = {}
-        updates[SITES] = {}
 
         # Select a reaction - recall the convex reaction hull: there are often
         # many possible reactions between two precursors
         rxns: List[ScoredReaction] = selected_interaction.reactions
-        selected_reaction: ScoredReaction = choose_from_list(rxns, [rxn.competitiveness for rxn in rxns])
-        selected_reaction_id: int = self.rxn_set.get_rxn_id(selected_reaction)
-        updates[GENERAL][REACTION_CHOSEN] = selected_reaction_id
+        selected_reaction: ScoredReaction = choose_from_list(rxns, [rxn.competitiveness for rxn in rxns], self._get_rng(REACTIONS))
+        return self.get_reaction_update(selected_reaction, selected_interaction.site_states, prev_state)
+
+    def get_reaction_update(self, selected_reaction: ScoredReaction, site_states: List[Dict], prev_state: SimulationState):
+        """Proceeds a reaction at each of the sites taking part in it.
+
+        Args:
+            selected_reaction (ScoredReaction): The reaction
+            site_states (List[Dict]): The states of the participating sites
+            prev_state (SimulationState): The state the sites belong to
+
+        Returns:
+            Dict: The updates to apply
+        """
+        updates = {}
+        updates[GENERAL] = {}
+        updates[SITES] = {}
+        updates[GENERAL][REACTION_CHOSEN] = selected_reaction.rxn_id
 
         # Proceed this reaction at all relevant site states
-        for site_state in selected_interaction.site_states:
+        for site_state in site_states:
             site_species = site_state[DISCRETE_OCCUPANCY]
             site_vol     = site_state[VOLUME]
             site_id      = site_state[SITE_ID]
@@ -118,15 +157,25 @@ class ReactionCalculator():
         # Look through neighborhood, enumerate possible reactions
         possible_interactions = []
 
+        neighbors = self.neighbors_of(site_one_id)
+
         any_neighboring_free_space = False
-        for nb_id in self.neighborhood_graph.neighbors_of(site_one_id, include_weights=False):
+        for nb_id, _ in neighbors:
             site_two_state = state.get_site_state(nb_id)
             site_two_phase = site_two_state[DISCRETE_OCCUPANCY]
             if site_two_phase is SolidPhaseSet.FREE_SPACE:
                 any_neighboring_free_space = True
 
 
-        for nb_id, distance in self.neighborhood_graph.neighbors_of(site_one_id, include_weights=True):
+        # The order in which neighbors are visited is drawn from the random module
+        # rather than left to the graph, which cannot be seeded
+        neighbors = list(neighbors)
+        if self.random_streams is None:
+            random.shuffle(neighbors)
+        else:
+            self.random_streams.get(INTERACTIONS).shuffle(neighbors)
+
+        for nb_id, distance in neighbors:
             site_two_state = state.get_site_state(nb_id)
             site_two_phase = site_two_state[DISCRETE_OCCUPANCY]
             interactions = []
@@ -193,6 +242,43 @@ class ReactionCalculator():
 
         return possible_interactions
 
+    def phase_interactions(self, site_phase: str, nb_phase: str) -> Tuple[float, List[Tuple[float, bool, List[ScoredReaction]]]]:
+        """The interactions possible_interactions_at_site offers a site of site_phase
+        whose (last) neighbor, at distance 1, holds nb_phase.
+
+        Args:
+            site_phase (str): The phase at the site
+            nb_phase (str): The phase at the neighboring site
+
+        Returns:
+            Tuple[float, List[Tuple[float, bool, List[ScoredReaction]]]]: The total score,
+            including doing nothing, and for each interaction its score, whether the
+            neighbor takes part in it and its reactions
+        """
+        interactions = []
+
+        for spec in self.atmospheric_species:
+            rxns = self.rxn_set.get_reactions([site_phase, nb_phase, spec])
+            if len(rxns) > 0:
+                interactions.append((rxns[0].competitiveness, nb_phase != SolidPhaseSet.FREE_SPACE, rxns))
+
+        if nb_phase == SolidPhaseSet.FREE_SPACE:
+            for spec in self.atmospheric_species:
+                rxns = self.rxn_set.get_reactions([site_phase, spec])
+                if len(rxns) > 0:
+                    interactions.append((rxns[0].competitiveness, False, rxns))
+
+        rxns = self.rxn_set.get_reactions([nb_phase, site_phase])
+        if len(rxns) > 0:
+            interactions.append((rxns[0].competitiveness, True, rxns))
+
+        decomp_rxns = self.rxn_set.get_reactions([site_phase])
+        if len(decomp_rxns) > 0:
+            interactions.append((decomp_rxns[0].competitiveness, False, decomp_rxns))
+
+        total = 2 * self.inertia + sum([i[0] for i in interactions])
+        return total, interactions
+
     def atmospheric_interactions(self, site_state: Dict):
         site_phase = site_state[DISCRETE_OCCUPANCY]
         interactions = []
@@ -214,7 +300,7 @@ class ReactionCalculator():
         scores: list[float] = [
             interaction.score for interaction in interactions
         ]
-        return choose_from_list(interactions, scores)
+        return choose_from_list(interactions, scores, self._get_rng(INTERACTIONS))
     
     def should_reaction_proceed(self, rxn: ScoredReaction, reactant_phase: str, reactant_vol: float) -> Dict:
         stoich_fraction = rxn.solid_reactant_stoich_fraction(reactant_phase)
@@ -222,13 +308,15 @@ class ReactionCalculator():
         # the size of that cell - it should take twice as many "tries" to consume twice as much
         # volume
         adjusted = stoich_fraction / reactant_vol
-        return random.random() < adjusted
+        if self.random_streams is None:
+            return random.random() < adjusted
+        return self.random_streams.get(REACTIONS).random() < adjusted
     
     def get_product_from_reaction(self, rxn: ScoredReaction) -> Dict:
         products = list(rxn.products)
         product_stoich_coeffs = np.array([rxn.product_stoich(p) for p in products])
         likelihoods: np.array = product_stoich_coeffs / product_stoich_coeffs.sum()
-        new_phase_name = str(np.random.choice(products, p=likelihoods))
+        new_phase_name = str(self._get_rng(REACTIONS).choice(products, p=likelihoods))
         return new_phase_name
 
     def adjust_score_for_distance(self, score, distance):
@@ -1,6 +1,11 @@
+from __future__ import annotations
+
 from pylattica.core import SimulationState, SimulationResult
 from pylattica.core.constants import SITES, GENERAL
 
+from bisect import bisect_right
+from typing import List, Tuple
+
 class ReactionResult(SimulationResult):
     """A class that stores the result of running a simulation. Keeps track of all
     the steps that the simulation proceeded through, and the set of reactions that
@@ -19,6 +24,7 @@ class ReactionResult(SimulationResult):
             if GENERAL not in diff and SITES not in diff:
                 diff = { int(k): v for k, v in diff.items() }
             res.add_step(diff)
+        res.metadata = res_dict.get("metadata", {})
         return res
 
     def __init__(self,
@@ -29,4 +35,188 @@ class ReactionResult(SimulationResult):
             rxn_set (ScoredReactionSet):
         """
         super().__init__(starting_state)
-    
\ No newline at end of file
+        self.metadata = {}
+
+    def as_dict(self):
+        return {
+            **super().as_dict(),
+            "metadata": self.metadata,
+        }
+    
+
+class _ChainedDiffs():
+    # A read-only sequence view of the diffs of a ChainedReactionResult. The first
+    # diff of every stage after the first is the full state that stage started
+    # from, which is what concatenating the stage results used to produce. Held
+    # steps after a stage are empty diffs.
+
+    def __init__(self, chain: ChainedReactionResult):
+        self._chain = chain
+
+    def __len__(self):
+        return len(self._chain) - 1
+
+    def __getitem__(self, idx):
+        if idx < 0:
+            idx += len(self)
+        if idx < 0 or idx >= len(self):
+            raise IndexError("diff index out of range")
+
+        stage_idx, local_step = self._chain._locate(idx + 1)
+        stage = self._chain.stages[stage_idx]
+        if local_step == 0:
+            return stage.first_step.as_state_update()
+        if local_step >= len(stage):
+            return {}
+        return stage._diffs[local_step - 1]
+
+    def __iter__(self):
+        for stage_idx, (stage, held) in enumerate(zip(self._chain.stages, self._chain.held_steps)):
+            if stage_idx > 0:
+                yield stage.first_step.as_state_update()
+            yield from stage._diffs
+            for _ in range(held):
+                yield {}
+
+
+class ChainedReactionResult():
+    """Presents the results of several consecutive simulation stages (e.g. the
+    segments of a heating schedule) as a single result with one step timeline,
+    without copying any of their diffs. Step 0 is the initial state of the first
+    stage, and each stage's steps follow the previous stage's, starting with the
+    state the stage started from.
+
+    A stage that was cut short because nothing was changing any more can be
+    followed by a number of held steps, which repeat its final state without
+    being stored, so that step indices still line up with the heating schedule.
+    """
+
+    @classmethod
+    def from_dict(cls, res_dict):
+        res = cls(
+            [ReactionResult.from_dict(stage) for stage in res_dict["stages"]],
+            held_steps=res_dict.get("held_steps"),
+        )
+        res.metadata = res_dict.get("metadata", {})
+        return res
+
+    def __init__(self, stages: List[ReactionResult], held_steps: List[int] = None):
+        """
+        Args:
+            stages (List[ReactionResult]): The results of each stage, in order
+            held_steps (List[int], optional): The number of held steps following each
+            stage. Defaults to none.
+        """
+        if len(stages) == 0:
+            raise ValueError("ChainedReactionResult requires at least one stage")
+
+        if held_steps is None:
+            held_steps = [0 for _ in stages]
+
+        if len(held_steps) != len(stages):
+            raise ValueError("held_steps must have one entry per stage")
+
+        self.stages = stages
+        self.held_steps = held_steps
+        self.metadata = {}
+        self._stored_states = {}
+
+        # The global step index at which each stage starts
+        self._offsets = []
+        total = 0
+        for stage, held in zip(stages, held_steps):
+            self._offsets.append(total)
+            total += len(stage) + held
+        self._length = total
+
+    def _locate(self, step_no: int) -> Tuple[int, int]:
+        if step_no < 0:
+            step_no += len(self)
+        if step_no < 0 or step_no >= len(self):
+            raise IndexError(f"Step {step_no} is out of range for a result with {len(self)} steps")
+
+        stage_idx = bisect_right(self._offsets, step_no) - 1
+        return stage_idx, step_no - self._offsets[stage_idx]
+
+    def stage_offset(self, stage_idx: int) -> int:
+        """Returns the global step index of the first step of a stage.
+
+        Args:
+            stage_idx (int): The index of the stage
+
+        Returns:
+            int:
+        """
+        return self._offsets[stage_idx]
+
+    def __len__(self) -> int:
+        return self._length
+
+    @property
+    def initial_state(self) -> SimulationState:
+        return self.stages[0].initial_state
+
+    @property
+    def first_step(self) -> SimulationState:
+        return self.stages[0].first_step
+
+    @property
+    def last_step(self) -> SimulationState:
+        return self.stages[-1].last_step
+
+    @property
+    def output(self) -> SimulationState:
+        return self.stages[-1].output
+
+    @property
+    def earliest_available_step(self) -> int:
+        return 0
+
+    @property
+    def compress_freq(self) -> int:
+        return 1
+
+    @property
+    def _diffs(self) -> _ChainedDiffs:
+        return _ChainedDiffs(self)
+
+    def get_diffs(self) -> _ChainedDiffs:
+        return self._diffs
+
+    def get_step(self, step_no: int) -> SimulationState:
+        stored = self._stored_states.get(step_no)
+        if stored is not None:
+            return stored
+
+        stage_idx, local_step = self._locate(step_no)
+        stage = self.stages[stage_idx]
+        return stage.get_step(min(local_step, len(stage) - 1))
+
+    def steps(self):
+        for stage, held in zip(self.stages, self.held_steps):
+            step = None
+            for step in stage.steps():
+                yield step
+            for _ in range(held):
+                yield step
+
+    def load_steps(self, interval: int = 1):
+        """Stores every interval-th step (counted on the global timeline) in memory
+        so that get_step can return it without replaying diffs.
+
+        Args:
+            interval (int, optional): Defaults to 1.
+        """
+        self._stored_states = {}
+        for step_no, step in enumerate(self.steps()):
+            if step_no % interval == 0:
+                self._stored_states[step_no] = step
+
+    def as_dict(self):
+        return {
+            "@module": self.__class__.__module__,
+            "@class": self.__class__.__name__,
+            "stages": [stage.as_dict() for stage in self.stages],
+            "held_steps": self.held_steps,
+            "metadata": self.metadata,
+        }
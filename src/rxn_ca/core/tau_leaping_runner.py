@@ -0,0 +1,358 @@
+from pylattica.core import SimulationState
+from pylattica.core.constants import GENERAL, SITES
+from pylattica.core.runner.common import merge_updates
+from pylattica.discrete.state_constants import DISCRETE_OCCUPANCY
+
+from .liquid_swap_controller import LiquidSwapController, swap_chance
+from .reaction_calculator import choose_from_list
+from .reaction_result import ReactionResult
+from .random_streams import INTERACTIONS, REACTIONS
+from ..phases.solid_phase_set import SolidPhaseSet
+
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+from tqdm import tqdm
+import numpy as np
+
+FREE_SPACE = SolidPhaseSet.FREE_SPACE
+
+@dataclass
+class EventClass:
+    # Visits to a site of site_phase whose chosen neighbor holds nb_phase that
+    # select one interaction, or swaps of a site of site_phase if reactions is None.
+    # rate is the expected number per site visit. Events happen at sites[i] (and
+    # its neighbor nbs[i]) for a random i.
+
+    rate: float
+    site_phase: str
+    nb_phase: str
+    sites: np.ndarray
+    nbs: np.ndarray = None
+    with_neighbor: bool = False
+    reactions: list = None
+
+    @property
+    def is_swap(self):
+        return self.reactions is None
+
+
+class LatticeIndex():
+    """The neighbor lists of a structure as flat arrays, so that the interfaces
+    between phases can be counted with numpy.
+    """
+
+    def __init__(self, neighborhood_graph, site_ids: List[int]):
+        self.site_ids = np.array(sorted(site_ids))
+        idx_of = { site_id: idx for idx, site_id in enumerate(self.site_ids) }
+
+        # Sorted so that the choice of neighbor depends only on the state of the generator
+        self.neighbors = { site_id: sorted(neighborhood_graph.neighbors_of(site_id)) for site_id in self.site_ids.tolist() }
+        degrees = np.array([len(self.neighbors[site_id]) for site_id in self.site_ids.tolist()])
+
+        # One entry per (site, neighbor) pair
+        self.src = np.repeat(np.arange(len(self.site_ids)), degrees)
+        self.dst = np.array([idx_of[nb] for site_id in self.site_ids.tolist() for nb in self.neighbors[site_id]], dtype=int)
+        self.visit_weights = 1 / degrees[self.src]
+
+    def __len__(self):
+        return len(self.site_ids)
+
+
+class TauLeapingRunner():
+    """Runs a LiquidSwapController approximately by tau-leaping. Instead of visiting
+    sites one at a time, the runner counts the interfaces between every pair of
+    phases, computes the expected number of times each (phase pair, interaction)
+    class fires over a slice of site visits, and draws the actual number of events
+    from Poisson distributions. The events are applied at randomly chosen matching
+    interfaces.
+
+    The slice length is chosen so that the expected change in the number of sites
+    of every phase is at most epsilon times that number (or one site, for rare
+    phases). When a slice would hold fewer than min_leap_events events, the runner
+    falls back to exact stepping for exact_visits visits.
+
+    Results keep one step per site visit, so they line up with the schedule like
+    those of AsynchronousRunner: the events of a slice are placed at random visits
+    within it and the other visits are recorded as empty steps.
+    """
+
+    def __init__(self,
+                 epsilon: float = 0.03,
+                 min_leap_events: int = 10,
+                 exact_visits: int = None,
+                 max_leap: int = None):
+        """
+        Args:
+            epsilon (float, optional): The largest relative change in the amount of any
+            phase allowed over one slice. Defaults to 0.03.
+            min_leap_events (int, optional): Slices expected to hold fewer events than this
+            are run exactly instead. Defaults to 10.
+            exact_visits (int, optional): The number of visits run exactly at a time.
+            Defaults to a tenth of the number of sites.
+            max_leap (int, optional): The longest slice, in site visits. Defaults to the
+            number of sites (one schedule step).
+        """
+        self.epsilon = epsilon
+        self.min_leap_events = min_leap_events
+        self.exact_visits = exact_visits
+        self.max_leap = max_leap
+
+    def as_dict(self):
+        return {
+            "epsilon": self.epsilon,
+            "min_leap_events": self.min_leap_events,
+            "exact_visits": self.exact_visits,
+            "max_leap": self.max_leap,
+        }
+
+    def run(self,
+            initial_state: SimulationState,
+            controller: LiquidSwapController,
+            num_steps: int,
+            verbose: bool = False) -> ReactionResult:
+        """Runs the simulation for num_steps site visits.
+
+        Args:
+            initial_state (SimulationState): The starting state
+            controller (LiquidSwapController): The controller implementing the update rule
+            num_steps (int): The number of site visits
+            verbose (bool, optional): Whether to show a progress bar. Defaults to False.
+
+        Returns:
+            ReactionResult: The result, whose metadata records under "tau_leaping" how
+            many visits were leaped and run exactly
+        """
+        result: ReactionResult = controller.instantiate_result(initial_state.copy())
+        live_state = result.live_state
+        calculator = controller.reaction_calculator
+
+        lattice = LatticeIndex(calculator.neighborhood_graph, live_state.site_ids())
+        num_sites = len(lattice)
+        exact_visits = self.exact_visits if self.exact_visits is not None else max(1, num_sites // 10)
+        max_leap = self.max_leap if self.max_leap is not None else num_sites
+        if controller.random_streams is None:
+            rng = np.random.default_rng(np.random.randint(0, 2 ** 31 - 1))
+        else:
+            rng = controller.random_streams.get(INTERACTIONS)
+
+        stats = {
+            "leaps": 0,
+            "leaped_visits": 0,
+            "exact_visits": 0,
+            "events": 0,
+            "rejected_events": 0,
+        }
+
+        visits = 0
+        with tqdm(total=num_steps, disable=(not verbose)) as progress:
+            while visits < num_steps:
+                remaining = num_steps - visits
+                classes, counts = self.get_event_classes(live_state, controller, lattice)
+                total_rate = sum([c.rate for c in classes])
+                leap = min(remaining, max_leap, self.select_leap(classes, counts))
+
+                if total_rate * leap < self.min_leap_events:
+                    num_visits = min(remaining, exact_visits)
+                    self._run_exact(result, controller, num_visits)
+                    stats["exact_visits"] += num_visits
+                else:
+                    num_visits = max(1, int(leap))
+                    events, rejected = self._leap(result, controller, classes, num_visits, lattice, rng)
+                    stats["leaps"] += 1
+                    stats["leaped_visits"] += num_visits
+                    stats["events"] += events
+                    stats["rejected_events"] += rejected
+
+                visits += num_visits
+                progress.update(num_visits)
+
+        result.metadata["tau_leaping"] = stats
+        return result
+
+    def get_event_classes(self,
+                          state: SimulationState,
+                          controller: LiquidSwapController,
+                          lattice: LatticeIndex) -> Tuple[List[EventClass], Dict[str, int]]:
+        """Enumerates the classes of events that can happen in a state, with their rates.
+
+        Args:
+            state (SimulationState): The state
+            controller (LiquidSwapController): The controller implementing the update rule
+            lattice (LatticeIndex): The neighbors of every site
+
+        Returns:
+            Tuple[List[EventClass], Dict[str, int]]: The event classes, and the number of
+            sites of each phase
+        """
+        calculator = controller.reaction_calculator
+        phase_set = calculator.rxn_set.phases
+        num_sites = len(lattice)
+
+        occupancy = [state.get_site_state(site_id)[DISCRETE_OCCUPANCY] for site_id in lattice.site_ids.tolist()]
+        phases, codes = np.unique(np.array(occupancy, dtype=object), return_inverse=True)
+        phases = phases.tolist()
+        site_counts = np.bincount(codes, minlength=len(phases))
+
+        swap_probs = {
+            phase: swap_chance(controller.temperature / phase_set.get_melting_point(phase))
+            for phase in phases if phase != FREE_SPACE
+        }
+
+        classes = []
+        for code, phase in enumerate(phases):
+            if phase in swap_probs and swap_probs[phase] > 0:
+                classes.append(EventClass(
+                    rate=site_counts[code] * swap_probs[phase] / num_sites,
+                    site_phase=phase,
+                    nb_phase=None,
+                    sites=lattice.site_ids[codes == code],
+                ))
+
+        # Group the (site, neighbor) pairs by the phases on either side
+        pair_codes = codes[lattice.src] * len(phases) + codes[lattice.dst]
+        order = np.argsort(pair_codes, kind="stable")
+        pair_types, starts, pair_counts = np.unique(pair_codes[order], return_index=True, return_counts=True)
+        # Each visit to a site looks at one of its neighbors
+        visit_rates = np.bincount(pair_codes, weights=lattice.visit_weights) / num_sites
+
+        for pair_type, start, count in zip(pair_types.tolist(), starts.tolist(), pair_counts.tolist()):
+            phase, nb_phase = phases[pair_type // len(phases)], phases[pair_type % len(phases)]
+            if phase == FREE_SPACE:
+                continue
+
+            total, interactions = calculator.phase_interactions(phase, nb_phase)
+            pairs = order[start:start + count]
+            for score, with_neighbor, rxns in interactions:
+                classes.append(EventClass(
+                    rate=visit_rates[pair_type] * (1 - swap_probs[phase]) * score / total,
+                    site_phase=phase,
+                    nb_phase=nb_phase,
+                    sites=lattice.site_ids[lattice.src[pairs]],
+                    nbs=lattice.site_ids[lattice.dst[pairs]],
+                    with_neighbor=with_neighbor,
+                    reactions=rxns,
+                ))
+
+        counts = { phase: int(site_counts[code]) for code, phase in enumerate(phases) }
+        return classes, counts
+
+    def select_leap(self, classes: List[EventClass], counts: Dict[str, int]) -> float:
+        """The longest slice, in site visits, over which the expected number of sites of
+        any phase changed by events is at most epsilon times its current number (or one
+        site).
+
+        Args:
+            classes (List[EventClass]): The event classes
+            counts (Dict[str, int]): The number of sites of each phase
+
+        Returns:
+            float:
+        """
+        change_rates: Dict[str, float] = {}
+
+        def add(phase, rate):
+            change_rates[phase] = change_rates.get(phase, 0.0) + rate
+
+        for event_class in classes:
+            if event_class.is_swap:
+                continue
+            num_sites = 2 if event_class.with_neighbor else 1
+            add(event_class.site_phase, event_class.rate)
+            if event_class.with_neighbor:
+                add(event_class.nb_phase, event_class.rate)
+            for product in set().union(*[rxn.products for rxn in event_class.reactions]):
+                add(product, event_class.rate * num_sites)
+
+        leap = float("inf")
+        for phase, rate in change_rates.items():
+            if rate > 0:
+                leap = min(leap, max(self.epsilon * counts.get(phase, 0), 1) / rate)
+        return leap
+
+    def _run_exact(self, result: ReactionResult, controller: LiquidSwapController, num_visits: int) -> None:
+        # As AsynchronousRunner does
+        for _ in range(num_visits):
+            site_id = controller.get_random_site(result.live_state)
+            updates = controller.get_state_update(site_id, result.live_state)
+            result.add_step(merge_updates(updates, site_id=site_id))
+
+    def _leap(self,
+              result: ReactionResult,
+              controller: LiquidSwapController,
+              classes: List[EventClass],
+              num_visits: int,
+              lattice: LatticeIndex,
+              rng) -> Tuple[int, int]:
+        live_state = result.live_state
+
+        events = []
+        for class_idx, event_class in enumerate(classes):
+            events.extend([class_idx] * int(rng.poisson(event_class.rate * num_visits)))
+
+        # A visit holds at most one event
+        if len(events) > num_visits:
+            events = [events[i] for i in rng.choice(len(events), num_visits, replace=False)]
+        rng.shuffle(events)
+        slots = set(int(i) for i in rng.choice(num_visits, len(events), replace=False))
+
+        rejected = 0
+        event_iter = iter(events)
+        for visit in range(num_visits):
+            if visit not in slots:
+                result.add_step({ SITES: {}, GENERAL: {} })
+                continue
+
+            event_class = classes[next(event_iter)]
+            event_idx = int(rng.integers(len(event_class.sites)))
+            site_id = int(event_class.sites[event_idx])
+            nb_id = int(event_class.nbs[event_idx]) if event_class.nbs is not None else None
+
+            # Earlier events in the slice may have changed the interface
+            stale = live_state.get_site_state(site_id)[DISCRETE_OCCUPANCY] != event_class.site_phase
+            if nb_id is not None:
+                stale = stale or live_state.get_site_state(nb_id)[DISCRETE_OCCUPANCY] != event_class.nb_phase
+            if stale:
+                rejected += 1
+                result.add_step({ SITES: {}, GENERAL: {} })
+                continue
+
+            updates = get_event_update(event_class, event_idx, live_state, controller, lattice, rng)
+            result.add_step(updates)
+
+        return len(events), rejected
+
+
+def get_event_update(event_class: EventClass,
+                     event_idx: int,
+                     state: SimulationState,
+                     controller: LiquidSwapController,
+                     lattice: LatticeIndex,
+                     rng) -> Dict:
+    """The updates made by an event of a class at its event_idx-th site.
+
+    Args:
+        event_class (EventClass): The class of the event
+        event_idx (int): The index of the event's site in event_class.sites
+        state (SimulationState): The current state
+        controller (LiquidSwapController): The controller implementing the update rule
+        lattice (LatticeIndex): The neighbors of every site
+        rng: The generator used to pick the swap partner
+
+    Returns:
+        Dict:
+    """
+    calculator = controller.reaction_calculator
+    site_id = int(event_class.sites[event_idx])
+
+    if event_class.is_swap:
+        site_nbs = lattice.neighbors[site_id]
+        other_id = site_nbs[int(rng.integers(len(site_nbs)))]
+        return { SITES: controller.get_swap_update(site_id, other_id, state), GENERAL: {} }
+
+    rxns = event_class.reactions
+    rxn = choose_from_list(rxns, [r.competitiveness for r in rxns], calculator._get_rng(REACTIONS))
+    site_states = [state.get_site_state(site_id)]
+    if event_class.with_neighbor:
+        site_states.append(state.get_site_state(int(event_class.nbs[event_idx])))
+    return merge_updates(calculator.get_reaction_update(rxn, site_states, state))
@@ -116,7 +116,9 @@ class SolidPhaseSet(PhaseSet):
                        melting_points: Dict[str, float] = None,
                        experimentally_observed: Dict[str, bool] = None,
                        phase_metadata: Dict = None):
-        phases = process_composition_list(list(set(phases)))
+        # Duplicates are dropped in order, so that the phase order (and anything
+        # hashed from it) is the same every time a phase set is loaded
+        phases = process_composition_list(list(dict.fromkeys(phases)))
         self.gas_phases: List[str] = process_composition_list(gas_phases)
         self.volumes: Dict[str, float] = process_composition_dict(volumes)
         self.melting_points: Dict[str, float] = process_composition_dict(melting_points)
@@ -124,6 +126,8 @@ class SolidPhaseSet(PhaseSet):
         self.densities: Dict[str, float] = process_composition_dict(densities)
         self.phase_metadata = phase_metadata
         super().__init__(phases)
+        # PhaseSet deduplicates through a set, which loses the order
+        self.phases: List[str] = phases
 
     def get_vol(self, phase: str) -> float:
         """Returns the molar volume associated with the supplied phase.
@@ -7,7 +7,7 @@ from ..phases.solid_phase_set import SolidPhaseSet
 from monty.json import MSONable
 
 import json
-from typing import List, Dict
+from typing import List, Dict, Set, Tuple
 
 
 class ReactionLibrary(MSONable):
@@ -30,6 +30,9 @@ class ReactionLibrary(MSONable):
                 t
             )
 
+        for t, info in d.get('provenance', {}).items():
+            library.set_provenance(t, **info)
+
         return library
     
     @classmethod
@@ -44,18 +47,87 @@ class ReactionLibrary(MSONable):
         self.lib: Dict[int, ScoredReactionSet] = {}
         self.phases = phases
         self.metadata = {}
+        self.provenance: Dict[int, Dict] = {}
+        self._rxn_ids: Dict[Tuple, int] = {}
+        self._next_rxn_id = 0
 
     def add_rxns_at_temp(self, rxns: ScoredReactionSet, temp: int) -> int:
-        self.lib[int(temp)] = rxns
+        self.lib[int(temp)] = self._assign_rxn_ids(rxns)
         return temp
+
+    def set_provenance(self, temp: int, **info) -> None:
+        """Records where the reactions at a given temperature came from, e.g. the
+        hash of the enumeration they were computed from and the name of the scorer
+        used to score them.
+
+        Args:
+            temp (int): The temperature
+        """
+        self.provenance[int(temp)] = { **self.provenance.get(int(temp), {}), **info }
+
+    def get_provenance(self, temp: int) -> Dict:
+        return self.provenance.get(int(temp), {})
+
+    def _copy_provenance_to(self, lib: ReactionLibrary) -> ReactionLibrary:
+        for t in lib.temps:
+            if t in self.provenance:
+                lib.set_provenance(t, **self.provenance[t])
+        return lib
+
+    def _assign_rxn_ids(self, rxns: ScoredReactionSet) -> ScoredReactionSet:
+        # Every reaction with the same reactant/product stoichiometry receives the
+        # same id, regardless of the temperature at which it was scored. Ids already
+        # carried by the reactions (e.g. when loading a library from a file) are
+        # preserved when they do not conflict with the ids registered so far.
+        # The reactions (and the set itself) may be shared with another library, so
+        # if any id changes, the library holds a renumbered copy of the set.
+        used_ids = set(self._rxn_ids.values())
+        ids = []
+        for rxn in rxns.reactions:
+            key = rxn.canonical_key
+            lib_id = self._rxn_ids.get(key)
+            if lib_id is None:
+                if rxn.rxn_id is not None and rxn.rxn_id not in used_ids:
+                    lib_id = rxn.rxn_id
+                else:
+                    lib_id = self._next_rxn_id
+                self._rxn_ids[key] = lib_id
+                used_ids.add(lib_id)
+                self._next_rxn_id = max(self._next_rxn_id, lib_id + 1)
+            ids.append(lib_id)
+
+        if all([rxn.rxn_id == lib_id for rxn, lib_id in zip(rxns.reactions, ids)]):
+            return rxns
+        return ScoredReactionSet([rxn.with_id(lib_id) for rxn, lib_id in zip(rxns.reactions, ids)], rxns.phases)
+
+    def get_rxn_id(self, rxn: ScoredReaction) -> int:
+        """Returns the library-wide id of a reaction with the same stoichiometry
+        as the one provided, or None if no such reaction is in this library.
+
+        Args:
+            rxn (ScoredReaction): The reaction of interest
+
+        Returns:
+            int:
+        """
+        return self._rxn_ids.get(rxn.canonical_key)
     
     def exclude_phases(self, phases) -> ReactionLibrary:
         lib = ReactionLibrary(self.phases)
         for t, rxns in self.lib.items():
             lib.add_rxns_at_temp(rxns.exclude_phases(phases), t)
         
-        return lib
+        return self._copy_provenance_to(lib)
     
+    def exclude_theoretical(self) -> ReactionLibrary:
+        """Returns a new library without any reactions involving phases marked
+        as theoretical in this library's phase set.
+
+        Returns:
+            ReactionLibrary:
+        """
+        return self.exclude_phases(self.phases.get_theoretical_phases())
+
     def get_rxns_at_temp(self, temp: int) -> ScoredReactionSet:
         return self.lib[temp]
     
@@ -66,11 +138,107 @@ class ReactionLibrary(MSONable):
             pruned_rxn_set = ScoredReactionSet([], lib.phases)
             for rxn_id in deduped_ids:
                 rxn = rxns.get_rxn_by_id(rxn_id)
-                pruned_rxn_set.add_rxn(rxn, rxn_id)
+                if rxn is not None:
+                    pruned_rxn_set.add_rxn(rxn)
                 
             lib.add_rxns_at_temp(pruned_rxn_set, t)
-        return lib
+        return self._copy_provenance_to(lib)
     
+    def get_reachable_phases(self,
+                             precursors: List[str],
+                             atmospheric_phases: List[str] = [],
+                             temps: List[int] = None,
+                             min_score: float = 0.0) -> Set[str]:
+        """Computes the set of phases that can ever be present in a simulation that
+        starts from the supplied precursors. A reaction is considered able to fire
+        once all of its reactants are reachable, and its solid products then become
+        reachable themselves. Gaseous products are not placed on the lattice, so they
+        only count as reactants if they are atmospheric phases.
+
+        Args:
+            precursors (List[str]): The phases present at the start of the simulation
+            atmospheric_phases (List[str], optional): Gases available from the atmosphere.
+            temps (List[int], optional): The temperatures whose reactions should be considered.
+            Defaults to every temperature in the library.
+            min_score (float, optional): Reactions with scores at or below this value are
+            treated as unable to fire. Defaults to 0.0.
+
+        Returns:
+            Set[str]: The reachable phases
+        """
+        if temps is None:
+            temps = self.temps
+
+        reachable = set(precursors).union(atmospheric_phases)
+        rxns = [r for t in temps for r in self.get_rxns_at_temp(int(t)).reactions if r.competitiveness > min_score]
+
+        gas_cache = {}
+        def _is_gas(phase):
+            if phase not in gas_cache:
+                gas_cache[phase] = self.phases.is_gas(phase)
+            return gas_cache[phase]
+
+        # Standard worklist closure - each reaction tracks how many of its reactants
+        # are still unreachable and is queued once that count reaches zero
+        num_missing = []
+        waiting_on = {}
+        queue = []
+        for idx, rxn in enumerate(rxns):
+            missing = [p for p in rxn.reactants if p not in reachable]
+            num_missing.append(len(missing))
+            for p in missing:
+                waiting_on.setdefault(p, []).append(idx)
+            if len(missing) == 0:
+                queue.append(idx)
+
+        while len(queue) > 0:
+            rxn = rxns[queue.pop()]
+            for product in rxn.products:
+                if product in reachable or _is_gas(product):
+                    continue
+                reachable.add(product)
+                for waiting_idx in waiting_on.pop(product, []):
+                    num_missing[waiting_idx] -= 1
+                    if num_missing[waiting_idx] == 0:
+                        queue.append(waiting_idx)
+
+        return reachable
+
+    def prune_unreachable(self,
+                          precursors: List[str],
+                          atmospheric_phases: List[str] = [],
+                          temps: List[int] = None,
+                          min_score: float = 0.0) -> ReactionLibrary:
+        """Returns a new library containing only the reactions that can fire in a
+        simulation starting from the supplied precursors, i.e. those whose reactants
+        are all reachable (see get_reachable_phases) and whose score exceeds min_score.
+        Only the requested temperatures are kept. Reaction ids are preserved.
+
+        Args:
+            precursors (List[str]): The phases present at the start of the simulation
+            atmospheric_phases (List[str], optional): Gases available from the atmosphere.
+            temps (List[int], optional): The temperatures to keep. Defaults to every
+            temperature in the library.
+            min_score (float, optional): Minimum score for a reaction to be kept. Defaults to 0.0.
+
+        Returns:
+            ReactionLibrary:
+        """
+        if temps is None:
+            temps = self.temps
+
+        reachable = self.get_reachable_phases(precursors, atmospheric_phases, temps, min_score)
+        lib = ReactionLibrary(self.phases)
+        for t in temps:
+            rxns = self.get_rxns_at_temp(int(t))
+            kept = [r for r in rxns.reactions if r.competitiveness > min_score and r.reactants.issubset(reachable)]
+            lib.add_rxns_at_temp(ScoredReactionSet(kept, self.phases), t)
+        return self._copy_provenance_to(lib)
+
+    @property
+    def num_rxns(self) -> int:
+        return sum([len(rxns) for rxns in self.lib.values()])
+
     def add_metadata(self, rxn_id, metadata):
         if rxn_id not in self.metadata:
             self.metadata[rxn_id] = metadata
@@ -81,7 +249,7 @@ class ReactionLibrary(MSONable):
         lib = ReactionLibrary(self.phases)
         for t, rxns in self.lib.items():
             lib.add_rxns_at_temp(rxns.limit_phases(phases), t)
-        return lib
+        return self._copy_provenance_to(lib)
     
     @property
     def temps(self):
@@ -100,6 +268,7 @@ class ReactionLibrary(MSONable):
             **sup,
             "phases": self.phases.as_dict(),
             "lib": lib,
+            "provenance": self.provenance,
         }
 
     def to_file(self, fpath):
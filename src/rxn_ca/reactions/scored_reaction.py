@@ -1,5 +1,6 @@
 from __future__ import annotations
 import typing
+import weakref
 from numbers import Number
 
 from rxn_network.reactions.basic import BasicReaction
@@ -38,17 +39,84 @@ def phases_to_str(phases: list[str]) -> str:
     phases = sorted(list(set(phases)))
     return "+".join(phases)
 
+class ReactionStoichiometry:
+    """The temperature independent part of a ScoredReaction: the reactant and product
+    phases and their (volumetric) stoichiometric coefficients, along with the totals
+    the update rule asks for on every reaction. Instances are interned by their
+    canonical key, so a reaction that appears in the libraries of many temperatures
+    shares a single ReactionStoichiometry. Use get_stoichiometry rather than
+    instantiating this class directly.
+
+    The coefficient maps are shared by every reaction with this stoichiometry and
+    must not be modified.
+    """
+
+    __slots__ = (
+        "key",
+        "reactant_coeffs",
+        "product_coeffs",
+        "reactants",
+        "products",
+        "total_reactant_stoich",
+        "total_product_stoich",
+        "total_solid_reactant_stoich",
+        "total_solid_product_stoich",
+        "solid_product_reactant_stoich_ratio",
+        "__weakref__",
+    )
+
+    def __init__(self, key: typing.Tuple, reactants: typing.Dict[str, Number], products: typing.Dict[str, Number]):
+        self.key = key
+        self.reactant_coeffs: typing.Dict[str, Number] = dict(reactants)
+        self.product_coeffs: typing.Dict[str, Number] = dict(products)
+        self.reactants: typing.FrozenSet[str] = frozenset(reactants.keys())
+        self.products: typing.FrozenSet[str] = frozenset(products.keys())
+
+        self.total_reactant_stoich = sum(reactants.values())
+        self.total_product_stoich = sum(products.values())
+        self.total_solid_reactant_stoich = sum([v for r, v in reactants.items() if r not in DEFAULT_GASES])
+        self.total_solid_product_stoich = sum([v for p, v in products.items() if p not in DEFAULT_GASES])
+        self.solid_product_reactant_stoich_ratio = self.total_solid_product_stoich / self.total_solid_reactant_stoich
+
+    def __reduce__(self):
+        return (get_stoichiometry, (self.reactant_coeffs, self.product_coeffs))
+
+
+_STOICHIOMETRIES = weakref.WeakValueDictionary()
+
+def get_stoichiometry(reactants: typing.Dict[str, Number], products: typing.Dict[str, Number]) -> ReactionStoichiometry:
+    """Returns the interned ReactionStoichiometry for the supplied reactant and
+    product stoichiometry maps, creating it if necessary.
+
+    Args:
+        reactants (typing.Dict[str, Number]): The reactant stoichiometry map
+        products (typing.Dict[str, Number]): The product stoichiometry map
+
+    Returns:
+        ReactionStoichiometry:
+    """
+    key = (tuple(sorted(reactants.items())), tuple(sorted(products.items())))
+    stoich = _STOICHIOMETRIES.get(key)
+    if stoich is None:
+        stoich = ReactionStoichiometry(key, reactants, products)
+        _STOICHIOMETRIES[key] = stoich
+    return stoich
+
+
 class ScoredReaction:
 
     NO_RXN = "NO_RXN"
 
+    __slots__ = ("_stoich", "competitiveness", "energy_per_atom", "rxn_id")
+
     @classmethod
     def from_dict(cls, rxn_dict):
         return cls(
             rxn_dict["reactants"],
             rxn_dict["products"],
             rxn_dict["competitiveness"],
-            energy_per_atom = rxn_dict.get("energy_per_atom")
+            energy_per_atom = rxn_dict.get("energy_per_atom"),
+            rxn_id = rxn_dict.get("rxn_id")
         )
 
     @classmethod
@@ -57,7 +125,7 @@ class ScoredReaction:
         product_dict = { comp.reduced_formula: round(coeff * volumes.get(comp.reduced_formula), 2) for comp, coeff in original_rxn.product_coeffs.items() }
         return ScoredReaction(react_dict, product_dict, score, energy_per_atom=original_rxn.energy_per_atom)
 
-    def __init__(self, reactants, products, competitiveness, energy_per_atom = None):
+    def __init__(self, reactants, products, competitiveness, energy_per_atom = None, rxn_id: int = None):
         """Instantiate a reaction object by providing stoichiometry maps describing the
         reactant and product stoichiometry, and the relative competitiveness of this
         reaction.
@@ -69,34 +137,97 @@ class ScoredReaction:
             reactants, e.g. { "Na": 1, "Cl": 1 }
             products (typing.Dict[str, Number]): A map representing the stoichiometry of the products.
             competitiveness (Number): A competitiveness score for the reaction.
+            energy_per_atom (Number): The reaction energy, in eV/atom.
+            rxn_id (int): A stable integer identifier for this reaction. Usually assigned
+            by the ReactionLibrary containing the reaction, see canonical_key.
         """
-        self._reactants: typing.Dict[str, Number] = reactants
-        self._products: typing.Dict[str, Number] = products
+        self._stoich: ReactionStoichiometry = get_stoichiometry(reactants, products)
+        self.competitiveness: Number = competitiveness
+        self.energy_per_atom = energy_per_atom
+        self.rxn_id: int = rxn_id
 
-        self.reactants = frozenset(self._reactants.keys())
-        self.products = frozenset(self._products.keys())
+    @property
+    def canonical_key(self) -> typing.Tuple:
+        """A hashable key identifying this reaction by its reactant and product
+        stoichiometry alone. The key does not depend on the score or energy of the
+        reaction, so the same reaction scored at different temperatures has the
+        same key.
 
-        self.solid_reactants = frozenset([ r for r in self._reactants.keys() if r not in DEFAULT_GASES])
-        self.solid_products = frozenset([ r for r in self._products.keys() if r not in DEFAULT_GASES])
+        Returns:
+            typing.Tuple:
+        """
+        return self._stoich.key
 
-        self.is_identity = self.reactants == self.products
+    @property
+    def reactants(self) -> typing.FrozenSet[str]:
+        return self._stoich.reactants
 
-        self.total_reactant_stoich = sum(reactants.values())
-        self.total_product_stoich = sum(products.values())
+    @property
+    def products(self) -> typing.FrozenSet[str]:
+        return self._stoich.products
 
-        self.total_solid_reactant_stoich = sum([reactants[r] for r in self.solid_reactants])
-        self.total_solid_product_stoich = sum([products[r] for r in self.solid_products])
+    @property
+    def _reactants(self) -> typing.Dict[str, Number]:
+        return self._stoich.reactant_coeffs
 
-        self.product_reactant_stoich_ratio = self.total_product_stoich / self.total_reactant_stoich
-        self.solid_product_reactant_stoich_ratio = self.total_solid_product_stoich / self.total_solid_reactant_stoich
+    @property
+    def _products(self) -> typing.Dict[str, Number]:
+        return self._stoich.product_coeffs
 
-        self.competitiveness: Number = competitiveness
-        self._as_str = f"{stoich_map_to_str(self._reactants)}->{stoich_map_to_str(self._products)}"
-        self.energy_per_atom = energy_per_atom
+    @property
+    def solid_reactants(self) -> typing.FrozenSet[str]:
+        return frozenset([r for r in self.reactants if r not in DEFAULT_GASES])
+
+    @property
+    def solid_products(self) -> typing.FrozenSet[str]:
+        return frozenset([p for p in self.products if p not in DEFAULT_GASES])
+
+    @property
+    def is_identity(self) -> bool:
+        return self.reactants == self.products
+
+    @property
+    def total_reactant_stoich(self) -> Number:
+        return self._stoich.total_reactant_stoich
+
+    @property
+    def total_product_stoich(self) -> Number:
+        return self._stoich.total_product_stoich
+
+    @property
+    def total_solid_reactant_stoich(self) -> Number:
+        return self._stoich.total_solid_reactant_stoich
+
+    @property
+    def total_solid_product_stoich(self) -> Number:
+        return self._stoich.total_solid_product_stoich
+
+    @property
+    def product_reactant_stoich_ratio(self) -> Number:
+        return self.total_product_stoich / self.total_reactant_stoich
+
+    @property
+    def solid_product_reactant_stoich_ratio(self) -> Number:
+        return self._stoich.solid_product_reactant_stoich_ratio
 
     def rescore(self, scorer) -> ScoredReaction:
         new_score = scorer.score(self)
-        return ScoredReaction(self._reactants, self._products, new_score)
+        return ScoredReaction(self._reactants, self._products, new_score, rxn_id=self.rxn_id)
+
+    def with_id(self, rxn_id: int) -> ScoredReaction:
+        """Returns this reaction carrying the supplied id. Reactions are shared between
+        reaction sets and libraries, so rather than being renumbered in place, a copy
+        is made if this reaction carries a different id.
+
+        Args:
+            rxn_id (int): The desired id
+
+        Returns:
+            ScoredReaction:
+        """
+        if self.rxn_id == rxn_id:
+            return self
+        return ScoredReaction(self._reactants, self._products, self.competitiveness, energy_per_atom=self.energy_per_atom, rxn_id=rxn_id)
 
     def can_proceed_with(self, reactants: list[str]) -> bool:
         """Helper method that, given a list of reactants, returns true if it is the same
@@ -124,7 +255,7 @@ class ScoredReaction:
         return list(set(list(self.reactants) + list(self.products)))
 
     def stoich_ratio(self, phase1, phase2) -> Number:
-        all_phases = {**self._reactants, **self._products}
+        all_phases = {**self._stoich.reactant_coeffs, **self._stoich.product_coeffs}
         return all_phases[phase1] / all_phases[phase2]
 
     def product_stoich(self, phase: str) -> Number:
@@ -136,7 +267,7 @@ class ScoredReaction:
         Returns:
             Number:
         """
-        return self._products[phase]
+        return self._stoich.product_coeffs[phase]
 
     def reactant_stoich(self, phase: str) -> Number:
         """Returns the stoichiometry in this reaction for the desired product phase.
@@ -147,7 +278,7 @@ class ScoredReaction:
         Returns:
             Number:
         """
-        return self._reactants[phase]
+        return self._stoich.reactant_coeffs[phase]
 
     def reactant_stoich_fraction(self, phase: str) -> Number:
         """Returns the stoichiometry in this reaction for the desired reactant phase.
@@ -159,7 +290,7 @@ class ScoredReaction:
             Number:
         """
         try:
-            return self._reactants[phase] / self.total_reactant_stoich
+            return self.reactant_stoich(phase) / self.total_reactant_stoich
         except:
             print(phase, str(self))
 
@@ -173,7 +304,7 @@ class ScoredReaction:
             Number:
         """
         try:
-            return self._products[phase] / self.total_product_stoich
+            return self.product_stoich(phase) / self.total_product_stoich
         except:
             print(phase, str(self))
 
@@ -187,7 +318,7 @@ class ScoredReaction:
             Number:
         """
         try:
-            return self._reactants[phase] / self.total_solid_reactant_stoich
+            return self.reactant_stoich(phase) / self.total_solid_reactant_stoich
         except:
             print(phase, str(self))
     
@@ -202,27 +333,28 @@ class ScoredReaction:
         Returns:
             float: The volume of product produced
         """
-        ratio = self._products[product] / self._reactants[reactant]
-        return reactant_vol * self.solid_product_reactant_stoich_ratio
+        return reactant_vol * self._stoich.solid_product_reactant_stoich_ratio
     
     def convert_to_moles(self, phase_set: SolidPhaseSet):
         reactants_moles = phase_set.vol_amts_to_moles(self._reactants, should_round=3)
         products = phase_set.vol_amts_to_moles(self._products, should_round=3)
 
-        return ScoredReaction(reactants_moles, products, competitiveness=self.competitiveness, energy_per_atom=self.energy_per_atom)
+        return ScoredReaction(reactants_moles, products, competitiveness=self.competitiveness, energy_per_atom=self.energy_per_atom, rxn_id=self.rxn_id)
 
     def any_reactants(self, phases):
         return len(self.reactants.intersection(phases)) > 0
 
     def __str__(self):
-        return f"{self._as_str}, Score: {self.competitiveness}, E/atom: {self.energy_per_atom}"
+        as_str = f"{stoich_map_to_str(self._reactants)}->{stoich_map_to_str(self._products)}"
+        return f"{as_str}, Score: {self.competitiveness}, E/atom: {self.energy_per_atom}"
 
     def as_dict(self):
         return {
-            "reactants": self._reactants,
-            "products": self._products,
+            "reactants": dict(self._reactants),
+            "products": dict(self._products),
             "competitiveness": self.competitiveness,
             "energy_per_atom": self.energy_per_atom,
+            "rxn_id": self.rxn_id,
             "@module": self.__class__.__module__,
             "@class": self.__class__.__name__,
         }
@@ -45,9 +45,10 @@ class ScoredReactionSet():
         self.phases = phase_set
         self.reactant_map = {}
         self.reactions: List[ScoredReaction] = []
-        self.rxn_map = {}
-        self.rxn_to_id = {}
+        self._rxn_map = None
         self.id_to_rxn = {}
+        self._key_to_id = {}
+        self._next_id = 0
         
         # Replace strength of identity reaction with the depth of the hull its in
         for r in reactions:
@@ -59,26 +60,43 @@ class ScoredReactionSet():
         return ScoredReactionSet(rescored, self.phases)
 
     def add_rxn(self, rxn: ScoredReaction, rxn_id: int = None) -> None:
+        # The reaction may be shared with other sets, so it is never renumbered in
+        # place. If it needs a different id, this set holds a copy instead.
+        if rxn_id is None:
+            rxn_id = rxn.rxn_id if rxn.rxn_id is not None else self._get_id_for_key(rxn.canonical_key)
+        rxn = rxn.with_id(rxn_id)
+
         reactant_set = frozenset(rxn.reactants)
         if self.reactant_map.get(reactant_set) is None:
             self.reactant_map[reactant_set] = [rxn]
         else:
             self.reactant_map[reactant_set].append(rxn)
             self.reactant_map[reactant_set] = sorted(self.reactant_map[reactant_set], key = lambda rxn: rxn.competitiveness, reverse = True)
-        
-        rxn_str = str(rxn)
 
-        if rxn_id is None:
-            rxn_id = len(self.rxn_to_id)
-
-        self.rxn_to_id[rxn_str] = rxn_id
-        self.id_to_rxn[rxn_id] = rxn
-        self.rxn_map[rxn_str] = rxn
+        self._key_to_id[rxn.canonical_key] = rxn.rxn_id
+        self._next_id = max(self._next_id, rxn.rxn_id + 1)
+        self.id_to_rxn[rxn.rxn_id] = rxn
+        self._rxn_map = None
         self.reactions.append(rxn)
 
+    def _get_id_for_key(self, key) -> int:
+        # Reactions without an id get one from this set's own key registry. Sets that are
+        # part of a ReactionLibrary are re-keyed against the library-wide registry
+        # so that ids agree across temperatures.
+        if key in self._key_to_id:
+            return self._key_to_id[key]
+        return self._next_id
+
+    @property
+    def rxn_map(self) -> Dict[str, ScoredReaction]:
+        # Formatting every reaction as a string is expensive, so this map is only
+        # built when a lookup by string is actually requested
+        if self._rxn_map is None:
+            self._rxn_map = { str(rxn): rxn for rxn in self.reactions }
+        return self._rxn_map
+
     def get_rxn_id(self, rxn: ScoredReaction) -> int:
-        r_str = str(rxn)
-        return self.rxn_to_id.get(r_str)
+        return rxn.rxn_id
     
     def get_rxn_by_id(self, id: int) -> ScoredReaction:
         return self.id_to_rxn.get(id)
@@ -259,4 +277,4 @@ class ScoredReactionSet():
         }
     
     def __len__(self):
-        return len(self.rxn_map)
\ No newline at end of file
+        return len(self.id_to_rxn)
\ No newline at end of file
@@ -4,7 +4,7 @@ from abc import ABC, abstractmethod
 from .scored_reaction import ScoredReaction
 
 from ..phases.solid_phase_set import SolidPhaseSet
-from typing import List
+from typing import List, Union
 
 from rxn_network.reactions.reaction_set import ReactionSet
 from rxn_network.reactions.computed import ComputedReaction
@@ -156,10 +156,13 @@ class TammanTightLinear(BasicScore):
     
 
 
-def score_rxns(reactions: ReactionSet, scorer: BasicScore, phase_set: SolidPhaseSet = None):
+def score_rxns(reactions: Union[ReactionSet, List[ComputedReaction]], scorer: BasicScore, phase_set: SolidPhaseSet = None):
     scored_reactions = []
 
-    for rxn in tqdm(reactions.get_rxns(), desc=f"Scoring reactions... at temp {scorer.temp}"):
+    if isinstance(reactions, ReactionSet):
+        reactions = reactions.get_rxns()
+
+    for rxn in tqdm(reactions, desc=f"Scoring reactions... at temp {scorer.temp}"):
         reactants = [r.reduced_formula for r in rxn.reactants]
         non_gases = [r for r in reactants if r not in phase_set.gas_phases]
         if len(non_gases) > 0:
@@ -2,13 +2,25 @@ from typing import Dict
 
 from pylattica.structures.square_grid import DiscreteGridSetup
 from pylattica.discrete.state_constants import DISCRETE_OCCUPANCY
-from pylattica.core import Simulation
+from pylattica.core import Simulation, SimulationState, PeriodicStructure
+from pylattica.core.constants import SITES, SITE_ID
 
 from ..core.constants import VOLUME, MELTED_AMTS, VOL_MULTIPLIER, GASES_CONSUMED, GASES_EVOLVED
 from ..phases import SolidPhaseSet
-from random import shuffle
+from typing import Union
+
+import numpy as np
+
+_GRID_STRUCTURES = {}
+
+def get_grid_structure(phase_set: SolidPhaseSet, dim: int, size: int) -> PeriodicStructure:
+    # Building a grid structure is far slower than filling it, and the structure only
+    # depends on its dimension and size, so it is shared between setups (e.g. regrinds)
+    key = (dim, size)
+    if key not in _GRID_STRUCTURES:
+        _GRID_STRUCTURES[key] = DiscreteGridSetup(phase_set, dim=dim).build_structure(size)
+    return _GRID_STRUCTURES[key]
 
-import copy
 class SetupRandomNoise():
 
     def __init__(self, phases: SolidPhaseSet, dim: int = 3):
@@ -18,35 +30,55 @@ class SetupRandomNoise():
     def setup(self,
             phase_mol_ratios: Dict[str, float],
             size: int = 15,
-            packing_efficiency = 0.97
+            packing_efficiency = 0.97,
+            rng: Union[np.random.Generator, int] = None
     ):
+        """Builds a simulation in which the precursor phases are randomly distributed
+        across the lattice in proportion to their volume fractions. Any volume not
+        filled by precursors (see packing_efficiency) is left as free space.
+
+        Args:
+            phase_mol_ratios (Dict[str, float]): The molar ratios of the precursors
+            size (int, optional): The side length of the lattice. Defaults to 15.
+            packing_efficiency (float, optional): The fraction of sites occupied by
+            precursors. Defaults to 0.97.
+            rng (Union[np.random.Generator, int], optional): The random number generator,
+            or a seed for one, used to place the precursors. Defaults to numpy's global
+            generator.
+
+        Returns:
+            Simulation:
+        """
+        # Without a generator, the global one is used so that seeding it (see
+        # seed_global_generators) makes the setup reproducible
+        if rng is None:
+            rng = np.random
+        else:
+            rng = np.random.default_rng(rng)
+
         total_vol = size ** self.dim * packing_efficiency
         volume_ratios = self.phase_set.mole_amts_to_vols(phase_mol_ratios)
         
         total_vol_ratio = sum(volume_ratios.values())
         normalized_vol_ratios = { p: vol / total_vol_ratio for p, vol in volume_ratios.items() }
         desired_phase_vols = { p: round(vol * total_vol) for p, vol in normalized_vol_ratios.items() }
-        setup = DiscreteGridSetup(self.phase_set, dim=self.dim)
-
-        struct = setup.build_structure(size)
-        state = setup.setup_solid_phase(struct, self.phase_set.FREE_SPACE)
-
-        cell_occs = [k for k, v in desired_phase_vols.items() for _ in range(v)]
-        shuffle(cell_occs)
-
+        struct = get_grid_structure(self.phase_set, self.dim, size)
         site_ids = struct.site_ids
-        shuffle(site_ids)
 
-        for i, occ in enumerate(cell_occs):
-            state.set_site_state(site_ids[i], {
-                DISCRETE_OCCUPANCY: occ,
-                VOLUME: 1.0
-            })
+        # The occupancy of every site is encoded as an index into phase_names, with
+        # free space filling whatever the precursors don't
+        phase_names = [*desired_phase_vols.keys(), self.phase_set.FREE_SPACE]
+        counts = [*desired_phase_vols.values(), max(0, len(site_ids) - sum(desired_phase_vols.values()))]
+        occupancy = rng.permutation(np.repeat(np.arange(len(phase_names)), counts))[:len(site_ids)]
 
-        for sid in site_ids:
-            state.set_site_state(sid, {
+        state = SimulationState()
+        state.get_state()[SITES] = {
+            sid: {
+                SITE_ID: sid,
+                DISCRETE_OCCUPANCY: phase_names[occ],
                 VOLUME: 1.0
-            })
+            } for sid, occ in zip(site_ids, occupancy.tolist())
+        }
 
         simulation = Simulation(state, struct)
 
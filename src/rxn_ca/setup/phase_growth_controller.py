@@ -2,6 +2,7 @@ from typing import Dict
 import random
 
 from ..analysis.reaction_step_analyzer import ReactionStepAnalyzer
+from ..core.constants import VOLUME
 from pylattica.core import SimulationState
 from pylattica.core import BasicController
 from pylattica.core.neighborhood_builders import NeighborhoodBuilder
@@ -27,7 +28,14 @@ class PhaseGrowthController(BasicController):
         self.analyzer = ReactionStepAnalyzer(self.phase_set)
         self.desired_phase_vols_abs = desired_phase_vols
 
+        # Empty sites are kept in a list (for O(1) random choice) alongside a map from
+        # site id to list position (for O(1) swap-removal)
         self.known_empty_ids = periodic_struct.site_ids.copy()
+        self._empty_id_positions = { sid: idx for idx, sid in enumerate(self.known_empty_ids) }
+
+        # Running per-phase volume totals, kept up to date from this controller's own
+        # writes. Initialized from the first state the controller sees.
+        self._phase_vols: Dict[str, float] = None
 
         if nb_builder is None:
             self.nb_builder = MooreNbHoodBuilder(1, dim=periodic_struct.dim)
@@ -35,6 +43,19 @@ class PhaseGrowthController(BasicController):
             self.nb_builder = nb_builder
 
         self.nb_graph = self.nb_builder.get(periodic_struct)
+
+    def pre_run(self, initial_state: SimulationState) -> None:
+        self._phase_vols = self.analyzer.set_step_group(initial_state).get_all_absolute_phase_volumes()
+
+    def _remove_empty_id(self, site_id: int) -> None:
+        idx = self._empty_id_positions.pop(site_id, None)
+        if idx is None:
+            return
+
+        last_id = self.known_empty_ids.pop()
+        if last_id != site_id:
+            self.known_empty_ids[idx] = last_id
+            self._empty_id_positions[last_id] = idx
     
     def get_random_site(self, _):
         if len(self.known_empty_ids) > 0:
@@ -53,26 +74,22 @@ class PhaseGrowthController(BasicController):
                     nb_phases.add(nb_phase)
 
             if len(nb_phases) > 0:
-                chosen_phase = None
-                volume_breakdown = self.analyzer.set_step_group(prev_state).get_all_absolute_phase_volumes()
+                if self._phase_vols is None:
+                    self.pre_run(prev_state)
 
                 deficient_candidates = []
 
                 for phase in nb_phases:
-                    diff = volume_breakdown[phase] - self.desired_phase_vols_abs[phase]
+                    diff = self._phase_vols.get(phase, 0) - self.desired_phase_vols_abs[phase]
                     deficient_candidates.append((phase, diff))
                 
-                most_deficient = min(deficient_candidates, key = lambda c: c[1])[0]
+                chosen_phase = min(deficient_candidates, key = lambda c: c[1])[0]
 
-                if len(deficient_candidates) > 0:
-                    chosen_phase = most_deficient
-                    self.known_empty_ids.remove(site_id)
-                    return {DISCRETE_OCCUPANCY: chosen_phase}
-                else:
-                    return {}
+                self._phase_vols[chosen_phase] = self._phase_vols.get(chosen_phase, 0) + curr_state.get(VOLUME, 1.0)
+                self._remove_empty_id(site_id)
+                return {DISCRETE_OCCUPANCY: chosen_phase}
             else:
                 return {}
         else:
-            if site_id in self.known_empty_ids:
-                self.known_empty_ids.remove(site_id)
-            return {}
\ No newline at end of file
+            self._remove_empty_id(site_id)
+            return {}
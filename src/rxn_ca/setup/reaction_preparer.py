@@ -1,4 +1,4 @@
-from typing import Dict
+from typing import Dict, Union
 import numpy as np
 
 from pylattica.core.simulation import Simulation
@@ -11,7 +11,7 @@ from pylattica.structures.square_grid import DiscreteGridSetup, PseudoHexagonalN
 from pylattica.core import AsynchronousRunner, Simulation
 from pylattica.discrete.discrete_step_analyzer import DiscreteStepAnalyzer
 
-from .volume_tuning_controller import VolumeTuningController
+from .volume_tuner import VolumeTuner
 from .phase_growth_controller import PhaseGrowthController
 
 from tabulate import tabulate
@@ -32,7 +32,27 @@ class ReactionPreparer():
                          size: int = 15,
                          volume_multiplier: float = 1.0,
                          buffer: int = 1,
+                         volume_noise: float = 0.0,
+                         rng: Union[np.random.Generator, int] = None,
         ) -> Simulation:
+        """Builds a grain-structured starting state containing the supplied phases
+        in the supplied molar ratios. Grains are nucleated at random sites and grown
+        to fill the lattice, after which cell volumes are tuned so that the phase
+        amounts match the requested ratios.
+
+        Args:
+            phase_mol_ratios (Dict[str, float]): The molar ratios of the precursors
+            size (int, optional): The side length of the lattice. Defaults to 15.
+            volume_multiplier (float, optional): Scales the total volume. Defaults to 1.0.
+            buffer (int, optional): Spacing between nucleation sites. Defaults to 1.
+            volume_noise (float, optional): Maximum relative per-cell volume noise to
+            keep after tuning (see VolumeTuner). Defaults to 0.0.
+            rng (Union[np.random.Generator, int], optional): Random number generator, or
+            a seed for one, used for the volume noise.
+
+        Returns:
+            Simulation:
+        """
 
         total_vol = size ** self.dim
         if buffer is not None:
@@ -140,34 +160,29 @@ class ReactionPreparer():
 
         done = _assess_convergence(rxn_step_analyzer, simulation)
 
-        if done:
+        # Volume noise is applied by the tuner, so it still runs if noise was requested
+        if done and volume_noise == 0:
             print("Converged!")
             
             return simulation
 
-        tuner_controller = VolumeTuningController(
+        tuner = VolumeTuner(
             self.phase_set,
             desired_phase_vols,
+            noise=volume_noise,
+            rng=rng
         )
 
         print("\n")
-        print(f"Tweaking volumes to tune amounts using volume multiplier {volume_multiplier}...")
+        print(f"Tuning volumes to match amounts using volume multiplier {volume_multiplier}...")
         print("Targeting desired phase volumes:")
         print(desired_phase_vols)
 
-        close = False
-        tries_remaining = 15
-        while not close and tries_remaining > 0:
-            print("\nAmounts not converged, continuing tuning process...")
-            res = runner.run(simulation.state, tuner_controller, num_steps=5 * int(size**3))
-            simulation = Simulation(res.last_step, simulation.structure)
-
-            close = _assess_convergence(rxn_step_analyzer, simulation)
-            tries_remaining = tries_remaining - 1
+        tuner.tune(simulation.state)
 
-        if tries_remaining == 0 and not close:
+        if not _assess_convergence(rxn_step_analyzer, simulation):
             raise RuntimeError("Could not generate starting state with correct molar amounts!")
         
         print("Converged!")
 
-        return simulation
\ No newline at end of file
+        return simulation
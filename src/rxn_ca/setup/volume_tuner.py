@@ -0,0 +1,75 @@
+from typing import Dict, Union
+import numpy as np
+
+from pylattica.core import SimulationState
+from pylattica.core.constants import SITES
+from pylattica.discrete.state_constants import DISCRETE_OCCUPANCY
+
+from ..core.constants import VOLUME
+from ..phases.solid_phase_set import SolidPhaseSet
+
+class VolumeTuner():
+    """Adjusts the volumes of the cells in a simulation state so that the total
+    volume of each phase matches a target. A single scale factor is computed per
+    phase and applied to all of that phase's cells at once.
+
+    Optionally, per-cell noise can be retained. Each cell's volume is first
+    multiplied by a random factor drawn uniformly from [1 - noise, 1 + noise], and
+    the phase is then rescaled to its target. The spread of cell volumes within a
+    phase is therefore bounded, while the phase totals are still hit exactly.
+    """
+
+    def __init__(self,
+                 phase_set: SolidPhaseSet,
+                 ideal_vol_amts: Dict[str, float],
+                 noise: float = 0.0,
+                 rng: Union[np.random.Generator, int] = None) -> None:
+        """
+        Args:
+            phase_set (SolidPhaseSet): The phases in the simulation
+            ideal_vol_amts (Dict[str, float]): The target total volume of each phase
+            noise (float, optional): The maximum relative per-cell perturbation. Must be
+            in [0, 1). Defaults to 0.0.
+            rng (Union[np.random.Generator, int], optional): The random number generator,
+            or a seed for one, used to draw the per-cell noise.
+        """
+        if noise < 0 or noise >= 1:
+            raise ValueError("noise must be at least 0 and less than 1")
+
+        self.phase_set = phase_set
+        self.ideal_vol_amts = ideal_vol_amts
+        self.noise = noise
+        self.rng = np.random.default_rng(rng)
+
+    def tune(self, state: SimulationState) -> SimulationState:
+        """Rescales the cell volumes in state, in place, so that each phase
+        in ideal_vol_amts has its target volume.
+
+        Args:
+            state (SimulationState): The state to adjust
+
+        Returns:
+            SimulationState: The same state, for convenience
+        """
+        site_states = state.get_state()[SITES]
+
+        phase_sites = { p: [] for p in self.ideal_vol_amts.keys() }
+        for sid, site_state in site_states.items():
+            sites = phase_sites.get(site_state[DISCRETE_OCCUPANCY])
+            if sites is not None:
+                sites.append(sid)
+
+        for phase, sids in phase_sites.items():
+            if len(sids) == 0:
+                continue
+
+            vols = np.array([site_states[sid][VOLUME] for sid in sids], dtype=np.float64)
+            if self.noise > 0:
+                vols = vols * self.rng.uniform(1 - self.noise, 1 + self.noise, size=len(vols))
+
+            vols = vols * (self.ideal_vol_amts[phase] / vols.sum())
+
+            for sid, vol in zip(sids, vols.tolist()):
+                site_states[sid][VOLUME] = vol
+
+        return state
@@ -0,0 +1,99 @@
+from monty.json import MontyEncoder
+
+from ..core.reaction_result import ReactionResult
+
+from typing import Dict
+
+import numpy as np
+import gzip
+import json
+import os
+import random
+import shutil
+
+MANIFEST_FILENAME = "checkpoint.json.gz"
+
+def get_rng_state() -> Dict:
+    """Captures the state of the random and numpy.random global generators in a
+    JSON-serializable form.
+
+    Returns:
+        Dict:
+    """
+    version, internal, gauss = random.getstate()
+    name, keys, pos, has_gauss, cached_gaussian = np.random.get_state()
+    return {
+        "random": [version, list(internal), gauss],
+        "numpy": [name, keys.tolist(), int(pos), int(has_gauss), float(cached_gaussian)],
+    }
+
+def set_rng_state(rng_state: Dict) -> None:
+    """Restores the global generators to a state captured by get_rng_state.
+
+    Args:
+        rng_state (Dict): The captured state
+    """
+    version, internal, gauss = rng_state["random"]
+    random.setstate((version, tuple(internal), gauss))
+
+    name, keys, pos, has_gauss, cached_gaussian = rng_state["numpy"]
+    np.random.set_state((name, np.array(keys, dtype=np.uint32), pos, has_gauss, cached_gaussian))
+
+
+class RunCheckpoint():
+    """A directory holding the progress of a multi-stage simulation, so that an
+    interrupted run can be resumed. It contains one gzipped file per completed
+    stage, one per completed chunk of the stage in progress, and a manifest
+    describing where the run stopped (including the state of the random number
+    generators).
+
+    Every file is written to a temporary path and then moved into place, and the
+    manifest is only written once the files it refers to exist, so a run killed
+    at any point leaves a consistent checkpoint behind.
+    """
+
+    def __init__(self, checkpoint_dir: str):
+        """
+        Args:
+            checkpoint_dir (str): The directory to store the checkpoint in
+        """
+        self.checkpoint_dir = checkpoint_dir
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+
+    def _path(self, fname: str) -> str:
+        return os.path.join(self.checkpoint_dir, fname)
+
+    def _write(self, fname: str, d: Dict) -> None:
+        fpath = self._path(fname)
+        tmp_path = f"{fpath}.{os.getpid()}.tmp"
+        with gzip.open(tmp_path, "wt") as f:
+            json.dump(d, f, cls=MontyEncoder)
+        os.replace(tmp_path, fpath)
+
+    def _read(self, fname: str) -> Dict:
+        with gzip.open(self._path(fname), "rt") as f:
+            return json.load(f)
+
+    def exists(self) -> bool:
+        return os.path.exists(self._path(MANIFEST_FILENAME))
+
+    def save_manifest(self, manifest: Dict) -> None:
+        self._write(MANIFEST_FILENAME, manifest)
+
+    def load_manifest(self) -> Dict:
+        return self._read(MANIFEST_FILENAME)
+
+    def save_stage(self, stage_idx: int, result: ReactionResult) -> None:
+        self._write(f"stage_{stage_idx:04d}.json.gz", result.as_dict())
+
+    def load_stage(self, stage_idx: int) -> ReactionResult:
+        return ReactionResult.from_dict(self._read(f"stage_{stage_idx:04d}.json.gz"))
+
+    def save_chunk(self, chunk_idx: int, result: ReactionResult) -> None:
+        self._write(f"chunk_{chunk_idx:04d}.json.gz", result.as_dict())
+
+    def load_chunk(self, chunk_idx: int) -> ReactionResult:
+        return ReactionResult.from_dict(self._read(f"chunk_{chunk_idx:04d}.json.gz"))
+
+    def clear(self) -> None:
+        shutil.rmtree(self.checkpoint_dir, ignore_errors=True)
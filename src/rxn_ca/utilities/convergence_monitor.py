@@ -0,0 +1,143 @@
+from pylattica.core import SimulationState
+from pylattica.core.constants import GENERAL, SITES
+from pylattica.discrete.state_constants import DISCRETE_OCCUPANCY
+
+from ..core.constants import VOLUME, REACTION_CHOSEN
+from ..core.reaction_result import ReactionResult
+from ..phases import SolidPhaseSet
+
+from typing import Dict
+
+class ConvergenceMonitor():
+    """Decides when an isothermal stage has stopped evolving, so that the rest of
+    the stage can be skipped. The stage is run in windows of a fixed number of
+    schedule steps, and after each window the monitor looks at two things:
+
+    1. The event rate, the fraction of updates in the window that carried out a
+    reaction.
+    2. The largest change in the volume fraction of any phase since the end of the
+    previous window.
+
+    The stage is considered quiescent once both stay at or below their tolerances
+    for patience consecutive windows.
+    """
+
+    def __init__(self,
+                 window: float = 1.0,
+                 event_rate_tol: float = 1e-3,
+                 fraction_tol: float = 1e-3,
+                 patience: int = 2):
+        """
+        Args:
+            window (float, optional): The length of a window, in schedule steps (one
+            schedule step visits every site once). Defaults to 1.0.
+            event_rate_tol (float, optional): The largest event rate considered quiescent.
+            Defaults to 1e-3.
+            fraction_tol (float, optional): The largest phase fraction change considered
+            quiescent. Defaults to 1e-3.
+            patience (int, optional): The number of consecutive quiescent windows required.
+            Defaults to 2.
+        """
+        if window <= 0:
+            raise ValueError("window must be positive")
+
+        if patience < 1:
+            raise ValueError("patience must be at least 1")
+
+        self.window = window
+        self.event_rate_tol = event_rate_tol
+        self.fraction_tol = fraction_tol
+        self.patience = patience
+
+        self._fractions = None
+        self._quiet_windows = 0
+
+    def as_dict(self):
+        return {
+            "window": self.window,
+            "event_rate_tol": self.event_rate_tol,
+            "fraction_tol": self.fraction_tol,
+            "patience": self.patience,
+        }
+
+    def reset(self, state: SimulationState) -> None:
+        """Starts monitoring a new stage.
+
+        Args:
+            state (SimulationState): The state the stage starts from
+        """
+        self._fractions = get_phase_fractions(state)
+        self._quiet_windows = 0
+
+    def get_progress(self) -> Dict:
+        return {
+            "fractions": self._fractions,
+            "quiet_windows": self._quiet_windows,
+        }
+
+    def set_progress(self, progress: Dict) -> None:
+        self._fractions = progress["fractions"]
+        self._quiet_windows = progress["quiet_windows"]
+
+    def update(self, window_result: ReactionResult) -> bool:
+        """Records the result of a window.
+
+        Args:
+            window_result (ReactionResult): The result of running the window
+
+        Returns:
+            bool: True if the stage is now quiescent
+        """
+        event_rate = get_event_rate(window_result)
+
+        fractions = get_phase_fractions(window_result.output)
+        phases = set(fractions.keys()).union(self._fractions.keys())
+        max_change = max([abs(fractions.get(p, 0) - self._fractions.get(p, 0)) for p in phases], default=0.0)
+        self._fractions = fractions
+
+        if event_rate <= self.event_rate_tol and max_change <= self.fraction_tol:
+            self._quiet_windows += 1
+        else:
+            self._quiet_windows = 0
+
+        return self._quiet_windows >= self.patience
+
+
+def get_phase_fractions(state: SimulationState) -> Dict[str, float]:
+    """Computes the fraction of the occupied volume held by each phase.
+
+    Args:
+        state (SimulationState): The state to analyze
+
+    Returns:
+        Dict[str, float]:
+    """
+    volumes = {}
+    for site_state in state.get_state()[SITES].values():
+        phase = site_state[DISCRETE_OCCUPANCY]
+        if phase == SolidPhaseSet.FREE_SPACE:
+            continue
+        volumes[phase] = volumes.get(phase, 0) + site_state.get(VOLUME, 0)
+
+    total = sum(volumes.values())
+    if total == 0:
+        return {}
+
+    return { p: v / total for p, v in volumes.items() }
+
+def get_event_rate(result: ReactionResult) -> float:
+    """Computes the fraction of the updates in a result that carried out a reaction.
+
+    Args:
+        result (ReactionResult): The result to analyze
+
+    Returns:
+        float:
+    """
+    diffs = result.get_diffs()
+    num_events = 0
+    for diff in diffs:
+        if diff.get(GENERAL, {}).get(REACTION_CHOSEN) is not None:
+            num_events += 1
+
+    return num_events / len(diffs) if len(diffs) > 0 else 0.0
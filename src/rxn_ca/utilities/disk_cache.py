@@ -0,0 +1,93 @@
+from typing import Any, Callable, Tuple, Type
+
+import os
+import glob
+
+class DiskCache():
+    """A content-addressed, size-bounded store of files on local disk, one per key.
+    Subclasses decide how entries are serialized (see _read and _write) and choose
+    the file extension.
+
+    Every entry is written to a temporary path and then moved into place, so a
+    reader never sees a partial entry. When the total size of the entries exceeds
+    max_size, the least recently used ones are evicted. The modification time of
+    an entry doubles as its last access time.
+    """
+
+    extension = ".json"
+
+    def __init__(self, cache_dir: str, max_size: int):
+        """
+        Args:
+            cache_dir (str): Where to store the entries
+            max_size (int): The maximum total size of the cache, in bytes
+        """
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}{self.extension}")
+
+    def has(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def _read(self, key: str, load: Callable[[str], Any], errors: Tuple[Type[Exception], ...]) -> Any:
+        """Loads the entry stored under key, or returns None if there is none. An
+        entry that cannot be loaded is removed and treated as a miss.
+
+        Args:
+            key (str): The cache key
+            load (Callable[[str], Any]): Loads an entry from its path
+            errors (Tuple[Type[Exception], ...]): The errors that mark an entry as unreadable
+
+        Returns:
+            Any:
+        """
+        fpath = self._path(key)
+        if not os.path.exists(fpath):
+            return None
+
+        try:
+            entry = load(fpath)
+        except errors:
+            os.remove(fpath)
+            return None
+
+        os.utime(fpath)
+        return entry
+
+    def _write(self, key: str, dump: Callable[[str], None]) -> None:
+        """Stores an entry under key, evicting old entries if the cache is full.
+
+        Args:
+            key (str): The cache key
+            dump (Callable[[str], None]): Writes the entry to the path it is given
+        """
+        fpath = self._path(key)
+        tmp_path = f"{fpath}.{os.getpid()}.tmp"
+        dump(tmp_path)
+        os.replace(tmp_path, fpath)
+        self._evict()
+
+    def _entries(self):
+        return glob.glob(os.path.join(self.cache_dir, f"*{self.extension}"))
+
+    def _evict(self) -> None:
+        entries = []
+        for fpath in self._entries():
+            stat = os.stat(fpath)
+            entries.append((stat.st_mtime, stat.st_size, fpath))
+
+        entries.sort()
+        total_size = sum([e[1] for e in entries])
+        # Always keep the most recently used entry, even if it alone exceeds the limit
+        for _, size, fpath in entries[:-1]:
+            if total_size <= self.max_size:
+                break
+            os.remove(fpath)
+            total_size -= size
+
+    def clear(self) -> None:
+        for fpath in self._entries():
+            os.remove(fpath)
@@ -0,0 +1,71 @@
+from .helpers import get_default_cache_dir
+
+import numpy as np
+import os
+
+class EnergyCache():
+    """A persistent cache of temperature-adjusted reaction energies. Adjusting the
+    Gibbs energy of every reaction to every temperature is the most expensive
+    part of building a reaction library, but the result depends only on the
+    enumeration and the temperature - not on the scorer or on any filters - so
+    it can be shared between library builds.
+
+    Energies are stored as one array per (enumeration hash, temperature), indexed
+    by the position of each reaction in the enumeration. Entries that have not
+    been computed yet are NaN.
+    """
+
+    def __init__(self, cache_dir: str = None):
+        """
+        Args:
+            cache_dir (str, optional): Where to store cached energies. Defaults to the
+            energies subdirectory of $RXN_CA_CACHE_DIR, or of ~/.cache/rxn_ca if unset.
+        """
+        if cache_dir is None:
+            cache_dir = os.path.join(get_default_cache_dir(), "energies")
+
+        self.cache_dir = cache_dir
+
+    def _path(self, enumeration_hash: str, temp: int) -> str:
+        return os.path.join(self.cache_dir, enumeration_hash, f"{int(temp)}.npy")
+
+    def get_energies(self, enumeration_hash: str, temp: int, num_rxns: int) -> np.ndarray:
+        """Returns the cached energies of every reaction in an enumeration at the
+        given temperature. Reactions without a cached energy have the value NaN.
+
+        Args:
+            enumeration_hash (str): The content hash of the enumeration (see hash_rxn_set)
+            temp (int): The temperature
+            num_rxns (int): The number of reactions in the enumeration
+
+        Returns:
+            np.ndarray:
+        """
+        fpath = self._path(enumeration_hash, temp)
+        if os.path.exists(fpath):
+            try:
+                energies = np.load(fpath)
+                if len(energies) == num_rxns:
+                    return energies
+            except (ValueError, OSError):
+                pass
+
+        return np.full(num_rxns, np.nan)
+
+    def put_energies(self, enumeration_hash: str, temp: int, energies: np.ndarray) -> None:
+        """Stores energies for an enumeration at the given temperature. NaN entries
+        do not overwrite energies that are already cached.
+
+        Args:
+            enumeration_hash (str): The content hash of the enumeration
+            temp (int): The temperature
+            energies (np.ndarray): The energy of each reaction, or NaN if unknown
+        """
+        existing = self.get_energies(enumeration_hash, temp, len(energies))
+        merged = np.where(np.isnan(energies), existing, energies)
+
+        fpath = self._path(enumeration_hash, temp)
+        os.makedirs(os.path.dirname(fpath), exist_ok=True)
+        tmp_path = f"{fpath}.{os.getpid()}.tmp.npy"
+        np.save(tmp_path, merged)
+        os.replace(tmp_path, fpath)
@@ -3,29 +3,176 @@ from rxn_network.reactions.reaction_set import ReactionSet
 from ..core import HeatingSchedule
 from ..phases import SolidPhaseSet
 
-from ..reactions import ReactionLibrary, ScoredReaction, ScoredReactionSet, score_rxns
+from ..reactions import ReactionLibrary, ScoredReaction, ScoredReactionSet
 from ..reactions.scorers import BasicScore, TammanScore
+from .hashing import hash_rxn_set
+from .energy_cache import EnergyCache
 
-from typing import List
+from typing import Dict, List, Tuple
+from datetime import datetime
 
 import multiprocessing as mp
+import numpy as np
+import math
 
 _scoring_globals = {}
 
-def fn(temp):
+def _get_tile_idx(temp: int, pos: int) -> int:
+    # With subsets, tiles cover positions in the list of reactions to score at temp
+    subset = _scoring_globals.get('subsets', {}).get(temp)
+    return int(subset[pos]) if subset is not None else pos
+
+def _get_tile_rxns(temp: int) -> List:
+    rxns_at_temps = _scoring_globals.get('rxns_at_tmps')
+    if rxns_at_temps is not None:
+        return rxns_at_temps.get(temp)
+    return _scoring_globals.get('base_rxns')
+
+class _CachedEnergyRxn():
+    # Stands in for a temperature-adjusted ComputedReaction whose energy was found
+    # in the EnergyCache. Scorers only need the reactants and the energy.
+
+    __slots__ = ("reactants", "energy_per_atom")
+
+    def __init__(self, reactants, energy_per_atom):
+        self.reactants = reactants
+        self.energy_per_atom = energy_per_atom
+
+def _score_tile(tile: Tuple[int, int, int]) -> Tuple[int, np.ndarray, np.ndarray, np.ndarray]:
+    # Scores reactions [start, end) at temp. Only the indices, scores and energies
+    # of the scored reactions are returned, the parent process assembles the
+    # ScoredReactions from them
+    temp, start, end = tile
     score_class = _scoring_globals.get('score_class')
     phase_set = _scoring_globals.get('phase_set')
-    rxn_set  = _scoring_globals.get('base_rxns')
+    precomputed = _scoring_globals.get('rxns_at_tmps') is not None
+    cached_energies = _scoring_globals.get('energies', {}).get(temp)
+    rxns = _get_tile_rxns(temp)
 
     scorer = score_class(temp=temp, phase_set=phase_set)
-    if _scoring_globals.get("rxns_at_tmps") is None:
-        rset = rxn_set.set_new_temperature(temp)
+    gases = set(phase_set.gas_phases)
+
+    idxs = []
+    scores = []
+    energies = []
+    for pos in range(start, end):
+        idx = _get_tile_idx(temp, pos)
+        rxn = rxns[idx]
+        if all([r.reduced_formula in gases for r in rxn.reactants]):
+            continue
+
+        if not precomputed:
+            if cached_energies is not None and not np.isnan(cached_energies[idx]):
+                rxn = _CachedEnergyRxn(rxn.reactants, float(cached_energies[idx]))
+            else:
+                rxn = rxn.get_new_temperature(temp)
+
+        idxs.append(idx)
+        scores.append(scorer.score(rxn))
+        energies.append(rxn.energy_per_atom)
+
+    return (
+        temp,
+        np.array(idxs, dtype=np.int64),
+        np.array(scores, dtype=np.float64),
+        np.array(energies, dtype=np.float64)
+    )
+
+def _get_tiles(temps: List[int], num_rxns: Dict[int, int], num_processes: int, chunk_size: int = None) -> List[Tuple[int, int, int]]:
+    if chunk_size is None:
+        # Aim for a few tiles per process so that uneven tiles balance out
+        total = sum(num_rxns.values())
+        chunk_size = max(1, math.ceil(total / (num_processes * 4)))
+
+    tiles = []
+    for t in temps:
+        for start in range(0, num_rxns[t], chunk_size):
+            tiles.append((t, start, min(start + chunk_size, num_rxns[t])))
+    return tiles
+
+def _score_tiles(rxn_set: ReactionSet,
+                 temps: List[int],
+                 scorer_class: BasicScore,
+                 phase_set: SolidPhaseSet,
+                 rxns_at_temps: Dict = None,
+                 parallel: bool = True,
+                 processes: int = None,
+                 chunk_size: int = None,
+                 energy_cache: EnergyCache = None,
+                 enumeration_hash: str = None,
+                 subsets: Dict[int, List[int]] = None) -> Dict[int, ScoredReactionSet]:
+    # If subsets is provided, only the reactions at those indices are scored at each
+    # of its temperatures
+    global _scoring_globals
+
+    if processes is None:
+        processes = mp.cpu_count() if parallel else 1
+
+    base_rxns = list(rxn_set.get_rxns())
+    if rxns_at_temps is not None:
+        rxns_at_temps = { t: list(rxns_at_temps[t].get_rxns()) for t in temps }
+
+    # Energies are only cached for reactions adjusted from the base enumeration
+    energies = {}
+    if energy_cache is not None and rxns_at_temps is None:
+        energies = { t: energy_cache.get_energies(enumeration_hash, t, len(base_rxns)) for t in temps }
+        num_cached = sum([np.count_nonzero(~np.isnan(e)) for e in energies.values()])
+        print(f"Found {num_cached} of {len(base_rxns) * len(temps)} reaction energies in cache")
+
+    _scoring_globals['score_class'] = scorer_class
+    _scoring_globals['phase_set'] = phase_set
+    _scoring_globals['base_rxns'] = base_rxns
+    _scoring_globals['rxns_at_tmps'] = rxns_at_temps
+    _scoring_globals['energies'] = energies
+    _scoring_globals['subsets'] = subsets or {}
+
+    num_rxns = { t: len(subsets[t]) if subsets is not None else len(_get_tile_rxns(t)) for t in temps }
+    tiles = _get_tiles(temps, num_rxns, processes, chunk_size)
+    processes = max(1, min(processes, len(tiles)))
+
+    if parallel:
+        print(f"Scoring {sum(num_rxns.values())} reactions in {len(tiles)} chunks using {processes} processes")
+        with mp.get_context('fork').Pool(processes) as pool:
+            results = pool.map(_score_tile, tiles)
     else:
-        rset = _scoring_globals.get("rxns_at_tmps").get(temp)
+        results = [_score_tile(tile) for tile in tiles]
+
+    _scoring_globals = {}
+
+    if len(energies) > 0:
+        for temp, idxs, _, tile_energies in results:
+            energies[temp][idxs] = tile_energies
+        for t, e in energies.items():
+            energy_cache.put_energies(enumeration_hash, t, e)
 
-    scored_rxns: List[ScoredReaction] = score_rxns(rset, scorer, phase_set=phase_set)
-    scored_rset = ScoredReactionSet(scored_rxns, phase_set)
-    return scored_rset
+    # Reaction stoichiometry doesn't change with temperature, so it is
+    # only computed once per reaction when rxns_at_temps isn't supplied
+    stoich_cache = {}
+    def _get_stoich(temp, idx):
+        rxn = rxns_at_temps[temp][idx] if rxns_at_temps is not None else base_rxns[idx]
+        key = (temp, idx) if rxns_at_temps is not None else idx
+        if key not in stoich_cache:
+            template = ScoredReaction.from_rxn_network(0, rxn, phase_set.volumes)
+            stoich_cache[key] = (template._reactants, template._products)
+        return stoich_cache[key]
+
+    scored_rxns = { t: [] for t in temps }
+    for temp, idxs, scores, energies in results:
+        for idx, score, energy in zip(idxs, scores, energies):
+            reactants, products = _get_stoich(temp, int(idx))
+            scored_rxns[temp].append(ScoredReaction(
+                reactants,
+                products,
+                float(score),
+                energy_per_atom=float(energy)
+            ))
+
+    return { t: ScoredReactionSet(rxns, phase_set) for t, rxns in scored_rxns.items() }
+
+def _get_rxn_keys(rxn_set: ReactionSet, phase_set: SolidPhaseSet) -> List:
+    # Identifies reactions by the same volume-stoichiometry key used by ScoredReaction,
+    # so this matches exactly the reactions that scoring would produce
+    return [ScoredReaction.from_rxn_network(0, rxn, phase_set.volumes).canonical_key for rxn in rxn_set.get_rxns()]
 
 def get_scored_rxns(rxn_set: ReactionSet,
                     heating_sched: HeatingSchedule = None,
@@ -33,41 +180,129 @@ def get_scored_rxns(rxn_set: ReactionSet,
                     scorer_class: BasicScore = TammanScore,
                     phase_set: SolidPhaseSet = None,
                     rxns_at_temps = None,
-                    parallel=True):
+                    parallel=True,
+                    existing_lib: ReactionLibrary = None,
+                    processes: int = None,
+                    chunk_size: int = None,
+                    energy_cache: EnergyCache = None,
+                    use_energy_cache: bool = True,
+                    enumeration_hash: str = None):
+    """Scores the reactions in rxn_set at each of the requested temperatures and
+    collects the results into a ReactionLibrary.
+
+    If existing_lib is provided, its temperatures are carried over into the result
+    and only the work that is actually missing is done: temperatures absent from
+    existing_lib are scored from scratch, temperatures produced from a different
+    enumeration keep only the reactions still in rxn_set and have the ones they are
+    missing scored and merged in, and
+    temperatures produced from the same enumeration and scorer are reused as-is.
+    Temperatures scored with a different scorer are recomputed.
 
+    Args:
+        rxn_set (ReactionSet): The enumerated reactions
+        heating_sched (HeatingSchedule, optional): If provided, its temperatures are used.
+        temps (List, optional): The temperatures to score at if heating_sched is not provided.
+        scorer_class (BasicScore, optional): Defaults to TammanScore.
+        phase_set (SolidPhaseSet, optional): The phases present in the reactions.
+        rxns_at_temps (Dict, optional): Precomputed reaction sets keyed by temperature.
+        parallel (bool, optional): Whether to score in parallel. Work is split into
+        (temperature, reaction chunk) tiles, so even a single temperature uses every
+        process. Defaults to True.
+        existing_lib (ReactionLibrary, optional): A previously built library to extend.
+        processes (int, optional): The size of the process pool. Defaults to the number of CPUs.
+        chunk_size (int, optional): The number of reactions per tile. By default, chosen
+        so that each process receives a few tiles.
+        energy_cache (EnergyCache, optional): Where temperature-adjusted reaction energies
+        are looked up and stored. Defaults to EnergyCache().
+        use_energy_cache (bool, optional): If False, every energy is recomputed. Defaults to True.
+        enumeration_hash (str, optional): hash_rxn_set(rxn_set), if the caller has already
+        computed it. Defaults to hashing rxn_set.
+
+    Returns:
+        ReactionLibrary:
+    """
     lib = ReactionLibrary(phases=phase_set)
 
     if heating_sched is not None:
         temps = heating_sched.all_temps
 
+    # A copy, so that the temperatures added below don't leak into the caller's list
+    temps = [int(t) for t in temps]
+
     if rxns_at_temps is not None:
         rxns_at_temps = {int(t): r for t, r in rxns_at_temps.items() }
 
-    if parallel:
-        global _scoring_globals
+    if enumeration_hash is None:
+        enumeration_hash = hash_rxn_set(rxn_set)
+    if use_energy_cache and energy_cache is None:
+        energy_cache = EnergyCache()
+    scorer_name = scorer_class.__name__
 
-        _scoring_globals['score_class'] = scorer_class
-        _scoring_globals['phase_set'] = phase_set
-        _scoring_globals['base_rxns'] = rxn_set
+    temps_to_compute = temps
+    temps_to_extend = []
+    if existing_lib is not None:
+        temps_to_compute = []
+        for t in existing_lib.temps:
+            if existing_lib.get_provenance(t).get("scorer", scorer_name) != scorer_name:
+                # Scores from a different scorer can't be mixed with new ones
+                if t not in temps:
+                    temps.append(t)
+                continue
 
-        if rxns_at_temps is not None:
-            _scoring_globals['rxns_at_tmps'] = rxns_at_temps
-                
-        with mp.get_context('fork').Pool(mp.cpu_count()) as pool:
+            lib.add_rxns_at_temp(existing_lib.get_rxns_at_temp(t), t)
+            lib.set_provenance(t, **existing_lib.get_provenance(t))
+            if t in temps and lib.get_provenance(t).get("enumeration") != enumeration_hash:
+                temps_to_extend.append(t)
 
-            results = pool.map(fn, temps)
-            for t, r in zip(temps, results):
-                lib.add_rxns_at_temp(r, t)
-    else:
-        if rxns_at_temps is None:
-            rxns_at_temps = rxn_set.compute_at_temperatures(temps)
-        
-        for t in temps:
-            scorer = scorer_class(temp=t, phase_set=phase_set)
-            rset = rxns_at_temps.get(t)
-
-            scored_rxns: List[ScoredReaction] = score_rxns(rset, scorer, phase_set=phase_set)
-            scored_rset = ScoredReactionSet(scored_rxns, lib.phases)
-            lib.add_rxns_at_temp(scored_rset, t)
-
-    return lib
\ No newline at end of file
+        temps_to_compute = [t for t in temps if t not in lib.temps]
+        print(f"Reusing {len(lib.temps) - len(temps_to_extend)} temperatures from existing library, "
+              f"extending {len(temps_to_extend)} and computing {len(temps_to_compute)}")
+
+    if len(temps_to_compute) > 0:
+        scored = _score_tiles(
+            rxn_set,
+            temps_to_compute,
+            scorer_class,
+            phase_set,
+            rxns_at_temps=rxns_at_temps,
+            parallel=parallel,
+            processes=processes,
+            chunk_size=chunk_size,
+            energy_cache=energy_cache if use_energy_cache else None,
+            enumeration_hash=enumeration_hash
+        )
+        for t in temps_to_compute:
+            lib.add_rxns_at_temp(scored[t], t)
+
+    if len(temps_to_extend) > 0:
+        # Reactions that are no longer enumerated are dropped, and only the missing
+        # ones are scored. Extended temperatures are scored from the base enumeration.
+        rxn_keys = _get_rxn_keys(rxn_set, phase_set)
+        current_keys = set(rxn_keys)
+        kept = {}
+        subsets = {}
+        for t in temps_to_extend:
+            kept[t] = [r for r in lib.get_rxns_at_temp(t).reactions if r.canonical_key in current_keys]
+            kept_keys = set([r.canonical_key for r in kept[t]])
+            subsets[t] = [idx for idx, key in enumerate(rxn_keys) if key not in kept_keys]
+
+        scored = _score_tiles(
+            rxn_set,
+            temps_to_extend,
+            scorer_class,
+            phase_set,
+            parallel=parallel,
+            processes=processes,
+            chunk_size=chunk_size,
+            energy_cache=energy_cache if use_energy_cache else None,
+            enumeration_hash=enumeration_hash,
+            subsets=subsets
+        )
+        for t in temps_to_extend:
+            lib.add_rxns_at_temp(ScoredReactionSet([*kept[t], *scored[t].reactions], lib.phases), t)
+
+    created = datetime.now().isoformat()
+    for t in [*temps_to_compute, *temps_to_extend]:
+        lib.set_provenance(t, enumeration=enumeration_hash, scorer=scorer_name, created=created)
+
+    return lib
@@ -0,0 +1,54 @@
+from monty.json import MontyEncoder
+
+import hashlib
+import json
+
+from typing import Dict, Tuple
+
+def hash_dict(d: Dict) -> str:
+    """Produces a stable hex digest of a JSON-serializable dictionary. Keys are
+    sorted before hashing so that the digest does not depend on insertion order.
+
+    Args:
+        d (Dict): The dictionary to hash
+
+    Returns:
+        str:
+    """
+    serialized = json.dumps(d, sort_keys=True, cls=MontyEncoder)
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+def _rxn_set_fingerprint(rxn_set) -> Tuple:
+    # ReactionSet operations return new sets rather than modifying their inputs, so
+    # the identity of the stored arrays is enough to tell whether a set has changed
+    return (
+        *[id(getattr(rxn_set, attr, None)) for attr in ("entries", "indices", "coeffs", "all_data")],
+        getattr(rxn_set, "open_elem", None),
+        getattr(rxn_set, "chempot", None),
+    )
+
+def hash_rxn_set(rxn_set) -> str:
+    """Produces a digest identifying a reaction enumeration (a rxn_network
+    ReactionSet). Two enumerations with the same entries and reactions hash to
+    the same value.
+
+    Serializing a large enumeration is expensive, so the digest is remembered on
+    the ReactionSet and only recomputed if any of its attributes are replaced.
+
+    Args:
+        rxn_set (ReactionSet): The enumerated reactions
+
+    Returns:
+        str:
+    """
+    fingerprint = _rxn_set_fingerprint(rxn_set)
+    memo = getattr(rxn_set, "_rxn_ca_hash", None)
+    if memo is not None and memo[0] == fingerprint:
+        return memo[1]
+
+    digest = hash_dict(rxn_set.as_dict())
+    try:
+        rxn_set._rxn_ca_hash = (fingerprint, digest)
+    except AttributeError:
+        pass
+    return digest
@@ -1,38 +1,88 @@
-from ..core.reaction_result import ReactionResult
+from ..core.reaction_result import ReactionResult, ChainedReactionResult
 from ..core.reaction_controller import ReactionController
 from ..core.reaction_calculator import ReactionCalculator
-from ..core.heating import HeatingSchedule, RegrindStep, HeatingStep
+from ..core.heating import HeatingSchedule, RegrindStep, HeatingSegment
 from ..core.constants import GASES_EVOLVED, GASES_CONSUMED, MELTED_AMTS, TEMPERATURE
 from ..reactions.reaction_library import ReactionLibrary
 from ..core.melt_and_regrind import melt_and_regrind
 from ..analysis.reaction_step_analyzer import ReactionStepAnalyzer
 from .setup_reaction import setup_noise_reaction
+from .checkpoint import RunCheckpoint, get_rng_state, set_rng_state
+from .hashing import hash_dict
+from .convergence_monitor import ConvergenceMonitor
+from ..core.tau_leaping_runner import TauLeapingRunner
+from ..core.gillespie_runner import GillespieRunner
+from ..core.random_streams import REGRINDS
 
-from pylattica.core import AsynchronousRunner, Simulation, BasicController
+from pylattica.core import AsynchronousRunner, Simulation, SimulationState, BasicController
 
-from typing import List, Callable
+from typing import List, Callable, Union
 import numpy as np
 
 class HeatingScheduleRunner():
 
-    def __init__(self, middlewares: List[Callable] = []) -> None:
+    def __init__(self, middlewares: List[Callable] = [], runner: Union[TauLeapingRunner, GillespieRunner] = None) -> None:
+        """
+        Args:
+            middlewares (List[Callable], optional): Functions applied to the state between steps.
+            runner (Union[TauLeapingRunner, GillespieRunner], optional): If provided, segments
+            are run with this runner instead of visiting sites one at a time with
+            AsynchronousRunner. With a GillespieRunner, results have one step per
+            time_resolution, which is recorded under "time_resolution" in their metadata.
+        """
         self._middlewares = middlewares
+        self._runner = runner
         
     def run_multi(self,
                 simulation: Simulation,
                 reaction_lib: ReactionLibrary,
                 heating_schedule: HeatingSchedule,
                 controller: BasicController,
-                verbose=True):
-        runner = AsynchronousRunner()       
+                verbose=True,
+                checkpoint: RunCheckpoint = None,
+                checkpoint_every: int = None,
+                resume: bool = False,
+                convergence_monitor: ConvergenceMonitor = None):
+        """Runs a simulation through every step of a heating schedule.
+
+        Args:
+            simulation (Simulation): The initial simulation
+            reaction_lib (ReactionLibrary): The reactions available at each temperature
+            heating_schedule (HeatingSchedule): The schedule to follow
+            controller (BasicController): The controller implementing the update rule
+            verbose (bool, optional): Whether to show progress bars. Defaults to True.
+            checkpoint (RunCheckpoint, optional): If provided, progress is saved here
+            after every stage so that the run can be resumed.
+            checkpoint_every (int, optional): If provided along with checkpoint, progress
+            is also saved every checkpoint_every schedule steps within a stage.
+            resume (bool, optional): If True and checkpoint holds saved progress for this
+            schedule, the run continues from where it stopped. Defaults to False.
+            convergence_monitor (ConvergenceMonitor, optional): If provided, each segment
+            is run in windows and is cut short once the monitor finds it quiescent. The
+            skipped steps are kept as held steps in the result. Checkpoints within a
+            segment are then taken at window boundaries.
+
+        Returns:
+            ChainedReactionResult:
+        """
+        runner = self._runner if self._runner is not None else AsynchronousRunner()
         results: List[ReactionResult] = []
 
         starting_state = simulation.state
 
         # One "step" is visiting every site once
         step_size = len(simulation.structure.site_ids)
-        sim_size = int(step_size ** (1 / 3))
-        total_steps = len(heating_schedule)
+        sim_size = round(step_size ** (1 / 3))
+
+        # Consecutive steps at the same temperature are run as one continuous segment.
+        # Middlewares act between steps, so with middlewares every step is kept separate.
+        merge = len(self._middlewares) == 0
+        segments = heating_schedule.compile(merge=merge)
+        heating_segments = [s for s in segments if isinstance(s, HeatingSegment)]
+        total_segments = len(heating_segments)
+        ran_segment_idxs: List[int] = []
+        # The number of steps skipped at the end of each segment
+        held_steps: List[int] = []
 
         prev_temp = None
 
@@ -42,50 +92,154 @@ class HeatingScheduleRunner():
 
         reground_state = None
 
-        for step_no, step in enumerate(heating_schedule.steps):
-            if isinstance(step, HeatingStep):
-                print(f'Running step {step_no + 1} of {total_steps}.')
-                if step.temperature != prev_temp:
-                    print(f'Setting new temperature: {step.temperature}')
+        # The results of the completed chunks of the segment in progress
+        chunks: List[ReactionResult] = []
+        first_segment_idx = 0
+
+        # Seeded streams (see RandomStreams) are checkpointed along with the global generators
+        random_streams = getattr(controller, "random_streams", None)
+
+        if checkpoint is not None:
+            run_key = hash_dict({
+                "heating_schedule": heating_schedule.as_dict(),
+                "merge": merge,
+                "checkpoint_every": checkpoint_every,
+                "convergence_monitor": convergence_monitor.as_dict() if convergence_monitor is not None else None,
+                "num_sites": step_size,
+                # Only present for approximate runs, so that older checkpoints still match
+                **({ "runner": self._runner.as_dict() } if self._runner is not None else {}),
+            })
+
+            def save_progress(next_segment_idx):
+                checkpoint.save_manifest({
+                    "run_key": run_key,
+                    "segment_idx": next_segment_idx,
+                    "num_stages": len(results),
+                    "ran_segments": ran_segment_idxs,
+                    "held_steps": held_steps,
+                    "num_chunks": len(chunks),
+                    "monitor_progress": convergence_monitor.get_progress() if convergence_monitor is not None else None,
+                    "reground_state": reground_state.as_dict() if reground_state is not None else None,
+                    "prev_temp": prev_temp,
+                    "rng_state": get_rng_state(),
+                    "stream_state": random_streams.get_state() if random_streams is not None else None,
+                })
+
+            if resume and checkpoint.exists():
+                manifest = checkpoint.load_manifest()
+                if manifest["run_key"] != run_key:
+                    raise ValueError(f"Checkpoint in {checkpoint.checkpoint_dir} was saved by a different run")
+
+                first_segment_idx = manifest["segment_idx"]
+                results = [checkpoint.load_stage(i) for i in range(manifest["num_stages"])]
+                ran_segment_idxs = manifest["ran_segments"]
+                held_steps = manifest["held_steps"]
+                chunks = [checkpoint.load_chunk(i) for i in range(manifest["num_chunks"])]
+                if convergence_monitor is not None and len(chunks) > 0:
+                    convergence_monitor.set_progress(manifest["monitor_progress"])
+                if manifest["reground_state"] is not None:
+                    reground_state = SimulationState.from_dict(manifest["reground_state"])
+                prev_temp = manifest["prev_temp"]
+                set_rng_state(manifest["rng_state"])
+                if random_streams is not None and manifest.get("stream_state") is not None:
+                    random_streams.set_state(manifest["stream_state"])
+                print(f'Resuming from checkpoint at segment {len(ran_segment_idxs) + 1} of {total_segments} ({len(chunks)} chunks complete).')
+
+        for segment_idx in range(first_segment_idx, len(segments)):
+            segment = segments[segment_idx]
+            if isinstance(segment, HeatingSegment):
+                print(f'Running segment {len(ran_segment_idxs) + 1} of {total_segments} ({len(segment.step_indices)} steps at {segment.temperature}K).')
+                if segment.temperature != prev_temp:
+                    print(f'Setting new temperature: {segment.temperature}')
                 
-                prev_temp = step.temperature
-                controller.set_temperature(step.temperature)
-                controller.set_rxn_set(reaction_lib.get_rxns_at_temp(step.temperature))
+                prev_temp = segment.temperature
+                controller.set_temperature(segment.temperature)
+                controller.set_rxn_set(reaction_lib.get_rxns_at_temp(segment.temperature))
 
-                num_simulation_steps = int(step_size * step.duration)
+                num_simulation_steps = int(step_size * segment.duration)
+                if convergence_monitor is not None:
+                    chunk_sizes = _get_chunk_sizes(num_simulation_steps, int(step_size * convergence_monitor.window))
+                elif checkpoint is not None and checkpoint_every is not None:
+                    chunk_sizes = _get_chunk_sizes(num_simulation_steps, int(step_size * checkpoint_every))
+                else:
+                    chunk_sizes = [num_simulation_steps]
 
-                if reground_state is not None:
+                if len(chunks) > 0:
+                    starting_state = chunks[-1].output
+                elif reground_state is not None:
                     starting_state = reground_state
                     reground_state = None
-                if len(results) > 0:
+                elif len(results) > 0:
                     starting_state = results[-1].output
                     for middleware in self._middlewares:
-                        starting_state = middleware(starting_state, reaction_lib.phases, step.temperature)
+                        starting_state = middleware(starting_state, reaction_lib.phases, segment.temperature)
 
                 print("Setting temperature state")
-                starting_state.set_general_state({TEMPERATURE: step.temperature })
+                starting_state.set_general_state({TEMPERATURE: segment.temperature })
+
+                if convergence_monitor is not None and len(chunks) == 0:
+                    convergence_monitor.reset(starting_state)
+
+                skipped = 0
+                for chunk_idx in range(len(chunks), len(chunk_sizes)):
+                    chunk_steps = chunk_sizes[chunk_idx]
+                    if len(chunks) > 0:
+                        starting_state = chunks[-1].output
 
-                result = runner.run(
-                    starting_state,
-                    controller,
-                    num_simulation_steps,
-                    verbose=verbose
-                )
+                    chunk = runner.run(
+                        starting_state,
+                        controller,
+                        chunk_steps,
+                        verbose=verbose
+                    )
+                    chunks.append(chunk)
+
+                    if convergence_monitor is not None and convergence_monitor.update(chunk):
+                        skipped = sum(chunk_sizes[chunk_idx + 1:])
+                        if isinstance(runner, GillespieRunner):
+                            # Held steps are counted in recorded steps, not site visits
+                            skipped = int(round(skipped / step_size / runner.time_resolution))
+                        if skipped > 0:
+                            print(f'Segment is quiescent, skipping the remaining {skipped} steps.')
+                        break
+
+                    if checkpoint is not None and len(chunks) < len(chunk_sizes):
+                        checkpoint.save_chunk(len(chunks) - 1, chunk)
+                        save_progress(segment_idx)
+
+                result = _merge_chunks(chunks)
+                chunks = []
 
                 results.append(result)
-            elif isinstance(step, RegrindStep):
+                ran_segment_idxs.append(segment_idx)
+                held_steps.append(skipped)
+
+                if checkpoint is not None:
+                    checkpoint.save_stage(len(results) - 1, result)
+                    save_progress(segment_idx + 1)
+            elif isinstance(segment, RegrindStep):
                 analyzer = ReactionStepAnalyzer(reaction_lib.phases)
-                analyzer.set_step_group(results[-1].output)
+                # A schedule may start with a regrind when it continues from an
+                # earlier run (see prefix_sim)
+                analyzer.set_step_group(results[-1].output if len(results) > 0 else starting_state)
                 amts = analyzer.get_all_mole_fractions()
                 new_amts = { p: amt for p, amt in amts.items() if amt > 0.01}
 
+                # Without streams the global generators are used, which seeded runs
+                # seed and checkpoints restore
                 reground_state = setup_noise_reaction(
                     reaction_lib.phases,
                     precursor_mole_ratios = new_amts,
                     size = sim_size,
-                )
+                    rng = random_streams.get(REGRINDS) if random_streams is not None else None,
+                ).state
+
+                if checkpoint is not None:
+                    save_progress(segment_idx + 1)
 
-        result = concatenate_results(results)
+        result = concatenate_results(results, [segments[i] for i in ran_segment_idxs], held_steps)
+        if isinstance(runner, GillespieRunner):
+            result.metadata["time_resolution"] = runner.time_resolution
         return result
     
 class MeltAndRegrindMultiRunner(HeatingScheduleRunner):
@@ -93,17 +247,51 @@ class MeltAndRegrindMultiRunner(HeatingScheduleRunner):
     def __init__(self) -> None:
         super().__init__([melt_and_regrind])
 
-def concatenate_results(results: List[ReactionResult]):
-    starting_state = results[0].initial_state
+def concatenate_results(results: List[ReactionResult],
+                        segments: List[HeatingSegment] = None,
+                        held_steps: List[int] = None) -> ChainedReactionResult:
+    """Joins the results of consecutive stages into a single result. The stage
+    results are referenced rather than copied.
 
-    new_result = ReactionResult(
-        starting_state
-    )
+    Args:
+        results (List[ReactionResult]): The stage results, in order
+        segments (List[HeatingSegment], optional): The heating segment each stage
+        ran. If provided, the segment boundaries are recorded in the metadata.
+        held_steps (List[int], optional): The number of steps skipped at the end
+        of each stage.
 
-    for idx, res in enumerate(results):
-        if idx > 0:
-            new_result.add_step(res.first_step._state)
-        for d in res._diffs:
-            new_result.add_step(d)
-    
-    return new_result
\ No newline at end of file
+    Returns:
+        ChainedReactionResult:
+    """
+    new_result = ChainedReactionResult(results, held_steps=held_steps)
+
+    if segments is not None:
+        new_result.metadata["segments"] = [
+            {
+                "temperature": segment.temperature,
+                "schedule_steps": segment.step_indices,
+                "start_step": new_result.stage_offset(idx),
+                "num_steps": len(res) - 1 + held,
+                "skipped_steps": held,
+            } for idx, (res, segment, held) in enumerate(zip(results, segments, new_result.held_steps))
+        ]
+
+    return new_result
+
+def _get_chunk_sizes(num_steps: int, chunk_size: int) -> List[int]:
+    if chunk_size <= 0 or num_steps <= chunk_size:
+        return [num_steps]
+
+    sizes = [chunk_size] * (num_steps // chunk_size)
+    if num_steps % chunk_size > 0:
+        sizes.append(num_steps % chunk_size)
+    return sizes
+
+def _merge_chunks(chunks: List[ReactionResult]) -> ReactionResult:
+    # Chunks of one segment continue from each other's output, so their diffs
+    # can be appended directly without a boundary step
+    merged = chunks[0]
+    for chunk in chunks[1:]:
+        for diff in chunk.get_diffs():
+            merged.add_step(diff)
+    return merged
@@ -1,6 +1,7 @@
 from typing import Dict, Union, List
 
 from copy import copy
+import os
 from pymatgen.core.composition import Composition
 
 def normalize_dict(d: Dict):
@@ -14,6 +15,11 @@ def add_values_to_dict_by_addition(target, new_vals):
         else:
             target[k] = v
 
+CACHE_DIR_ENV_VAR = "RXN_CA_CACHE_DIR"
+
+def get_default_cache_dir() -> str:
+    return os.environ.get(CACHE_DIR_ENV_VAR, os.path.join(os.path.expanduser("~"), ".cache", "rxn_ca"))
+
 def format_chem_sys(chem_sys: Union[List, str]):
     if type(chem_sys) is str:
         arr = chem_sys.split("-")
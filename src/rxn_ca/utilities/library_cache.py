@@ -0,0 +1,164 @@
+from rxn_network.reactions.reaction_set import ReactionSet
+
+from ..core.recipe import ReactionRecipe
+from ..phases import SolidPhaseSet
+from ..reactions import ReactionLibrary
+
+from .get_scored_rxns import get_scored_rxns
+from .hashing import hash_dict, hash_rxn_set
+from .helpers import get_default_cache_dir
+from .disk_cache import DiskCache
+
+from typing import List
+
+import os
+import json
+
+DEFAULT_MAX_CACHE_SIZE = 2 * 1024 ** 3
+
+class LibraryCache(DiskCache):
+    """A content-addressed, size-bounded cache of scored ReactionLibrary objects on
+    local disk. Libraries are keyed by everything that determines their contents
+    (see get_key), so a sweep over many recipes that share an enumeration, scorer,
+    exclusion filters and temperatures only scores reactions once.
+
+    When the total size of the cached libraries exceeds max_size, the least recently
+    used libraries are evicted.
+    """
+
+    def __init__(self, cache_dir: str = None, max_size: int = DEFAULT_MAX_CACHE_SIZE):
+        """
+        Args:
+            cache_dir (str, optional): Where to store cached libraries. Defaults to the
+            libraries subdirectory of $RXN_CA_CACHE_DIR, or of ~/.cache/rxn_ca if unset.
+            max_size (int, optional): The maximum total size of the cache, in bytes.
+            Defaults to 2 GB.
+        """
+        if cache_dir is None:
+            cache_dir = os.path.join(get_default_cache_dir(), "libraries")
+
+        super().__init__(cache_dir, max_size)
+
+    @staticmethod
+    def get_key(rxn_set: ReactionSet,
+                phase_set: SolidPhaseSet,
+                score_type: str,
+                temps: List[int],
+                exclude_phases: List[str] = [],
+                exclude_theoretical: bool = False,
+                exact_phase_set: List[str] = None,
+                enumeration_hash: str = None) -> str:
+        """Computes the cache key for a library built from the supplied inputs.
+
+        Args:
+            rxn_set (ReactionSet): The enumerated reactions
+            phase_set (SolidPhaseSet): The phase set used for scoring
+            score_type (str): The name of the scorer (see ScoreTypes)
+            temps (List[int]): The temperatures in the library
+            exclude_phases (List[str], optional): Phases excluded from the library
+            exclude_theoretical (bool, optional): Whether theoretical phases are excluded
+            exact_phase_set (List[str], optional): If provided, the phases the library is limited to
+            enumeration_hash (str, optional): hash_rxn_set(rxn_set), if it is already known.
+            Hashing a large enumeration is expensive.
+
+        Returns:
+            str:
+        """
+        if enumeration_hash is None:
+            enumeration_hash = hash_rxn_set(rxn_set)
+
+        return hash_dict({
+            "rxn_set": enumeration_hash,
+            "phase_set": hash_dict(phase_set.as_dict()),
+            "score_type": str(score_type),
+            "temps": sorted([int(t) for t in temps]),
+            "exclude_phases": sorted(exclude_phases),
+            "exclude_theoretical": exclude_theoretical,
+            "exact_phase_set": sorted(exact_phase_set) if exact_phase_set is not None else None,
+        })
+
+    def get(self, key: str) -> ReactionLibrary:
+        """Retrieves the library stored under key, or None if it is not cached.
+
+        Args:
+            key (str): The cache key
+
+        Returns:
+            ReactionLibrary:
+        """
+        return self._read(key, ReactionLibrary.from_file, (json.JSONDecodeError, KeyError))
+
+    def put(self, key: str, lib: ReactionLibrary) -> None:
+        """Stores a library under key, evicting old entries if the cache is full.
+
+        Args:
+            key (str): The cache key
+            lib (ReactionLibrary): The library to store
+        """
+        self._write(key, lib.to_file)
+
+
+def get_library_for_recipe(recipe: ReactionRecipe,
+                           base_reactions: ReactionSet,
+                           phase_set: SolidPhaseSet,
+                           cache: LibraryCache = None,
+                           use_cache: bool = True) -> ReactionLibrary:
+    """Scores base_reactions at the temperatures in the recipe's heating schedule
+    and applies the recipe's exclusion filters, reusing a cached library if one
+    was previously built from the same inputs.
+
+    Args:
+        recipe (ReactionRecipe): The recipe to build the library for
+        base_reactions (ReactionSet): The enumerated reactions
+        phase_set (SolidPhaseSet): The phase set used for scoring
+        cache (LibraryCache, optional): The cache to use. Defaults to LibraryCache().
+        use_cache (bool, optional): If False, the library is always rebuilt. Defaults to True.
+
+    Returns:
+        ReactionLibrary:
+    """
+    # Serializing the enumeration is expensive, so it is hashed once for both the
+    # library cache and the energy cache used while scoring
+    enumeration_hash = hash_rxn_set(base_reactions)
+
+    key = None
+    if use_cache:
+        if cache is None:
+            cache = LibraryCache()
+
+        key = LibraryCache.get_key(
+            base_reactions,
+            phase_set,
+            recipe.score_type,
+            recipe.heating_schedule.all_temps,
+            exclude_phases=recipe.exclude_phases,
+            exclude_theoretical=recipe.exclude_theoretical,
+            exact_phase_set=recipe.exact_phase_set,
+            enumeration_hash=enumeration_hash,
+        )
+        lib = cache.get(key)
+        if lib is not None:
+            print(f"Using cached reaction library {key[:12]}")
+            return lib
+
+    reaction_lib: ReactionLibrary = get_scored_rxns(
+        base_reactions,
+        heating_sched=recipe.heating_schedule,
+        scorer_class=recipe.get_score_class(),
+        phase_set=phase_set,
+        enumeration_hash=enumeration_hash
+    )
+
+    if recipe.exclude_theoretical:
+        reaction_lib = reaction_lib.exclude_theoretical()
+
+    if len(recipe.exclude_phases) > 0:
+        reaction_lib = reaction_lib.exclude_phases(recipe.exclude_phases)
+
+    if recipe.exact_phase_set is not None:
+        reaction_lib = reaction_lib.limit_phase_set(recipe.exact_phase_set)
+
+    if use_cache:
+        cache.put(key, reaction_lib)
+
+    return reaction_lib
@@ -0,0 +1,222 @@
+from pylattica.core import Simulation, SimulationState
+from pylattica.core.constants import SITES, SITE_ID
+from pylattica.discrete.state_constants import DISCRETE_OCCUPANCY
+
+from ..core.constants import VOLUME
+from ..core.recipe import ReactionRecipe
+from ..phases import SolidPhaseSet
+from ..setup.noise_setup import get_grid_structure
+
+from .hashing import hash_dict
+from .helpers import get_default_cache_dir
+from .disk_cache import DiskCache
+from .setup_reaction import setup_noise_reaction, setup_reaction
+
+from typing import Dict
+
+import numpy as np
+import json
+import os
+import random
+
+DEFAULT_MAX_MICROSTRUCTURE_CACHE_SIZE = 1024 ** 3
+
+NOISE_SETUP = "noise"
+GRAIN_SETUP = "grain"
+
+class MicrostructureCache(DiskCache):
+    """A cache of prepared initial simulations on local disk. Each simulation is
+    stored as a compressed .npz archive holding the occupancy of every site (as an
+    index into the list of phases), the volume of every site and the general state.
+    The grid structure itself is not stored, it is rebuilt from the lattice size.
+
+    Entries are keyed by everything that determines the microstructure (see get_key),
+    including the seed used to generate it, so a set of seeds identifies a set of
+    distinct microstructures that can be shared by every recipe with the same
+    precursors and setup parameters. When the total size of the stored simulations
+    exceeds max_size, the least recently used ones are evicted.
+    """
+
+    extension = ".npz"
+
+    def __init__(self, cache_dir: str = None, max_size: int = DEFAULT_MAX_MICROSTRUCTURE_CACHE_SIZE):
+        """
+        Args:
+            cache_dir (str, optional): Where to store cached simulations. Defaults to the
+            microstructures subdirectory of $RXN_CA_CACHE_DIR, or of ~/.cache/rxn_ca if unset.
+            max_size (int, optional): The maximum total size of the cache, in bytes.
+            Defaults to 1 GB.
+        """
+        if cache_dir is None:
+            cache_dir = os.path.join(get_default_cache_dir(), "microstructures")
+
+        super().__init__(cache_dir, max_size)
+
+    @staticmethod
+    def get_key(phase_set: SolidPhaseSet,
+                reactant_amounts: Dict[str, float],
+                size: int,
+                packing_fraction: float,
+                method: str,
+                seed: int) -> str:
+        """Computes the cache key for a prepared simulation.
+
+        Args:
+            phase_set (SolidPhaseSet): The phases in the simulation
+            reactant_amounts (Dict[str, float]): The molar amounts of the precursors
+            size (int): The side length of the lattice
+            packing_fraction (float): The fraction of the lattice filled by precursors
+            method (str): The setup method, NOISE_SETUP or GRAIN_SETUP
+            seed (int): The seed used to generate the microstructure
+
+        Returns:
+            str:
+        """
+        return hash_dict({
+            "phase_set": hash_dict(phase_set.as_dict()),
+            "reactant_amounts": reactant_amounts,
+            "size": size,
+            "packing_fraction": packing_fraction,
+            "method": method,
+            "seed": seed,
+        })
+
+    def get(self, key: str, phase_set: SolidPhaseSet) -> Simulation:
+        """Retrieves the simulation stored under key, or None if it is not cached.
+
+        Args:
+            key (str): The cache key
+            phase_set (SolidPhaseSet): The phases in the simulation
+
+        Returns:
+            Simulation:
+        """
+        def load(fpath: str):
+            with np.load(fpath) as data:
+                return (
+                    data["phases"].tolist(),
+                    data["site_ids"].tolist(),
+                    data["occupancy"].tolist(),
+                    data["volumes"].tolist(),
+                    json.loads(str(data["general"])),
+                    int(data["dim"]),
+                    int(data["size"]),
+                )
+
+        entry = self._read(key, load, (ValueError, KeyError, OSError))
+        if entry is None:
+            return None
+        phases, site_ids, occupancy, volumes, general, dim, size = entry
+
+        state = SimulationState()
+        state.get_state()[SITES] = {
+            sid: {
+                SITE_ID: sid,
+                DISCRETE_OCCUPANCY: phases[occ],
+                VOLUME: vol
+            } for sid, occ, vol in zip(site_ids, occupancy, volumes)
+        }
+        state.set_general_state(general)
+
+        return Simulation(state, get_grid_structure(phase_set, dim, size))
+
+    def put(self, key: str, simulation: Simulation) -> None:
+        """Stores a simulation under key, evicting old entries if the cache is full.
+
+        Args:
+            key (str): The cache key
+            simulation (Simulation): The simulation to store
+        """
+        site_states = simulation.state.get_state()[SITES]
+        site_ids = list(site_states.keys())
+
+        phases = sorted(set([s[DISCRETE_OCCUPANCY] for s in site_states.values()]))
+        phase_idxs = { p: idx for idx, p in enumerate(phases) }
+
+        def dump(fpath: str):
+            with open(fpath, "wb") as f:
+                np.savez_compressed(
+                    f,
+                    phases=np.array(phases),
+                    site_ids=np.array(site_ids, dtype=np.int64),
+                    occupancy=np.array([phase_idxs[site_states[sid][DISCRETE_OCCUPANCY]] for sid in site_ids], dtype=np.int32),
+                    volumes=np.array([site_states[sid][VOLUME] for sid in site_ids], dtype=np.float64),
+                    general=np.array(json.dumps(simulation.state.get_general_state())),
+                    dim=simulation.structure.dim,
+                    size=round(len(site_ids) ** (1 / simulation.structure.dim)),
+                )
+
+        self._write(key, dump)
+
+
+def _build_initial_simulation(recipe: ReactionRecipe, phase_set: SolidPhaseSet, method: str, seed: int) -> Simulation:
+    if method == NOISE_SETUP:
+        return setup_noise_reaction(
+            phase_set,
+            precursor_mole_ratios = recipe.reactant_amounts,
+            size = recipe.simulation_size,
+            packing_fraction = recipe.packing_fraction,
+            rng = seed
+        )
+    elif method == GRAIN_SETUP:
+        # Grain growth draws from the random module, so it is seeded (and then
+        # restored) around the setup
+        prev_random_state = random.getstate()
+        if seed is not None:
+            random.seed(seed)
+        try:
+            return setup_reaction(
+                phase_set,
+                precursor_mole_ratios = recipe.reactant_amounts,
+                size = recipe.simulation_size,
+                vol_multiplier = recipe.packing_fraction,
+                rng = seed
+            )
+        finally:
+            random.setstate(prev_random_state)
+    else:
+        raise ValueError(f"Unknown setup method {method}")
+
+def get_initial_simulation(recipe: ReactionRecipe,
+                           phase_set: SolidPhaseSet,
+                           seed: int = None,
+                           method: str = NOISE_SETUP,
+                           cache: MicrostructureCache = None,
+                           use_cache: bool = True) -> Simulation:
+    """Prepares the initial simulation for a recipe, reusing a cached microstructure
+    generated with the same parameters and seed if one exists. Without a seed the
+    microstructure is random and is neither read from nor written to the cache.
+
+    Args:
+        recipe (ReactionRecipe): The recipe to prepare a simulation for
+        phase_set (SolidPhaseSet): The phases in the simulation
+        seed (int, optional): The seed identifying the microstructure
+        method (str, optional): NOISE_SETUP or GRAIN_SETUP. Defaults to NOISE_SETUP.
+        cache (MicrostructureCache, optional): The cache to use. Defaults to MicrostructureCache().
+        use_cache (bool, optional): If False, the simulation is always rebuilt. Defaults to True.
+
+    Returns:
+        Simulation:
+    """
+    if seed is None or not use_cache:
+        return _build_initial_simulation(recipe, phase_set, method, seed)
+
+    if cache is None:
+        cache = MicrostructureCache()
+
+    key = MicrostructureCache.get_key(
+        phase_set,
+        recipe.reactant_amounts,
+        recipe.simulation_size,
+        recipe.packing_fraction,
+        method,
+        seed
+    )
+    simulation = cache.get(key, phase_set)
+    if simulation is not None:
+        print(f"Using cached initial microstructure {key[:12]} (seed {seed})")
+        return simulation
+
+    simulation = _build_initial_simulation(recipe, phase_set, method, seed)
+    cache.put(key, simulation)
+    return simulation
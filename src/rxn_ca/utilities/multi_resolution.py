@@ -0,0 +1,392 @@
+from ..core.recipe import ReactionRecipe
+from ..core.heating import HeatingSchedule, HeatingStep
+from ..core.reaction_result import ChainedReactionResult
+from ..core.constants import VOLUME, GASES_EVOLVED, GASES_CONSUMED, MELTED_AMTS
+from ..reactions import ReactionLibrary
+from ..phases import SolidPhaseSet
+from ..setup.noise_setup import get_grid_structure
+from ..setup.volume_tuner import VolumeTuner
+from ..setup.constants import VOLUME_TOLERANCE_ABS, VOLUME_TOLERANCE_FRAC
+from ..computing.schemas.ca_result_schema import RxnCAResultDoc
+from ..core.random_streams import seed_global_generators
+
+from rxn_network.reactions.reaction_set import ReactionSet
+from pylattica.core import Simulation, SimulationState
+from pylattica.core.constants import SITES, SITE_ID
+from pylattica.discrete.state_constants import DISCRETE_OCCUPANCY
+
+from typing import Dict, Tuple, Union
+
+import dataclasses
+import numpy as np
+
+from .single_sim import run_single_sim
+from .library_cache import LibraryCache, get_library_for_recipe
+from .prune_library import prune_library_for_recipe
+from .microstructure_cache import MicrostructureCache, get_initial_simulation, NOISE_SETUP
+from .convergence_monitor import get_event_rate
+from .prefix_sim import _get_units
+
+FREE_SPACE = SolidPhaseSet.FREE_SPACE
+
+# General state entries holding amounts that scale with the size of the lattice
+_EXTENSIVE_AMOUNTS = [GASES_EVOLVED, GASES_CONSUMED, MELTED_AMTS]
+
+def coarsen_simulation(simulation: Simulation,
+                       phase_set: SolidPhaseSet,
+                       factor: int,
+                       rng: Union[np.random.Generator, int] = None) -> Simulation:
+    """Builds a lattice factor times smaller along each side, in which every site
+    stands for a factor x factor x factor block of the original. Each coarse site
+    takes one phase from its block, drawn in proportion to the volume (or, for free
+    space, the number of sites) the phase holds there. The cell volumes are then
+    tuned so that every phase holds exactly its original total volume divided by
+    factor ** 3.
+
+    Args:
+        simulation (Simulation): The fine simulation
+        phase_set (SolidPhaseSet): The phases in the simulation
+        factor (int): The block size. Must divide the side length of the lattice.
+        rng (Union[np.random.Generator, int], optional): The random number generator,
+        or a seed for one.
+
+    Returns:
+        Simulation:
+    """
+    rng = np.random.default_rng(rng)
+    structure = simulation.structure
+    size = _get_side_length(simulation)
+    if size % factor != 0:
+        raise ValueError(f"A lattice of side {size} cannot be coarsened by a factor of {factor}")
+
+    coarse_size = size // factor
+    coarse_structure = get_grid_structure(phase_set, 3, coarse_size)
+
+    blocks: Dict[int, Dict[str, float]] = {}
+    for site_id in structure.site_ids:
+        site_state = simulation.state.get_site_state(site_id)
+        coarse_id = coarse_structure.id_at(tuple(structure.site_location(site_id) // factor))
+        block = blocks.setdefault(coarse_id, {})
+        phase = site_state[DISCRETE_OCCUPANCY]
+        amount = 1.0 if phase == FREE_SPACE else site_state[VOLUME]
+        block[phase] = block.get(phase, 0.0) + amount
+
+    occupancy = {}
+    for coarse_id, block in blocks.items():
+        phases = list(block.keys())
+        weights = np.array([block[p] for p in phases])
+        occupancy[coarse_id] = phases[int(rng.choice(len(phases), p=weights / weights.sum()))]
+
+    # A phase too scarce to win any block keeps the block where it is most abundant,
+    # so that none of its volume is lost
+    fine_volumes = get_phase_volumes(simulation.state)
+    for phase in fine_volumes:
+        counts = _count_phases(occupancy)
+        if counts.get(phase, 0) > 0:
+            continue
+        candidates = [cid for cid, block in blocks.items() if phase in block and counts[occupancy[cid]] > 1]
+        if len(candidates) > 0:
+            occupancy[max(candidates, key=lambda cid: blocks[cid][phase])] = phase
+
+    state = SimulationState()
+    state.get_state()[SITES] = {
+        coarse_id: { SITE_ID: coarse_id, DISCRETE_OCCUPANCY: phase, VOLUME: 1.0 }
+        for coarse_id, phase in occupancy.items()
+    }
+    state.set_general_state(_scale_general_state(simulation.state, 1 / factor ** 3))
+
+    VolumeTuner(phase_set, { p: v / factor ** 3 for p, v in fine_volumes.items() }).tune(state)
+    return Simulation(state, coarse_structure)
+
+def refine_simulation(simulation: Simulation,
+                      phase_set: SolidPhaseSet,
+                      factor: int,
+                      mixing: float = 0.25,
+                      rng: Union[np.random.Generator, int] = None) -> Simulation:
+    """Builds a lattice factor times larger along each side by splitting every site
+    into a factor x factor x factor block. Each fine site takes the phase of its
+    coarse site, or with probability mixing the phase of a random neighbor of the
+    coarse site, which roughens the block boundaries. One site of every block always
+    keeps the coarse phase. The cell volumes are then tuned so that every phase
+    holds exactly its coarse total volume times factor ** 3.
+
+    Args:
+        simulation (Simulation): The coarse simulation
+        phase_set (SolidPhaseSet): The phases in the simulation
+        factor (int): The block size
+        mixing (float, optional): The chance that a fine site takes a neighbor's
+        phase. Defaults to 0.25.
+        rng (Union[np.random.Generator, int], optional): The random number generator,
+        or a seed for one.
+
+    Returns:
+        Simulation:
+    """
+    rng = np.random.default_rng(rng)
+    coarse_structure = simulation.structure
+    fine_structure = get_grid_structure(phase_set, 3, _get_side_length(simulation) * factor)
+
+    # The face neighbors of every coarse site, with periodic boundaries
+    coarse_size = _get_side_length(simulation)
+    offsets = [np.array(o) for o in [(1, 0, 0), (-1, 0, 0), (0, 1, 0), (0, -1, 0), (0, 0, 1), (0, 0, -1)]]
+
+    sites = {}
+    for fine_id in fine_structure.site_ids:
+        location = fine_structure.site_location(fine_id)
+        coarse_location = location // factor
+        source = coarse_structure.id_at(tuple(coarse_location))
+
+        is_anchor = not np.any(location % factor)
+        if not is_anchor and rng.random() < mixing:
+            offset = offsets[int(rng.integers(len(offsets)))]
+            source = coarse_structure.id_at(tuple((coarse_location + offset) % coarse_size))
+
+        source_state = simulation.state.get_site_state(source)
+        sites[fine_id] = {
+            SITE_ID: fine_id,
+            DISCRETE_OCCUPANCY: source_state[DISCRETE_OCCUPANCY],
+            VOLUME: source_state[VOLUME],
+        }
+
+    state = SimulationState()
+    state.get_state()[SITES] = sites
+    state.set_general_state(_scale_general_state(simulation.state, factor ** 3))
+
+    coarse_volumes = get_phase_volumes(simulation.state)
+    VolumeTuner(phase_set, { p: v * factor ** 3 for p, v in coarse_volumes.items() }).tune(state)
+    return Simulation(state, fine_structure)
+
+def get_phase_volumes(state: SimulationState) -> Dict[str, float]:
+    """The total volume of each phase on the lattice, excluding free space and gases.
+
+    Args:
+        state (SimulationState): The state
+
+    Returns:
+        Dict[str, float]:
+    """
+    volumes = {}
+    for site_state in state.get_state()[SITES].values():
+        phase = site_state[DISCRETE_OCCUPANCY]
+        if phase != FREE_SPACE:
+            volumes[phase] = volumes.get(phase, 0.0) + site_state[VOLUME]
+    return volumes
+
+def get_volume_errors(target: Dict[str, float], actual: Dict[str, float]) -> Dict[str, float]:
+    """Finds the phases whose total volume is outside the setup tolerances
+    (VOLUME_TOLERANCE_ABS and VOLUME_TOLERANCE_FRAC) of its target.
+
+    Args:
+        target (Dict[str, float]): The target volume of each phase
+        actual (Dict[str, float]): The actual volume of each phase
+
+    Returns:
+        Dict[str, float]: The absolute difference of each phase out of tolerance
+    """
+    errors = {}
+    for phase, ideal in target.items():
+        diff = abs(ideal - actual.get(phase, 0.0))
+        if diff > VOLUME_TOLERANCE_ABS or (ideal > 0 and diff / ideal > VOLUME_TOLERANCE_FRAC):
+            errors[phase] = diff
+    return errors
+
+def split_schedule(heating_schedule: HeatingSchedule, num_steps: int) -> Tuple[HeatingSchedule, HeatingSchedule]:
+    """Splits a schedule before step num_steps. A regrind directly before the split
+    is moved into the second part, so that the reground state is not lost at the end
+    of the first.
+
+    Args:
+        heating_schedule (HeatingSchedule): The schedule to split
+        num_steps (int): The index of the first step of the second part
+
+    Returns:
+        Tuple[HeatingSchedule, HeatingSchedule]:
+    """
+    head = []
+    for unit in _get_units(heating_schedule):
+        if len(head) + len(unit) > num_steps:
+            break
+        head.extend(unit)
+
+    return HeatingSchedule(head), HeatingSchedule(heating_schedule.steps[len(head):])
+
+def run_multi_resolution_sim(recipe: ReactionRecipe,
+                             base_reactions: ReactionSet = None,
+                             reaction_lib: ReactionLibrary = None,
+                             phase_set: SolidPhaseSet = None,
+                             initial_simulation: Simulation = None,
+                             factor: int = 2,
+                             refine_at: int = None,
+                             refine_event_rate: float = 0.01,
+                             mixing: float = 0.25,
+                             seed: int = None,
+                             prune_library: bool = False,
+                             library_cache: LibraryCache = None,
+                             use_library_cache: bool = True,
+                             setup_method: str = NOISE_SETUP,
+                             microstructure_cache: MicrostructureCache = None,
+                             use_microstructure_cache: bool = True) -> RxnCAResultDoc:
+    """Runs the first part of a recipe's heating schedule on a coarsened lattice (see
+    coarsen_simulation) and the rest at full resolution (see refine_simulation).
+
+    The schedule is refined before step refine_at if it is given. Otherwise the
+    coarse lattice of the first realization is run one heating step at a time, and
+    the lattice is refined after the first step in which the fraction of updates
+    that carried out a reaction reaches refine_event_rate. The other realizations
+    are refined at the same point, so that they all cover the same part of the
+    schedule. At least the last heating step is always run at full resolution.
+
+    Args:
+        recipe (ReactionRecipe): The recipe to run
+        initial_simulation (Simulation, optional): The full-resolution starting
+        simulation. Defaults to one set up from the recipe for each realization.
+        factor (int, optional): The coarsening factor along each side. Must divide
+        recipe.simulation_size. Defaults to 2.
+        refine_at (int, optional): The index of the first schedule step run at full
+        resolution. Defaults to choosing it from the event rate.
+        refine_event_rate (float, optional): The event rate at which the lattice is
+        refined when refine_at is not given. Defaults to 0.01.
+        mixing (float, optional): See refine_simulation. Defaults to 0.25.
+        seed (int, optional): If provided, realization i uses seed + i for its initial
+        microstructure and for coarsening and refining.
+        prune_library (bool, optional): Whether to drop the reactions the recipe cannot
+        reach (see prune_library_for_recipe). Defaults to False.
+
+    Returns:
+        RxnCAResultDoc: The full-resolution part of every realization. Its recipe
+        holds the part of the heating schedule those results cover, so that steps line
+        up with it as for any other result. The index of the step of the full schedule
+        at which it starts is recorded as "refined_at" under "multi_resolution" in the
+        metadata of the document and of each result.
+    """
+    if base_reactions is None and reaction_lib is None:
+        raise ValueError("Must provide either base_reactions or reaction_lib")
+
+    units = _get_units(recipe.heating_schedule)
+    if refine_at is not None and not 0 <= refine_at < len(recipe.heating_schedule.steps):
+        raise ValueError("refine_at must be the index of a step of the heating schedule")
+
+    if reaction_lib is None:
+        reaction_lib = get_library_for_recipe(
+            recipe,
+            base_reactions,
+            phase_set,
+            cache=library_cache,
+            use_cache=use_library_cache
+        )
+    if prune_library:
+        reaction_lib = prune_library_for_recipe(reaction_lib, recipe)
+    phases = reaction_lib.phases
+
+    results = []
+    for realization_idx in range(recipe.num_realizations):
+        realization_seed = seed + realization_idx if seed is not None else None
+        rng = np.random.default_rng(realization_seed)
+        if realization_seed is not None:
+            seed_global_generators(realization_seed)
+
+        if initial_simulation is None:
+            fine_simulation = get_initial_simulation(
+                recipe,
+                phases,
+                seed=realization_seed,
+                method=setup_method,
+                cache=microstructure_cache,
+                use_cache=use_microstructure_cache
+            )
+        else:
+            fine_simulation = initial_simulation
+        simulation = coarsen_simulation(fine_simulation, phases, factor, rng)
+        coarse_recipe = dataclasses.replace(recipe, simulation_size=recipe.simulation_size // factor)
+
+        def run_coarse(schedule: HeatingSchedule) -> Simulation:
+            doc = run_single_sim(
+                dataclasses.replace(coarse_recipe, heating_schedule=schedule),
+                reaction_lib=reaction_lib,
+                initial_simulation=Simulation(simulation.state.copy(), simulation.structure),
+                prune_library=False
+            )
+            return doc.results[0]
+
+        print(f'================= RUNNING COARSE STAGE ({coarse_recipe.simulation_size} SITES PER SIDE) =================')
+
+        event_rates = []
+        if refine_at is not None:
+            head, tail = split_schedule(recipe.heating_schedule, refine_at)
+            if len(head.steps) > 0:
+                coarse_result = run_coarse(head)
+                event_rates.append(get_event_rate(coarse_result))
+                simulation = Simulation(coarse_result.output, simulation.structure)
+        else:
+            # Leave the last unit with a heating step for the fine lattice
+            num_coarsenable = max([i for i, u in enumerate(units) if any(isinstance(s, HeatingStep) for s in u)], default=0)
+            num_coarse_steps = 0
+            for unit in units[:num_coarsenable]:
+                coarse_result = run_coarse(HeatingSchedule(unit))
+                event_rates.append(get_event_rate(coarse_result))
+                simulation = Simulation(coarse_result.output, simulation.structure)
+                num_coarse_steps += len(unit)
+                if event_rates[-1] >= refine_event_rate:
+                    break
+            head, tail = split_schedule(recipe.heating_schedule, num_coarse_steps)
+
+        print(f'================= REFINING AFTER {len(head.steps)} OF {len(recipe.heating_schedule.steps)} SCHEDULE STEPS =================')
+
+        coarse_volumes = get_phase_volumes(simulation.state)
+        simulation = refine_simulation(simulation, phases, factor, mixing, rng)
+        volume_errors = get_volume_errors(
+            { p: v * factor ** 3 for p, v in coarse_volumes.items() },
+            get_phase_volumes(simulation.state)
+        )
+        if len(volume_errors) > 0:
+            raise RuntimeError(f"Refining changed the volumes of {', '.join(volume_errors.keys())} beyond tolerance")
+
+        fine_doc = run_single_sim(
+            dataclasses.replace(recipe, heating_schedule=tail),
+            reaction_lib=reaction_lib,
+            initial_simulation=simulation,
+            prune_library=False
+        )
+
+        # Later realizations are refined where the first one was
+        refine_at = len(head.steps)
+
+        result: ChainedReactionResult = fine_doc.results[0]
+        result.metadata["multi_resolution"] = {
+            "factor": factor,
+            "coarse_size": coarse_recipe.simulation_size,
+            "refined_at": len(head.steps),
+            "coarse_event_rates": event_rates,
+        }
+        results.append(result)
+
+    return RxnCAResultDoc(
+        recipe=dataclasses.replace(recipe, heating_schedule=tail),
+        results=results,
+        reaction_library=reaction_lib,
+        phases=phases,
+        metadata={
+            "multi_resolution": {
+                "factor": factor,
+                "coarse_size": recipe.simulation_size // factor,
+                "refined_at": refine_at,
+                "heating_schedule": recipe.heating_schedule.as_dict(),
+            }
+        }
+    )
+
+def _get_side_length(simulation: Simulation) -> int:
+    return round(len(simulation.structure.site_ids) ** (1 / 3))
+
+def _count_phases(occupancy: Dict[int, str]) -> Dict[str, int]:
+    counts = {}
+    for phase in occupancy.values():
+        counts[phase] = counts.get(phase, 0) + 1
+    return counts
+
+def _scale_general_state(state: SimulationState, factor: float) -> Dict:
+    general = dict(state.get_general_state())
+    for key in _EXTENSIVE_AMOUNTS:
+        if isinstance(general.get(key), dict):
+            general[key] = { k: v * factor for k, v in general[key].items() }
+    return general
@@ -0,0 +1,209 @@
+from ..core.recipe import ReactionRecipe
+from ..core.random_streams import seed_global_generators
+from ..reactions import ReactionLibrary
+from ..phases import SolidPhaseSet
+from ..analysis.reaction_step_analyzer import ReactionStepAnalyzer, AnalysisQuantity, AnalysisMode
+from ..computing.schemas.ca_result_schema import RxnCAResultDoc
+
+from rxn_network.reactions.reaction_set import ReactionSet
+from pylattica.core import Simulation
+
+from typing import Dict, List
+
+import multiprocessing as mp
+import numpy as np
+
+from .single_sim import run_single_sim
+from .library_cache import LibraryCache, get_library_for_recipe
+from .prune_library import prune_library_for_recipe
+from .microstructure_cache import MicrostructureCache, get_initial_simulation, NOISE_SETUP
+
+# Recipes in a comparison group must start from the same microstructures
+_SETUP_FIELDS = ["reactant_amounts", "simulation_size", "packing_fraction"]
+
+_recipes = "recipes"
+_reaction_libs = "reaction_libs"
+_initial_simulations = "initial_simulations"
+_seed = "seed"
+
+def _get_paired_result(task):
+    recipe_idx, realization_idx = task
+    recipe: ReactionRecipe = mp_globals[_recipes][recipe_idx]
+    initial_simulation: Simulation = mp_globals[_initial_simulations][realization_idx]
+    stream_seed = mp_globals[_seed] + realization_idx
+    seed_global_generators(stream_seed)
+
+    result_doc = run_single_sim(
+        recipe,
+        reaction_lib=mp_globals[_reaction_libs][recipe_idx],
+        initial_simulation=Simulation(initial_simulation.state.copy(), initial_simulation.structure),
+        prune_library=False,
+        stream_seed=stream_seed
+    )
+
+    result = result_doc.results[0]
+    result.metadata["pairing"] = {
+        "realization": realization_idx,
+        "stream_seed": stream_seed,
+    }
+    return result
+
+
+def run_paired_sims(recipes: List[ReactionRecipe],
+                    base_reactions: ReactionSet = None,
+                    reaction_lib: ReactionLibrary = None,
+                    phase_set: SolidPhaseSet = None,
+                    num_realizations: int = None,
+                    seed: int = 0,
+                    prune_library: bool = False,
+                    library_cache: LibraryCache = None,
+                    use_library_cache: bool = True,
+                    setup_method: str = NOISE_SETUP,
+                    microstructure_cache: MicrostructureCache = None,
+                    use_microstructure_cache: bool = True,
+                    parallel: bool = True) -> List[RxnCAResultDoc]:
+    """Runs a group of recipes to be compared with each other using common random
+    numbers: realization k of every recipe starts from the same initial
+    microstructure (generated with seed + k) and draws from RandomStreams seeded
+    with seed + k. The recipes may differ in anything but their precursors,
+    simulation size and packing fraction.
+
+    Because paired realizations share their randomness, the difference between two
+    recipes is much less noisy realization by realization than the difference
+    between independent runs, so fewer realizations are needed to resolve it (see
+    get_paired_differences).
+
+    Args:
+        recipes (List[ReactionRecipe]): The recipes to compare
+        num_realizations (int, optional): The number of realizations of every recipe.
+        Defaults to the largest num_realizations of the recipes.
+        seed (int, optional): The seed of the first realization. Defaults to 0.
+        prune_library (bool, optional): Whether to drop the reactions each recipe cannot
+        reach (see prune_library_for_recipe). Defaults to False.
+        parallel (bool, optional): Whether to run in parallel. Defaults to True.
+
+    Returns:
+        List[RxnCAResultDoc]: One result document per recipe, in order. Each result
+        records its realization index and stream seed under "pairing" in its metadata.
+    """
+    first = recipes[0]
+    for recipe in recipes[1:]:
+        for attr in _SETUP_FIELDS:
+            if getattr(recipe, attr) != getattr(first, attr):
+                raise ValueError(f"Paired recipes must have the same {attr}")
+
+    if base_reactions is None and reaction_lib is None:
+        raise ValueError("Must provide either base_reactions or reaction_lib")
+
+    if num_realizations is None:
+        num_realizations = max([r.num_realizations for r in recipes])
+
+    reaction_libs = []
+    for recipe in recipes:
+        lib = reaction_lib
+        if lib is None:
+            lib = get_library_for_recipe(
+                recipe,
+                base_reactions,
+                phase_set,
+                cache=library_cache,
+                use_cache=use_library_cache
+            )
+        if prune_library:
+            lib = prune_library_for_recipe(lib, recipe)
+        reaction_libs.append(lib)
+
+    print(f'================= RUNNING {len(recipes)} PAIRED RECIPES w/ {num_realizations} REALIZATIONS =================')
+
+    initial_simulations = [
+        get_initial_simulation(
+            first,
+            reaction_libs[0].phases,
+            seed=seed + k,
+            method=setup_method,
+            cache=microstructure_cache,
+            use_cache=use_microstructure_cache
+        ) for k in range(num_realizations)
+    ]
+
+    global mp_globals
+
+    mp_globals = {
+        _recipes: recipes,
+        _reaction_libs: reaction_libs,
+        _initial_simulations: initial_simulations,
+        _seed: seed,
+    }
+
+    tasks = [(recipe_idx, k) for recipe_idx in range(len(recipes)) for k in range(num_realizations)]
+    if parallel:
+        with mp.get_context("fork").Pool(min(len(tasks), mp.cpu_count())) as pool:
+            results = pool.map(_get_paired_result, tasks)
+    else:
+        results = [_get_paired_result(task) for task in tasks]
+
+    result_docs = []
+    for recipe_idx, recipe in enumerate(recipes):
+        recipe_results = [res for (idx, _), res in zip(tasks, results) if idx == recipe_idx]
+        result_docs.append(RxnCAResultDoc(
+            recipe=recipe,
+            results=recipe_results,
+            reaction_library=reaction_libs[recipe_idx],
+            phases=reaction_libs[recipe_idx].phases,
+            metadata={
+                "paired": {
+                    "seed": seed,
+                    "num_realizations": num_realizations,
+                    "group": [r.name if r.name is not None else i for i, r in enumerate(recipes)],
+                }
+            }
+        ))
+
+    return result_docs
+
+def get_paired_differences(doc_a: RxnCAResultDoc,
+                           doc_b: RxnCAResultDoc,
+                           phase: str,
+                           quantity: AnalysisQuantity = AnalysisQuantity.MOLES,
+                           mode: AnalysisMode = AnalysisMode.FRACTIONAL,
+                           confidence_z: float = 1.96) -> Dict:
+    """Estimates the difference in the final amount of a phase between two recipes
+    run with run_paired_sims (b minus a). The confidence interval of the paired
+    estimate is reported alongside the one that would apply if the realizations
+    were independent, which shows how much the pairing gained.
+
+    Args:
+        doc_a (RxnCAResultDoc): The results of the first recipe
+        doc_b (RxnCAResultDoc): The results of the second recipe
+        phase (str): The phase to compare
+        quantity (AnalysisQuantity, optional): The quantity to compare. Defaults to MOLES.
+        mode (AnalysisMode, optional): Absolute or fractional amounts. Defaults to FRACTIONAL.
+        confidence_z (float, optional): The number of standard errors. Defaults to 1.96.
+
+    Returns:
+        Dict:
+    """
+    def final_amounts(doc: RxnCAResultDoc) -> Dict[int, float]:
+        analyzer = ReactionStepAnalyzer(doc.phases)
+        return {
+            res.metadata["pairing"]["realization"]: analyzer.set_step_group(res.last_step).get_value_general(quantity, mode, phase=phase)
+            for res in doc.results
+        }
+
+    amts_a = final_amounts(doc_a)
+    amts_b = final_amounts(doc_b)
+    paired = sorted(set(amts_a.keys()).intersection(amts_b.keys()))
+    if len(paired) < 2:
+        raise ValueError("At least two paired realizations are needed")
+
+    a = np.array([amts_a[k] for k in paired])
+    b = np.array([amts_b[k] for k in paired])
+    diffs = b - a
+    n = len(paired)
+
+    return {
+        "num_pairs": n,
+        "mean_difference": float(diffs.mean()),
+        "paired_half_width": float(confidence_z * diffs.std(ddof=1) / np.sqrt(n)),
+        "unpaired_half_width": float(confidence_z * np.sqrt((a.var(ddof=1) + b.var(ddof=1)) / n)),
+    }
@@ -7,21 +7,75 @@ from ..computing.schemas.ca_result_schema import RxnCAResultDoc
 from rxn_network.reactions.reaction_set import ReactionSet
 from pylattica.core import Simulation
 
+from typing import Dict, List
+
 import multiprocessing as mp
+import numpy as np
+import os
 
 from .single_sim import run_single_sim
-from .get_scored_rxns import get_scored_rxns
+from .library_cache import LibraryCache, get_library_for_recipe
+from .microstructure_cache import MicrostructureCache, NOISE_SETUP
+from .prune_library import prune_library_for_recipe
+from .convergence_monitor import ConvergenceMonitor
+from ..analysis.ensemble_aggregator import EnsembleAggregator
+from ..analysis.reaction_step_analyzer import ReactionStepAnalyzer
+from ..core.reaction_result import ReactionResult
+from ..core.tau_leaping_runner import TauLeapingRunner
+from ..core.gillespie_runner import GillespieRunner
+from ..core.random_streams import seed_global_generators
 
 _reaction_lib = "reaction_lib"
 _recipe = "recipe"
 _initial_simulation = "initial_simulation"
+_setup_method = "setup_method"
+_microstructure_cache = "microstructure_cache"
+_use_microstructure_cache = "use_microstructure_cache"
+_checkpoint_dir = "checkpoint_dir"
+_checkpoint_every = "checkpoint_every"
+_resume = "resume"
+_convergence_monitor = "convergence_monitor"
+_seed = "seed"
+_stream_seed = "stream_seed"
+_tau_leaping = "tau_leaping"
+_gillespie = "gillespie"
+
+def _get_result(realization_idx):
+
+    # With a seed, realization i starts from the microstructure generated with
+    # seed + i, so that repeated runs can draw their starting states from the
+    # cache. Without one, every realization gets a fresh random setup.
+    use_cache = mp_globals.get(_use_microstructure_cache)
+    seed = mp_globals.get(_seed)
+    if seed is not None:
+        seed = seed + realization_idx
+    seed_global_generators(seed)
 
-def _get_result(_):
+    stream_seed = mp_globals.get(_stream_seed)
+    if stream_seed is not None:
+        stream_seed = stream_seed + realization_idx
+
+    # Each realization keeps its own checkpoint
+    checkpoint_dir = mp_globals.get(_checkpoint_dir)
+    if checkpoint_dir is not None:
+        checkpoint_dir = os.path.join(checkpoint_dir, f"realization_{realization_idx}")
 
     result: RxnCAResultDoc = run_single_sim(
         mp_globals[_recipe],
         reaction_lib=mp_globals.get(_reaction_lib),
-        initial_simulation=mp_globals.get(_initial_simulation)
+        initial_simulation=mp_globals.get(_initial_simulation),
+        prune_library=False,
+        seed=seed,
+        setup_method=mp_globals.get(_setup_method),
+        microstructure_cache=mp_globals.get(_microstructure_cache),
+        use_microstructure_cache=use_cache,
+        checkpoint_dir=checkpoint_dir,
+        checkpoint_every=mp_globals.get(_checkpoint_every),
+        resume=mp_globals.get(_resume),
+        convergence_monitor=mp_globals.get(_convergence_monitor),
+        stream_seed=stream_seed,
+        tau_leaping=mp_globals.get(_tau_leaping),
+        gillespie=mp_globals.get(_gillespie)
     )
     return result.results[0]
 
@@ -30,7 +84,66 @@ def run_sim_parallel(recipe: ReactionRecipe,
                      base_reactions: ReactionSet = None,
                      reaction_lib: ReactionLibrary = None,
                      initial_simulation: Simulation = None,
-                     phase_set: SolidPhaseSet = None):
+                     phase_set: SolidPhaseSet = None,
+                     prune_library: bool = False,
+                     library_cache: LibraryCache = None,
+                     use_library_cache: bool = True,
+                     setup_method: str = NOISE_SETUP,
+                     microstructure_cache: MicrostructureCache = None,
+                     use_microstructure_cache: bool = True,
+                     checkpoint_dir: str = None,
+                     checkpoint_every: int = None,
+                     resume: bool = False,
+                     convergence_monitor: ConvergenceMonitor = None,
+                     ensemble_aggregator: EnsembleAggregator = None,
+                     ci_tolerance: float = None,
+                     target_phase: str = None,
+                     min_realizations: int = 2,
+                     max_realizations: int = None,
+                     wave_size: int = None,
+                     confidence_z: float = 1.96,
+                     seed: int = None,
+                     stream_seed: int = None,
+                     tau_leaping: TauLeapingRunner = None,
+                     gillespie: GillespieRunner = None):
+    """Runs recipe.num_realizations realizations of a recipe in parallel.
+
+    If ci_tolerance is provided, the number of realizations is chosen adaptively
+    instead. Realizations are launched in waves, and after every wave the confidence
+    interval of the mean final mole fraction of every phase (or only of target_phase)
+    is computed. Once its half-width is at most ci_tolerance and at least
+    min_realizations have finished, no further waves are launched. The precision
+    achieved is recorded under "adaptive" in the metadata of the result document.
+
+    Args:
+        prune_library (bool, optional): Whether to drop the reactions the recipe cannot
+        reach (see prune_library_for_recipe) before the workers are started. Defaults
+        to False.
+        ci_tolerance (float, optional): The largest acceptable confidence interval
+        half-width. Enables the adaptive mode.
+        target_phase (str, optional): If provided, only this phase's confidence
+        interval is considered.
+        min_realizations (int, optional): The fewest realizations to run in the adaptive
+        mode. Defaults to 2.
+        max_realizations (int, optional): The most realizations to run in the adaptive
+        mode. Defaults to recipe.num_realizations.
+        wave_size (int, optional): The number of realizations per wave. Defaults to
+        the number of CPUs, capped at max_realizations.
+        confidence_z (float, optional): The number of standard errors in the confidence
+        interval. Defaults to 1.96 (95%).
+        seed (int, optional): If provided, realization i uses seed + i, and its
+        microstructure is drawn from the cache if use_microstructure_cache is set.
+        Otherwise every realization starts from a fresh random microstructure.
+        stream_seed (int, optional): If provided, realization i draws from RandomStreams
+        seeded with stream_seed + i instead of the global generators.
+        tau_leaping (TauLeapingRunner, optional): If provided, realizations are run
+        approximately by tau-leaping.
+        gillespie (GillespieRunner, optional): If provided, realizations are run event
+        by event on a physical clock and recorded on its time grid.
+
+    Returns:
+        RxnCAResultDoc:
+    """
 
     print("================= RETRIEVING AND SCORING REACTIONS =================")
 
@@ -38,20 +151,35 @@ def run_sim_parallel(recipe: ReactionRecipe,
         raise ValueError("Must provide either base_reactions or reaction_lib")
 
     if reaction_lib is None:
-        reaction_lib: ReactionLibrary = get_scored_rxns(
+        reaction_lib: ReactionLibrary = get_library_for_recipe(
+            recipe,
             base_reactions,
-            heating_sched=recipe.heating_schedule,
-            exclude_phases=recipe.exclude_phases,
-            exclude_theoretical=recipe.exclude_theoretical,
-            scorer_class=recipe.get_score_class(),
-            phase_set=phase_set
+            phase_set,
+            cache=library_cache,
+            use_cache=use_library_cache
         )
 
+    # Prune once here, so that every worker inherits the reduced library
+    if prune_library:
+        reaction_lib = prune_library_for_recipe(reaction_lib, recipe)
+
     print()
     print()
     print()
 
-    print(f'================= RUNNING SIMULATION w/ {recipe.num_realizations} REALIZATIONS =================')
+    if target_phase is not None and target_phase not in reaction_lib.phases.phases:
+        raise ValueError(f"target_phase {target_phase} is not one of the phases in the reaction library")
+
+    if ci_tolerance is None:
+        print(f'================= RUNNING SIMULATION w/ {recipe.num_realizations} REALIZATIONS =================')
+    else:
+        if max_realizations is None:
+            max_realizations = recipe.num_realizations
+        min_realizations = min(min_realizations, max_realizations)
+        if wave_size is None:
+            wave_size = mp.cpu_count()
+        wave_size = max(1, min(wave_size, max_realizations))
+        print(f'================= RUNNING SIMULATION w/ {min_realizations} TO {max_realizations} REALIZATIONS =================')
 
 
     global mp_globals
@@ -59,11 +187,68 @@ def run_sim_parallel(recipe: ReactionRecipe,
     mp_globals = {
         _reaction_lib: reaction_lib,
         _recipe: recipe,
-        _initial_simulation: initial_simulation
+        _initial_simulation: initial_simulation,
+        _setup_method: setup_method,
+        _microstructure_cache: microstructure_cache,
+        _use_microstructure_cache: use_microstructure_cache,
+        _checkpoint_dir: checkpoint_dir,
+        _checkpoint_every: checkpoint_every,
+        _resume: resume,
+        _convergence_monitor: convergence_monitor,
+        _seed: seed,
+        _stream_seed: stream_seed,
+        _tau_leaping: tau_leaping,
+        _gillespie: gillespie
     }
 
-    with mp.get_context("fork").Pool(recipe.num_realizations) as pool:
-        results = pool.map(_get_result, [_ for _ in range(recipe.num_realizations)])
+    metadata = None
+    if ci_tolerance is None:
+        with mp.get_context("fork").Pool(recipe.num_realizations) as pool:
+            results = _run_realizations(pool, range(recipe.num_realizations), ensemble_aggregator)
+    else:
+        results = []
+        converged = False
+        with mp.get_context("fork").Pool(wave_size) as pool:
+            while True:
+                wave = range(len(results), min(len(results) + wave_size, max_realizations))
+                results.extend(_run_realizations(pool, wave, ensemble_aggregator))
+
+                good_results = [res for res in results if res is not None]
+                # The target counts as an amount of 0 in realizations where it is absent
+                half_widths = get_final_fraction_half_widths(
+                    good_results,
+                    reaction_lib.phases,
+                    confidence_z,
+                    include_phases=[target_phase] if target_phase is not None else []
+                )
+                if target_phase is not None:
+                    precision = half_widths[target_phase]
+                else:
+                    precision = max(half_widths.values(), default=float("inf"))
+
+                print(f'{len(results)} realizations complete, confidence interval half-width {precision:.4f} (tolerance {ci_tolerance})')
+
+                if len(good_results) >= min_realizations and precision <= ci_tolerance:
+                    converged = True
+                    break
+
+                if len(results) >= max_realizations:
+                    print("Realization budget exhausted before reaching the tolerance")
+                    break
+
+        metadata = {
+            "adaptive": {
+                "num_realizations": len(results),
+                "converged": converged,
+                "precision": precision,
+                "half_widths": half_widths,
+                "ci_tolerance": ci_tolerance,
+                "target_phase": target_phase,
+                "confidence_z": confidence_z,
+                "min_realizations": min_realizations,
+                "max_realizations": max_realizations,
+            }
+        }
 
     good_results = [res for res in results if res is not None]
     print(f'{len(good_results)} results achieved out of {len(results)}')
@@ -72,8 +257,55 @@ def run_sim_parallel(recipe: ReactionRecipe,
         recipe=recipe,
         results=good_results,
         reaction_library=reaction_lib,
-        phases=reaction_lib.phases
+        phases=reaction_lib.phases,
+        metadata=metadata
     )
 
     return result_doc
 
+def _run_realizations(pool, realization_idxs, ensemble_aggregator: EnsembleAggregator = None):
+    if ensemble_aggregator is None:
+        return pool.map(_get_result, list(realization_idxs))
+
+    # Realizations are folded into the ensemble statistics as they finish
+    results = []
+    for res in pool.imap_unordered(_get_result, list(realization_idxs)):
+        if res is not None:
+            ensemble_aggregator.add_result(res)
+        results.append(res)
+    return results
+
+def get_final_fraction_half_widths(results: List[ReactionResult],
+                                   phase_set: SolidPhaseSet,
+                                   confidence_z: float = 1.96,
+                                   include_phases: List[str] = []) -> Dict[str, float]:
+    """Computes the half-width of the confidence interval of the mean final mole
+    fraction of each phase across a set of realizations. With fewer than two
+    realizations the half-widths are infinite.
+
+    Args:
+        results (List[ReactionResult]): The results of the realizations
+        phase_set (SolidPhaseSet): The phases in the simulations
+        confidence_z (float, optional): The number of standard errors. Defaults to 1.96.
+        include_phases (List[str], optional): Phases to report even if they are absent
+        from every realization, in which case their amount is 0 in each.
+
+    Returns:
+        Dict[str, float]:
+    """
+    analyzer = ReactionStepAnalyzer(phase_set)
+    fractions = [analyzer.set_step_group(r.last_step).get_all_mole_fractions() for r in results]
+
+    phases = set(include_phases)
+    for f in fractions:
+        phases.update(f.keys())
+
+    if len(results) < 2:
+        return { p: float("inf") for p in phases }
+
+    half_widths = {}
+    for phase in phases:
+        vals = np.array([f.get(phase, 0.0) for f in fractions])
+        half_widths[phase] = float(confidence_z * vals.std(ddof=1) / np.sqrt(len(vals)))
+    return half_widths
+
@@ -0,0 +1,392 @@
+from __future__ import annotations
+
+from ..core.recipe import ReactionRecipe
+from ..core.heating import HeatingSchedule, HeatingStep, RecipeStep
+from ..core.reaction_result import ReactionResult, ChainedReactionResult
+from ..core.liquid_swap_controller import LiquidSwapController
+from ..core.reaction_calculator import ReactionCalculator
+from ..core.random_streams import seed_global_generators
+from ..reactions import ReactionLibrary
+from ..phases import SolidPhaseSet
+from ..computing.schemas.ca_result_schema import RxnCAResultDoc
+
+from rxn_network.reactions.reaction_set import ReactionSet
+from pylattica.core import Simulation, SimulationState
+
+from typing import Dict, List, Tuple
+
+import multiprocessing as mp
+
+from .hashing import hash_dict
+from .heating_schedule_runner import HeatingScheduleRunner
+from .library_cache import LibraryCache, get_library_for_recipe
+from .microstructure_cache import MicrostructureCache, get_initial_simulation, NOISE_SETUP
+from .convergence_monitor import ConvergenceMonitor
+
+# Recipe fields that may differ between recipes that share a prefix tree
+_PER_RECIPE_FIELDS = ["heating_schedule", "num_realizations", "name"]
+
+_reaction_lib = "reaction_lib"
+_recipes = "recipes"
+_initial_simulation = "initial_simulation"
+_setup_method = "setup_method"
+_microstructure_cache = "microstructure_cache"
+_use_microstructure_cache = "use_microstructure_cache"
+_convergence_monitor = "convergence_monitor"
+_seed = "seed"
+
+
+class ScheduleNode():
+    """A node of a prefix tree of heating schedules. Each node holds the steps
+    that follow its parent's steps in every schedule below it, so the path from
+    the root to a node spells out a schedule prefix shared by all of the recipes
+    in its subtree.
+
+    Tree edges only fall right before a HeatingStep (or at the end of a schedule),
+    so a RegrindStep always stays with the heating step that follows it.
+    """
+
+    def __init__(self, steps: List[RecipeStep], start_idx: int, prefix: List[RecipeStep]):
+        """
+        Args:
+            steps (List[RecipeStep]): The steps this node adds to its parent's prefix
+            start_idx (int): The index of the first of these steps within each schedule
+            prefix (List[RecipeStep]): Every step from the root up to and including this node
+        """
+        self.steps = steps
+        self.start_idx = start_idx
+        self.node_id = hash_dict({ "steps": [s.as_dict() for s in prefix] })
+        self.children: List[ScheduleNode] = []
+        # The recipes whose schedules end at this node
+        self.recipe_idxs: List[int] = []
+
+    @property
+    def end_idx(self) -> int:
+        return self.start_idx + len(self.steps)
+
+    @property
+    def duration(self) -> float:
+        return sum([s.duration for s in self.steps if isinstance(s, HeatingStep)])
+
+    def all_recipe_idxs(self) -> List[int]:
+        idxs = list(self.recipe_idxs)
+        for child in self.children:
+            idxs.extend(child.all_recipe_idxs())
+        return sorted(idxs)
+
+    def iter_nodes(self):
+        yield self
+        for child in self.children:
+            yield from child.iter_nodes()
+
+
+def _get_units(schedule: HeatingSchedule) -> List[List[RecipeStep]]:
+    # Splits a schedule into HeatingSteps, each with any RegrindSteps directly
+    # before it. Regrinds at the very end of the schedule form a unit of their own.
+    units = []
+    pending = []
+    for step in schedule.steps:
+        pending.append(step)
+        if isinstance(step, HeatingStep):
+            units.append(pending)
+            pending = []
+
+    if len(pending) > 0:
+        units.append(pending)
+    return units
+
+def _unit_key(unit: List[RecipeStep]) -> str:
+    return hash_dict({ "unit": [s.as_dict() for s in unit] })
+
+def build_schedule_tree(schedules: List[HeatingSchedule]) -> ScheduleNode:
+    """Arranges a set of heating schedules into a prefix tree, merging chains of
+    steps without branches into single nodes. The root holds the prefix shared by
+    every schedule and may be empty.
+
+    Args:
+        schedules (List[HeatingSchedule]): The schedules, identified in the tree by
+        their index in this list
+
+    Returns:
+        ScheduleNode: The root of the tree
+    """
+    members = [(idx, _get_units(s)) for idx, s in enumerate(schedules)]
+    return _build_node(members, 0, 0, [])
+
+def _build_node(members: List[Tuple[int, List[List[RecipeStep]]]],
+                depth: int,
+                start_idx: int,
+                prefix: List[RecipeStep]) -> ScheduleNode:
+    # Extend the node for as long as every member continues with the same unit
+    end = depth
+    while all([len(units) > end for _, units in members]) and \
+            len(set([_unit_key(units[end]) for _, units in members])) == 1:
+        end += 1
+
+    steps = [step for unit in members[0][1][depth:end] for step in unit]
+    node = ScheduleNode(steps, start_idx, prefix + steps)
+
+    branches: Dict[str, List] = {}
+    for idx, units in members:
+        if len(units) == end:
+            node.recipe_idxs.append(idx)
+        else:
+            branches.setdefault(_unit_key(units[end]), []).append((idx, units))
+
+    for branch in branches.values():
+        node.children.append(_build_node(branch, end, node.end_idx, prefix + steps))
+
+    return node
+
+
+def get_prefix_groups(recipes: List[ReactionRecipe]) -> List[List[int]]:
+    """Groups recipes that differ only in their heating schedules (and number of
+    realizations and names), and so can share simulated schedule prefixes.
+
+    Args:
+        recipes (List[ReactionRecipe]): The recipes to group
+
+    Returns:
+        List[List[int]]: The indices of the recipes in each group, in order of
+        first appearance
+    """
+    groups: Dict[str, List[int]] = {}
+    for idx, recipe in enumerate(recipes):
+        groups.setdefault(_get_setup_key(recipe), []).append(idx)
+    return list(groups.values())
+
+def _get_setup_key(recipe: ReactionRecipe) -> str:
+    d = recipe.as_dict()
+    return hash_dict({ k: v for k, v in d.items() if k not in _PER_RECIPE_FIELDS })
+
+
+def _run_node(node: ScheduleNode,
+              state: SimulationState,
+              simulation: Simulation,
+              reaction_lib: ReactionLibrary,
+              controller: LiquidSwapController,
+              convergence_monitor: ConvergenceMonitor,
+              path: List[Tuple[ScheduleNode, ChainedReactionResult]],
+              results: Dict[int, List[Tuple[ScheduleNode, ChainedReactionResult]]]) -> None:
+    result = None
+    if node.duration > 0:
+        print(f'Running shared prefix node {node.node_id[:12]} (schedule steps {node.start_idx} to {node.end_idx - 1}, recipes {node.all_recipe_idxs()})')
+        # Each branch starts from its own copy of the state at the fork
+        result = HeatingScheduleRunner().run_multi(
+            Simulation(state.copy(), simulation.structure),
+            reaction_lib,
+            HeatingSchedule(node.steps),
+            controller,
+            verbose=False,
+            convergence_monitor=convergence_monitor
+        )
+        state = result.output
+
+    path = path + [(node, result)]
+    for idx in node.recipe_idxs:
+        results[idx] = path
+
+    for child in node.children:
+        _run_node(child, state, simulation, reaction_lib, controller, convergence_monitor, path, results)
+
+def _stitch(path: List[Tuple[ScheduleNode, ChainedReactionResult]],
+            recipes: List[ReactionRecipe]) -> ChainedReactionResult:
+    # Joins the results along a path of the tree into one result for the recipe
+    # at its end. Shared stages are referenced, not copied.
+    path = [(node, result) for node, result in path if result is not None]
+
+    stages: List[ReactionResult] = []
+    held_steps: List[int] = []
+    for _, result in path:
+        stages.extend(result.stages)
+        held_steps.extend(result.held_steps)
+
+    stitched = ChainedReactionResult(stages, held_steps=held_steps)
+
+    segments = []
+    lineage = []
+    for node, result in path:
+        first_stage = len(segments)
+        for seg in result.metadata.get("segments", []):
+            segments.append({
+                **seg,
+                "schedule_steps": [i + node.start_idx for i in seg["schedule_steps"]],
+                "start_step": stitched.stage_offset(len(segments)),
+            })
+
+        lineage.append({
+            "node_id": node.node_id,
+            "schedule_steps": [node.start_idx, node.end_idx],
+            "stages": [first_stage, len(segments)],
+            "shared_by": [_recipe_label(recipes, i) for i in node.all_recipe_idxs()],
+        })
+
+    stitched.metadata["segments"] = segments
+    stitched.metadata["lineage"] = lineage
+    return stitched
+
+def _recipe_label(recipes: List[ReactionRecipe], idx: int):
+    return recipes[idx].name if recipes[idx].name is not None else idx
+
+def _get_realization(realization_idx: int) -> Dict[int, ChainedReactionResult]:
+    recipes: List[ReactionRecipe] = mp_globals[_recipes]
+    reaction_lib: ReactionLibrary = mp_globals[_reaction_lib]
+
+    # Only the recipes that still need this realization take part in it
+    active_idxs = [idx for idx, r in enumerate(recipes) if r.num_realizations > realization_idx]
+    tree = build_schedule_tree([recipes[idx].heating_schedule for idx in active_idxs])
+
+    use_cache = mp_globals.get(_use_microstructure_cache)
+    seed = mp_globals.get(_seed)
+    if seed is not None:
+        seed = seed + realization_idx
+    seed_global_generators(seed)
+
+    simulation = mp_globals.get(_initial_simulation)
+    if simulation is None:
+        simulation = get_initial_simulation(
+            recipes[0],
+            reaction_lib.phases,
+            seed=seed,
+            method=mp_globals.get(_setup_method),
+            cache=mp_globals.get(_microstructure_cache),
+            use_cache=use_cache
+        )
+
+    rxn_calculator = ReactionCalculator(
+        LiquidSwapController.get_neighborhood_from_structure(simulation.structure),
+        atmospheric_species=recipes[0].atmospheric_phases
+    )
+
+    controller = LiquidSwapController(
+        simulation.structure,
+        rxn_calculator=rxn_calculator,
+    )
+
+    paths = {}
+    _run_node(tree, simulation.state, simulation, reaction_lib, controller, mp_globals.get(_convergence_monitor), [], paths)
+
+    active_recipes = [recipes[idx] for idx in active_idxs]
+    stitched = {}
+    for tree_idx, path in paths.items():
+        result = _stitch(path, active_recipes)
+        result.metadata["realization"] = realization_idx
+        stitched[active_idxs[tree_idx]] = result
+    return stitched
+
+
+def run_shared_prefix_sims(recipes: List[ReactionRecipe],
+                           base_reactions: ReactionSet = None,
+                           reaction_lib: ReactionLibrary = None,
+                           initial_simulation: Simulation = None,
+                           phase_set: SolidPhaseSet = None,
+                           prune_library: bool = False,
+                           library_cache: LibraryCache = None,
+                           use_library_cache: bool = True,
+                           seed: int = None,
+                           setup_method: str = NOISE_SETUP,
+                           microstructure_cache: MicrostructureCache = None,
+                           use_microstructure_cache: bool = True,
+                           convergence_monitor: ConvergenceMonitor = None,
+                           parallel: bool = True) -> List[RxnCAResultDoc]:
+    """Runs a batch of recipes that differ only in their heating schedules,
+    simulating every schedule prefix they share once per realization and forking
+    the branches from the state at the end of it. For example, recipes that ramp
+    to 900 K and then hold at 900, 1000 or 1100 K simulate the ramp once.
+
+    Every recipe gets its own result document. Each result records, under
+    "lineage" in its metadata, the prefix tree nodes it passed through, which
+    schedule steps each covered and which recipes shared it. Where a fork falls
+    inside a run of steps at one temperature, that run is split into two stages.
+
+    Args:
+        recipes (List[ReactionRecipe]): The recipes to run. Everything but their
+        heating schedules, numbers of realizations and names must match (see
+        get_prefix_groups).
+        parallel (bool, optional): Whether to run the realizations in parallel.
+        Defaults to True.
+        seed (int, optional): If provided, realization i uses seed + i.
+
+    Returns:
+        List[RxnCAResultDoc]: One result document per recipe, in order
+    """
+    if len(get_prefix_groups(recipes)) > 1:
+        raise ValueError("Recipes must differ only in their heating schedules to share prefixes")
+
+    if base_reactions is None and reaction_lib is None:
+        raise ValueError("Must provide either base_reactions or reaction_lib")
+
+    first = recipes[0]
+
+    if reaction_lib is None:
+
+        print("================= RETRIEVING AND SCORING REACTIONS =================")
+
+        reaction_lib: ReactionLibrary = get_library_for_recipe(
+            first,
+            base_reactions,
+            phase_set,
+            cache=library_cache,
+            use_cache=use_library_cache
+        )
+
+    if len(first.exclude_phases) > 0:
+        reaction_lib = reaction_lib.exclude_phases(first.exclude_phases)
+
+    if first.exact_phase_set is not None:
+        reaction_lib = reaction_lib.limit_phase_set(first.exact_phase_set)
+
+    if prune_library:
+        # The shared library has to cover every temperature in the batch
+        temps = sorted(set([t for r in recipes for t in r.heating_schedule.all_temps]))
+        reaction_lib = reaction_lib.prune_unreachable(
+            list(first.reactant_amounts.keys()),
+            atmospheric_phases=first.atmospheric_phases,
+            temps=temps,
+        )
+
+    num_realizations = max([r.num_realizations for r in recipes])
+    tree = build_schedule_tree([r.heating_schedule for r in recipes])
+    simulated_steps = sum([node.duration for node in tree.iter_nodes()])
+    unshared_steps = sum([sum([s.duration for s in r.heating_schedule.temperature_steps]) for r in recipes])
+
+    print(f'================= RUNNING {len(recipes)} RECIPES w/ SHARED PREFIXES, {num_realizations} REALIZATIONS =================')
+    print(f'Simulating {simulated_steps} schedule steps per realization instead of {unshared_steps}')
+
+    global mp_globals
+
+    mp_globals = {
+        _reaction_lib: reaction_lib,
+        _recipes: recipes,
+        _initial_simulation: initial_simulation,
+        _setup_method: setup_method,
+        _microstructure_cache: microstructure_cache,
+        _use_microstructure_cache: use_microstructure_cache,
+        _convergence_monitor: convergence_monitor,
+        _seed: seed,
+    }
+
+    if parallel:
+        with mp.get_context("fork").Pool(num_realizations) as pool:
+            realizations = pool.map(_get_realization, list(range(num_realizations)))
+    else:
+        realizations = [_get_realization(idx) for idx in range(num_realizations)]
+
+    result_docs = []
+    for idx, recipe in enumerate(recipes):
+        results = [r[idx] for r in realizations if idx in r]
+        result_docs.append(RxnCAResultDoc(
+            recipe=recipe,
+            results=results,
+            reaction_library=reaction_lib,
+            phases=reaction_lib.phases,
+            metadata={
+                "prefix_sharing": {
+                    "recipes": [_recipe_label(recipes, i) for i in range(len(recipes))],
+                    "simulated_steps": simulated_steps,
+                    "unshared_steps": unshared_steps,
+                }
+            }
+        ))
+
+    return result_docs
@@ -0,0 +1,29 @@
+from ..core.recipe import ReactionRecipe
+from ..reactions import ReactionLibrary
+
+def prune_library_for_recipe(reaction_lib: ReactionLibrary,
+                             recipe: ReactionRecipe,
+                             min_score: float = 0.0) -> ReactionLibrary:
+    """Reduces a reaction library to the reactions that can actually fire during
+    the simulation described by the recipe - i.e. those whose reactants are reachable
+    from the recipe's precursors and atmospheric phases at the temperatures in its
+    heating schedule.
+
+    Args:
+        reaction_lib (ReactionLibrary): The library to prune
+        recipe (ReactionRecipe): The recipe that will be simulated
+        min_score (float, optional): Reactions with scores at or below this value are
+        dropped and do not contribute to reachability. Defaults to 0.0.
+
+    Returns:
+        ReactionLibrary: The pruned library
+    """
+    temps = recipe.heating_schedule.all_temps
+    pruned = reaction_lib.prune_unreachable(
+        list(recipe.reactant_amounts.keys()),
+        atmospheric_phases=recipe.atmospheric_phases,
+        temps=temps,
+        min_score=min_score,
+    )
+    print(f"Pruned reaction library from {reaction_lib.num_rxns} to {pruned.num_rxns} reactions reachable from precursors")
+    return pruned
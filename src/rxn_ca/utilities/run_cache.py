@@ -0,0 +1,109 @@
+from pylattica.core import Simulation
+
+from ..computing.schemas.ca_result_schema import RxnCAResultDoc
+from ..core.recipe import ReactionRecipe
+from ..reactions import ReactionLibrary
+
+from .hashing import hash_dict
+from .helpers import get_default_cache_dir
+from .disk_cache import DiskCache
+
+from monty.json import MontyDecoder, MontyEncoder
+
+from typing import Dict
+
+import os
+import gzip
+import json
+
+DEFAULT_MAX_RUN_CACHE_SIZE = 20 * 1024 ** 3
+
+class RunCache(DiskCache):
+    """A content-addressed, size-bounded store of simulation results on local disk.
+    Results are keyed by everything that determines them (see get_key), so that
+    re-running a sweep only runs the recipes whose inputs changed, and a sweep that
+    failed part of the way through only redoes what is missing.
+
+    Only seeded runs can be cached: an unseeded run is a fresh random sample, and
+    returning a stored one in its place would silently repeat it. Results are stored
+    gzipped, and when their total size exceeds max_size, the least recently used
+    ones are evicted.
+    """
+
+    extension = ".json.gz"
+
+    def __init__(self, cache_dir: str = None, max_size: int = DEFAULT_MAX_RUN_CACHE_SIZE):
+        """
+        Args:
+            cache_dir (str, optional): Where to store results. Defaults to the runs
+            subdirectory of $RXN_CA_CACHE_DIR, or of ~/.cache/rxn_ca if unset.
+            max_size (int, optional): The maximum total size of the cache, in bytes.
+            Defaults to 20 GB.
+        """
+        if cache_dir is None:
+            cache_dir = os.path.join(get_default_cache_dir(), "runs")
+
+        super().__init__(cache_dir, max_size)
+
+    @staticmethod
+    def get_key(recipe: ReactionRecipe,
+                reaction_lib: ReactionLibrary,
+                initial_simulation: Simulation = None,
+                seed: int = None,
+                options: Dict = None) -> str:
+        """Computes the cache key for a run.
+
+        Args:
+            recipe (ReactionRecipe): The recipe that was run
+            reaction_lib (ReactionLibrary): The reaction library used
+            initial_simulation (Simulation, optional): The initial simulation, if one
+            was supplied instead of being generated from the recipe
+            seed (int): The seed of the run
+            options (Dict, optional): Any other settings that affect the result, such as
+            whether realizations were run in parallel
+
+        Returns:
+            str:
+        """
+        if seed is None:
+            raise ValueError("Only seeded runs can be cached")
+
+        # The provenance of a library records when it was built, which does not
+        # affect its contents
+        lib_dict = { k: v for k, v in reaction_lib.as_dict().items() if k != "provenance" }
+
+        return hash_dict({
+            "recipe": recipe.as_dict(),
+            "reaction_lib": hash_dict(lib_dict),
+            "initial_simulation": hash_dict(initial_simulation.as_dict()) if initial_simulation is not None else None,
+            "seed": seed,
+            "options": options or {},
+        })
+
+    def get(self, key: str) -> RxnCAResultDoc:
+        """Retrieves the result stored under key, or None if it is not cached.
+
+        Args:
+            key (str): The cache key
+
+        Returns:
+            RxnCAResultDoc:
+        """
+        return self._read(key, _load_doc, (OSError, EOFError, json.JSONDecodeError, KeyError))
+
+    def put(self, key: str, result_doc: RxnCAResultDoc) -> None:
+        """Stores a result under key, evicting old entries if the cache is full.
+
+        Args:
+            key (str): The cache key
+            result_doc (RxnCAResultDoc): The result to store
+        """
+        def dump(fpath: str):
+            with gzip.open(fpath, "wt") as f:
+                json.dump(result_doc.as_dict(), f, cls=MontyEncoder)
+
+        self._write(key, dump)
+
+def _load_doc(fpath: str) -> RxnCAResultDoc:
+    with gzip.open(fpath, "rt") as f:
+        return json.load(f, cls=MontyDecoder)
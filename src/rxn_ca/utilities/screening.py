@@ -0,0 +1,297 @@
+from ..core.recipe import ReactionRecipe
+from ..core.heating import HeatingSchedule, HeatingStep
+from ..reactions import ReactionLibrary
+from ..phases import SolidPhaseSet
+from ..analysis.reaction_step_analyzer import ReactionStepAnalyzer, AnalysisQuantity, AnalysisMode
+from ..computing.schemas.ca_result_schema import RxnCAResultDoc
+
+from rxn_network.reactions.reaction_set import ReactionSet
+
+from typing import Callable, Dict, List
+
+import dataclasses
+import math
+import numpy as np
+import pandas as pd
+
+from .single_sim import run_single_sim
+from .parallel_sim import run_sim_parallel
+
+
+class PhaseAmountMetric():
+    """Scores a result document by the amount of one phase in the final step of
+    each realization, averaged over the realizations.
+    """
+
+    def __init__(self,
+                 phase: str,
+                 quantity: AnalysisQuantity = AnalysisQuantity.MASS,
+                 mode: AnalysisMode = AnalysisMode.FRACTIONAL):
+        """
+        Args:
+            phase (str): The phase to score
+            quantity (AnalysisQuantity, optional): The quantity to measure. Defaults to MASS.
+            mode (AnalysisMode, optional): Absolute or fractional amounts. Defaults to FRACTIONAL.
+        """
+        self.phase = phase
+        self.quantity = quantity
+        self.mode = mode
+
+    def __call__(self, result_doc: RxnCAResultDoc) -> float:
+        analyzer = ReactionStepAnalyzer(result_doc.phases)
+        values = [
+            analyzer.set_step_group(result.last_step).get_value_general(self.quantity, self.mode, phase=self.phase)
+            for result in result_doc.results
+        ]
+        if len(values) == 0:
+            return float("nan")
+        return float(np.mean(values))
+
+    def as_dict(self):
+        return {
+            "phase": self.phase,
+            "quantity": self.quantity.value,
+            "mode": self.mode.value,
+        }
+
+
+class ScreeningResult():
+    """The outcome of screen_recipes: the score of every candidate in every round
+    it took part in, and the full result documents of the finalists.
+    """
+
+    def __init__(self,
+                 recipes: List[ReactionRecipe],
+                 rounds: List[List[Dict]],
+                 finalist_docs: Dict[int, RxnCAResultDoc]):
+        """
+        Args:
+            recipes (List[ReactionRecipe]): The candidate recipes
+            rounds (List[List[Dict]]): For each round, one entry per candidate run in it
+            finalist_docs (Dict[int, RxnCAResultDoc]): The results of the final round,
+            keyed by candidate index
+        """
+        self.recipes = recipes
+        self.rounds = rounds
+        self.finalist_docs = finalist_docs
+
+    @property
+    def finalists(self) -> List[int]:
+        return [entry["recipe_idx"] for entry in self.ranking() if entry["recipe_idx"] in self.finalist_docs]
+
+    def ranking(self) -> List[Dict]:
+        """Ranks every candidate, first by the last round it reached and then by
+        its score in that round.
+
+        Returns:
+            List[Dict]: One entry per candidate, best first
+        """
+        latest = {}
+        for round_idx, entries in enumerate(self.rounds):
+            for entry in entries:
+                latest[entry["recipe_idx"]] = { **entry, "round": round_idx }
+
+        def sort_key(entry):
+            score = entry["score"]
+            return (-entry["round"], 0 if not math.isnan(score) else 1, -score if not math.isnan(score) else 0)
+
+        ranked = sorted(latest.values(), key=sort_key)
+        return [{ "rank": rank + 1, **entry } for rank, entry in enumerate(ranked)]
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Tabulates the ranking, with the candidate's score in each round it was run in.
+
+        Returns:
+            pd.DataFrame:
+        """
+        rows = []
+        for entry in self.ranking():
+            row = {
+                "rank": entry["rank"],
+                "recipe": _recipe_label(self.recipes, entry["recipe_idx"]),
+                "rounds_reached": entry["round"] + 1,
+                "score": entry["score"],
+            }
+            for round_idx, entries in enumerate(self.rounds):
+                for e in entries:
+                    if e["recipe_idx"] == entry["recipe_idx"]:
+                        row[f"round_{round_idx}_score"] = e["score"]
+            rows.append(row)
+        return pd.DataFrame(rows)
+
+    def as_dict(self):
+        return {
+            "recipes": [_recipe_label(self.recipes, i) for i in range(len(self.recipes))],
+            "rounds": self.rounds,
+            "ranking": self.ranking(),
+        }
+
+
+def scale_schedule(heating_schedule: HeatingSchedule, fraction: float) -> HeatingSchedule:
+    """Shortens a heating schedule by scaling the duration of every heating step,
+    keeping its temperature profile (and any regrinds) intact.
+
+    Args:
+        heating_schedule (HeatingSchedule): The schedule to shorten
+        fraction (float): The factor to scale durations by
+
+    Returns:
+        HeatingSchedule:
+    """
+    steps = []
+    for step in heating_schedule.steps:
+        if isinstance(step, HeatingStep):
+            steps.append(HeatingStep(step.duration * fraction, step.temperature))
+        else:
+            steps.append(step)
+    return HeatingSchedule(steps)
+
+def get_round_budgets(num_rounds: int,
+                      min_schedule_fraction: float,
+                      min_realizations: int,
+                      max_realizations: int) -> List[Dict]:
+    """Computes the schedule fraction and number of realizations of each round.
+    Both grow geometrically, so that the last round runs the full schedule with
+    max_realizations realizations.
+
+    Args:
+        num_rounds (int): The number of rounds
+        min_schedule_fraction (float): The fraction of the schedule run in the first round
+        min_realizations (int): The number of realizations run in the first round
+        max_realizations (int): The number of realizations run in the last round
+
+    Returns:
+        List[Dict]:
+    """
+    budgets = []
+    for round_idx in range(num_rounds):
+        progress = round_idx / (num_rounds - 1) if num_rounds > 1 else 1.0
+        budgets.append({
+            "schedule_fraction": min_schedule_fraction ** (1 - progress),
+            "num_realizations": max(1, int(round(min_realizations * (max_realizations / min_realizations) ** progress))),
+        })
+    return budgets
+
+def screen_recipes(recipes: List[ReactionRecipe],
+                   metric: Callable[[RxnCAResultDoc], float],
+                   base_reactions: ReactionSet = None,
+                   reaction_lib: ReactionLibrary = None,
+                   phase_set: SolidPhaseSet = None,
+                   keep_fraction: float = 0.5,
+                   num_finalists: int = 1,
+                   min_schedule_fraction: float = 0.25,
+                   min_realizations: int = 1,
+                   seed: int = None,
+                   parallel: bool = True) -> ScreeningResult:
+    """Finds the best of a set of candidate recipes by successive halving. Every
+    candidate is first run briefly, with its heating schedule shortened and few
+    realizations, and scored. The best keep_fraction of the candidates are promoted
+    to the next round, which runs longer schedules with more realizations, until
+    num_finalists remain. The finalists are run in full.
+
+    Args:
+        recipes (List[ReactionRecipe]): The candidates
+        metric (Callable[[RxnCAResultDoc], float]): Scores a result, higher is better
+        (see PhaseAmountMetric)
+        keep_fraction (float, optional): The fraction of candidates promoted after each
+        round. Defaults to 0.5.
+        num_finalists (int, optional): The number of candidates in the final round.
+        Defaults to 1.
+        min_schedule_fraction (float, optional): The fraction of each schedule run in
+        the first round. Defaults to 0.25.
+        min_realizations (int, optional): The number of realizations run in the first
+        round. The final round runs each recipe's num_realizations. Defaults to 1.
+        seed (int, optional): If provided, realization i of every run uses seed + i,
+        so that candidates are compared on the same starting microstructures.
+        parallel (bool, optional): Whether to run realizations in parallel. Defaults to True.
+
+    Returns:
+        ScreeningResult:
+    """
+    if not 0 < keep_fraction < 1:
+        raise ValueError("keep_fraction must be between 0 and 1")
+
+    if base_reactions is None and reaction_lib is None:
+        raise ValueError("Must provide either base_reactions or reaction_lib")
+
+    num_finalists = max(1, min(num_finalists, len(recipes)))
+    num_rounds = 1
+    remaining = len(recipes)
+    while remaining > num_finalists:
+        remaining = max(num_finalists, math.ceil(remaining * keep_fraction))
+        num_rounds += 1
+
+    candidates = list(range(len(recipes)))
+    rounds: List[List[Dict]] = []
+    finalist_docs: Dict[int, RxnCAResultDoc] = {}
+
+    for round_idx in range(num_rounds):
+        is_final = round_idx == num_rounds - 1
+        print(f'================= SCREENING ROUND {round_idx + 1} OF {num_rounds} ({len(candidates)} CANDIDATES) =================')
+
+        entries = []
+        for idx in candidates:
+            recipe = recipes[idx]
+            budget = get_round_budgets(num_rounds, min_schedule_fraction, min(min_realizations, recipe.num_realizations), recipe.num_realizations)[round_idx]
+            trial = dataclasses.replace(
+                recipe,
+                heating_schedule=recipe.heating_schedule if is_final else scale_schedule(recipe.heating_schedule, budget["schedule_fraction"]),
+                num_realizations=budget["num_realizations"],
+            )
+
+            result_doc = _run_trial(trial, base_reactions, reaction_lib, phase_set, seed, parallel)
+            score = metric(result_doc)
+            print(f'Candidate {_recipe_label(recipes, idx)} scored {score:.4f}')
+
+            entries.append({
+                "recipe_idx": idx,
+                "score": score,
+                "schedule_fraction": 1.0 if is_final else budget["schedule_fraction"],
+                "num_realizations": budget["num_realizations"],
+            })
+            if is_final:
+                result_doc.recipe = recipe
+                finalist_docs[idx] = result_doc
+
+        rounds.append(entries)
+
+        if not is_final:
+            ranked = sorted(entries, key=lambda e: -e["score"] if not math.isnan(e["score"]) else float("inf"))
+            num_kept = max(num_finalists, math.ceil(len(entries) * keep_fraction))
+            candidates = sorted([e["recipe_idx"] for e in ranked[:num_kept]])
+
+    return ScreeningResult(recipes, rounds, finalist_docs)
+
+def _run_trial(recipe: ReactionRecipe,
+               base_reactions: ReactionSet,
+               reaction_lib: ReactionLibrary,
+               phase_set: SolidPhaseSet,
+               seed: int,
+               parallel: bool) -> RxnCAResultDoc:
+    if parallel and recipe.num_realizations > 1:
+        return run_sim_parallel(
+            recipe,
+            base_reactions=base_reactions,
+            reaction_lib=reaction_lib,
+            phase_set=phase_set,
+            seed=seed
+        )
+
+    docs = [
+        run_single_sim(
+            recipe,
+            base_reactions=base_reactions,
+            reaction_lib=reaction_lib,
+            phase_set=phase_set,
+            seed=seed + i if seed is not None else None
+        ) for i in range(recipe.num_realizations)
+    ]
+    return RxnCAResultDoc(
+        recipe=recipe,
+        results=[doc.results[0] for doc in docs],
+        reaction_library=docs[0].reaction_library,
+        phases=docs[0].phases
+    )
+
+def _recipe_label(recipes: List[ReactionRecipe], idx: int):
+    return recipes[idx].name if recipes[idx].name is not None else idx
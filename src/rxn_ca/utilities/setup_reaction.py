@@ -3,20 +3,26 @@ from ..setup import ReactionPreparer
 from ..setup.noise_setup import SetupRandomNoise
 
 from pylattica.core import Simulation
-from typing import Dict
+from typing import Dict, Union
+
+import numpy as np
 
 def setup_reaction(
         phases: SolidPhaseSet,
         precursor_mole_ratios: Dict,
         size: int = 15,
         vol_multiplier = 1.0,
+        volume_noise: float = 0.0,
+        rng: Union[np.random.Generator, int] = None
     ) -> Simulation:
 
     preparer = ReactionPreparer(phases, dim=3)
     sim = preparer.prepare_reaction(
         phase_mol_ratios=precursor_mole_ratios,
         size=size,
-        volume_multiplier=vol_multiplier
+        volume_multiplier=vol_multiplier,
+        volume_noise=volume_noise,
+        rng=rng
     )
     
     return sim
@@ -25,6 +31,7 @@ def setup_noise_reaction(
         phases: SolidPhaseSet,
         precursor_mole_ratios: Dict,
         size: int = 15,
-        packing_fraction = 1.0
+        packing_fraction = 1.0,
+        rng: Union[np.random.Generator, int] = None
     ):
-    return SetupRandomNoise(phases).setup(precursor_mole_ratios, size, packing_efficiency=packing_fraction)
\ No newline at end of file
+    return SetupRandomNoise(phases).setup(precursor_mole_ratios, size, packing_efficiency=packing_fraction, rng=rng)
\ No newline at end of file
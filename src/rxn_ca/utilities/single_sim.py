@@ -11,31 +11,58 @@ from ..phases import SolidPhaseSet
 from ..core.reaction_controller import ReactionController
 from ..core.liquid_swap_controller import LiquidSwapController
 from ..core.reaction_calculator import ReactionCalculator
+from ..core.random_streams import RandomStreams, seed_global_generators
+from ..core.tau_leaping_runner import TauLeapingRunner
+from ..core.gillespie_runner import GillespieRunner
 
-from .get_scored_rxns import get_scored_rxns
-from .setup_reaction import setup_reaction, setup_noise_reaction
+from .library_cache import LibraryCache, get_library_for_recipe
+from .prune_library import prune_library_for_recipe
+from .microstructure_cache import MicrostructureCache, get_initial_simulation, NOISE_SETUP
+from .checkpoint import RunCheckpoint
+from .convergence_monitor import ConvergenceMonitor
 
 
 def run_single_sim(recipe: ReactionRecipe,
                    base_reactions: ReactionSet = None,
                    reaction_lib: ReactionLibrary = None,
                    initial_simulation: Simulation = None,
-                   phase_set: SolidPhaseSet = None) -> RxnCAResultDoc:
+                   phase_set: SolidPhaseSet = None,
+                   prune_library: bool = False,
+                   library_cache: LibraryCache = None,
+                   use_library_cache: bool = True,
+                   seed: int = None,
+                   setup_method: str = NOISE_SETUP,
+                   microstructure_cache: MicrostructureCache = None,
+                   use_microstructure_cache: bool = True,
+                   checkpoint_dir: str = None,
+                   checkpoint_every: int = None,
+                   resume: bool = False,
+                   convergence_monitor: ConvergenceMonitor = None,
+                   stream_seed: int = None,
+                   tau_leaping: TauLeapingRunner = None,
+                   gillespie: GillespieRunner = None) -> RxnCAResultDoc:
 
     if base_reactions is None and reaction_lib is None:
         raise ValueError("Must provide either base_reactions or reaction_lib")
 
+    if tau_leaping is not None and gillespie is not None:
+        raise ValueError("Cannot run with both tau_leaping and gillespie")
+
+    # The automaton draws from the global generators unless it is given streams, so
+    # a seeded run seeds them too
+    if seed is not None:
+        seed_global_generators(seed)
+
     if reaction_lib is None:
 
         print("================= RETRIEVING AND SCORING REACTIONS =================")
 
-        reaction_lib: ReactionLibrary = get_scored_rxns(
+        reaction_lib: ReactionLibrary = get_library_for_recipe(
+            recipe,
             base_reactions,
-            heating_sched=recipe.heating_schedule,
-            exclude_phases=recipe.exclude_phases,
-            exclude_theoretical=recipe.exclude_theoretical,
-            scorer_class=recipe.get_score_class(),
-            phase_set=phase_set
+            phase_set,
+            cache=library_cache,
+            use_cache=use_library_cache
         )
 
     print()
@@ -48,36 +75,60 @@ def run_single_sim(recipe: ReactionRecipe,
     if recipe.exact_phase_set is not None:
         reaction_lib = reaction_lib.limit_phase_set(recipe.exact_phase_set)
 
+    if prune_library:
+        reaction_lib = prune_library_for_recipe(reaction_lib, recipe)
+
     if initial_simulation is None:
 
         print("================= SETTING UP SIMULATION =================")
 
-        initial_simulation = setup_noise_reaction(
+        initial_simulation = get_initial_simulation(
+            recipe,
             reaction_lib.phases,
-            precursor_mole_ratios = recipe.reactant_amounts,
-            size = recipe.simulation_size,
-            packing_fraction = recipe.packing_fraction
+            seed=seed,
+            method=setup_method,
+            cache=microstructure_cache,
+            use_cache=use_microstructure_cache
         )
 
     print(f'================= RUNNING SIMULATION =================')
 
+    # With a stream seed, the automaton draws from its own seeded generators instead
+    # of the global ones, so that runs with the same stream seed are paired
+    random_streams = None
+    if stream_seed is not None:
+        random_streams = RandomStreams(stream_seed)
+
     rxn_calculator = ReactionCalculator(
         LiquidSwapController.get_neighborhood_from_structure(initial_simulation.structure),
-        atmospheric_species=recipe.atmospheric_phases
+        atmospheric_species=recipe.atmospheric_phases,
+        random_streams=random_streams
     )
 
     controller = LiquidSwapController(
         initial_simulation.structure,
         rxn_calculator=rxn_calculator,
+        random_streams=random_streams
     )
 
-    runner = HeatingScheduleRunner()
+    # With a tau-leaping runner, busy stretches are advanced in Poisson-distributed
+    # leaps instead of one site visit at a time. With a Gillespie runner, only visits
+    # that change the state are simulated, on a physical clock.
+    runner = HeatingScheduleRunner(runner=tau_leaping if tau_leaping is not None else gillespie)
+
+    checkpoint = None
+    if checkpoint_dir is not None:
+        checkpoint = RunCheckpoint(checkpoint_dir)
 
     result = runner.run_multi(
         initial_simulation,
         reaction_lib,
         recipe.heating_schedule,
-        controller=controller
+        controller=controller,
+        checkpoint=checkpoint,
+        checkpoint_every=checkpoint_every,
+        resume=resume,
+        convergence_monitor=convergence_monitor
     )
 
     result_doc = RxnCAResultDoc(
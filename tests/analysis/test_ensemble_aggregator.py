@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+
+from rxn_ca.analysis import EnsembleAggregator, ReactionStepAnalyzer
+from rxn_ca.analysis.ensemble_aggregator import get_sample_step_idxs
+from rxn_ca.analysis.reaction_step_analyzer import AnalysisMode, AnalysisQuantity
+from rxn_ca.analysis.visualization import ReactionPlotter
+from rxn_ca.core.heating import HeatingSchedule, HeatingStep
+from rxn_ca.core.recipe import ReactionRecipe
+from rxn_ca.utilities.single_sim import run_single_sim
+
+def test_mean_and_variance(batio3_phases):
+    rng = np.random.default_rng(0)
+    agg = EnsembleAggregator(batio3_phases, [0, 1, 2])
+
+    samples = rng.uniform(size=(20, 3))
+    for idx, row in enumerate(samples):
+        series = [{ "BaO": v } for v in row]
+        # TiO2 only shows up in later realizations
+        if idx >= 10:
+            series = [{ **amts, "TiO2": 1.0 } for amts in series]
+        agg.add_series(series)
+
+    assert agg.num_realizations == 20
+    assert np.allclose(agg.mean("BaO"), samples.mean(axis=0))
+    assert np.allclose(agg.variance("BaO"), samples.var(axis=0, ddof=1))
+    assert np.allclose(agg.mean("TiO2"), 0.5)
+    assert np.allclose(agg.variance("TiO2"), np.var([0] * 10 + [1] * 10, ddof=1))
+    assert np.allclose(agg.mean("BaTiO3"), 0)
+
+def test_quantiles(batio3_phases):
+    rng = np.random.default_rng(0)
+    agg = EnsembleAggregator(batio3_phases, [0, 1], quantiles=(0.1, 0.5, 0.9))
+
+    samples = np.stack([rng.normal(size=2000), rng.uniform(size=2000)], axis=1)
+    for row in samples[:3]:
+        agg.add_series([{ "BaO": v } for v in row])
+
+    # With fewer than five realizations the quantiles are exact
+    assert np.allclose(agg.quantile("BaO", 0.5), np.quantile(samples[:3], 0.5, axis=0))
+
+    for row in samples[3:]:
+        agg.add_series([{ "BaO": v } for v in row])
+
+    for q in (0.1, 0.5, 0.9):
+        assert np.allclose(agg.quantile("BaO", q), np.quantile(samples, q, axis=0), atol=0.1)
+
+    with pytest.raises(ValueError):
+        agg.quantile("BaO", 0.25)
+
+def test_add_result(batio3_lib):
+    sched = HeatingSchedule.build(HeatingStep.hold(1000, 2), HeatingStep.hold(1200, 1))
+    recipe = ReactionRecipe(heating_schedule=sched, reactant_amounts={ "BaO": 1, "TiO2": 1 }, simulation_size=4)
+    results = [run_single_sim(recipe, reaction_lib=batio3_lib, seed=seed).results[0] for seed in range(3)]
+
+    step_idxs = get_sample_step_idxs(len(results[0]), 10)
+    assert step_idxs[-1] == len(results[0]) - 1
+
+    agg = EnsembleAggregator(batio3_lib.phases, step_idxs, heating_schedule=sched)
+    for result in results:
+        agg.add_result(result)
+
+    analyzer = ReactionStepAnalyzer(batio3_lib.phases)
+    for phase in ["BaO", "TiO2", "BaTiO3"]:
+        expected = [
+            np.mean([
+                analyzer.set_step_group(r.get_step(idx)).get_value_general(AnalysisQuantity.MOLES, AnalysisMode.FRACTIONAL).get(phase, 0)
+                for r in results
+            ]) for idx in step_idxs
+        ]
+        assert np.allclose(agg.mean(phase), expected)
+
+    lower, upper = agg.confidence_interval("BaTiO3")
+    assert np.all(lower <= upper)
+
+    fig = ReactionPlotter(None, ensemble=agg).plot_ensemble(band="std")
+    assert len(fig.data) == 3 * len(agg.phases)
+
+    fig = ReactionPlotter(None, ensemble=agg, time_axis=True).plot_ensemble()
+    assert list(fig.data[0].x) == agg.step_times
+    assert len(agg.step_times) == len(step_idxs)
+
+def test_plot_series_only_ensemble(batio3_phases):
+    sched = HeatingSchedule.build(HeatingStep.hold(1000, 2))
+    agg = EnsembleAggregator(batio3_phases, [0, 50, 100], heating_schedule=sched)
+    agg.add_series([{ "BaO": 1.0 }, { "BaO": 0.5, "BaTiO3": 0.5 }, { "BaTiO3": 1.0 }])
+
+    # Without results to read it from, the number of sites must be supplied
+    with pytest.raises(ValueError):
+        ReactionPlotter(None, ensemble=agg)
+
+    agg = EnsembleAggregator(batio3_phases, [0, 50, 100], heating_schedule=sched, num_sites=50)
+    agg.add_series([{ "BaO": 1.0 }, { "BaO": 0.5, "BaTiO3": 0.5 }, { "BaTiO3": 1.0 }])
+
+    plotter = ReactionPlotter(None, ensemble=agg, include_heating_trace=True, time_axis=True)
+    assert plotter.layout.time_axis
+
+    fig = plotter.plot_ensemble()
+    assert list(fig.data[0].x) == [0.0, 1.0, 2.0]
+    assert max(fig.data[-1].x) == pytest.approx(2.0)
@@ -16,4 +16,28 @@ def ymno3_phases(get_test_file_path):
     fpath = get_test_file_path("core/ymno3_phases.json")
     with open(fpath, 'r+') as f:
         d = json.load(f)
-        return SolidPhaseSet.from_dict(d)
\ No newline at end of file
+        return SolidPhaseSet.from_dict(d)
+@pytest.fixture(autouse=True)
+def isolated_cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("RXN_CA_CACHE_DIR", str(tmp_path / "rxn_ca_cache"))
+
+@pytest.fixture
+def batio3_phases():
+    phases = ["BaO", "TiO2", "BaTiO3"]
+    return SolidPhaseSet(
+        phases,
+        volumes={ p: 1.0 for p in phases },
+        densities={ p: 1.0 for p in phases },
+        melting_points={ p: 2000 for p in phases },
+        experimentally_observed={ p: True for p in phases },
+    )
+
+@pytest.fixture
+def batio3_lib(batio3_phases):
+    from rxn_ca.reactions import ReactionLibrary, ScoredReaction, ScoredReactionSet
+
+    lib = ReactionLibrary(batio3_phases)
+    for temp in [1000, 1200]:
+        rxns = [ScoredReaction({ "BaO": 1, "TiO2": 1 }, { "BaTiO3": 2 }, 1.0, energy_per_atom=-0.1)]
+        lib.add_rxns_at_temp(ScoredReactionSet(rxns, batio3_phases), temp)
+    return lib
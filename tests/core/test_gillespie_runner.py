@@ -0,0 +1,71 @@
+import pytest
+
+import numpy as np
+
+from rxn_ca.core.heating import HeatingSchedule, HeatingStep
+from rxn_ca.core.recipe import ReactionRecipe
+from rxn_ca.core.gillespie_runner import GillespieRunner, InterfaceIndex, get_step_times
+from rxn_ca.core.tau_leaping_runner import TauLeapingRunner
+from rxn_ca.analysis.reaction_step_analyzer import ReactionStepAnalyzer
+from rxn_ca.utilities.single_sim import run_single_sim
+
+def _recipe(steps, size=6):
+    return ReactionRecipe(heating_schedule=HeatingSchedule(steps), reactant_amounts={ "BaO": 1, "TiO2": 1 }, simulation_size=size, packing_fraction=0.8)
+
+def test_output_follows_time_grid(batio3_lib):
+    recipe = _recipe([HeatingStep(2, 1200), HeatingStep(1, 1000)])
+    result = run_single_sim(recipe, reaction_lib=batio3_lib, phase_set=batio3_lib.phases, seed=0, gillespie=GillespieRunner(time_resolution=0.1)).results[0]
+
+    assert [seg["num_steps"] for seg in result.metadata["segments"]] == [20, 10]
+    assert result.metadata["time_resolution"] == 0.1
+
+    times = get_step_times(result, 6 ** 3)
+    assert len(times) == len(result)
+    assert times[21] == pytest.approx(2)
+    assert times[-1] == pytest.approx(3)
+
+def test_step_times_default_to_site_visits(batio3_lib):
+    recipe = _recipe([HeatingStep(1, 1200)])
+    result = run_single_sim(recipe, reaction_lib=batio3_lib, phase_set=batio3_lib.phases, seed=0).results[0]
+    assert get_step_times(result, 6 ** 3)[-1] == pytest.approx(1)
+
+def test_events_are_counted(batio3_lib):
+    recipe = _recipe([HeatingStep(2, 1200)])
+    result = run_single_sim(recipe, reaction_lib=batio3_lib, phase_set=batio3_lib.phases, seed=0, stream_seed=1, gillespie=GillespieRunner()).results[0]
+
+    assert result.stages[0].metadata["gillespie"]["events"] > 0
+    assert result.stages[0].metadata["gillespie"]["duration"] == pytest.approx(2)
+
+def test_matches_site_visit_runner(batio3_lib):
+    recipe = _recipe([HeatingStep(4, 1200)], size=8)
+    analyzer = ReactionStepAnalyzer(batio3_lib.phases)
+
+    def final_fractions(gillespie):
+        return [
+            analyzer.set_step_group(run_single_sim(recipe, reaction_lib=batio3_lib, phase_set=batio3_lib.phases, seed=i, gillespie=gillespie).results[0].output).get_all_mole_fractions().get("BaTiO3", 0)
+            for i in range(3)
+        ]
+
+    exact = final_fractions(None)
+    event_driven = final_fractions(GillespieRunner(time_resolution=0.5))
+    assert np.mean(event_driven) == pytest.approx(np.mean(exact), abs=0.08)
+
+def test_events_only_reclassify_nearby_pairs(batio3_lib, monkeypatch):
+    def reclassify(*args, **kwargs):
+        raise AssertionError("The whole lattice was reclassified")
+    monkeypatch.setattr(TauLeapingRunner, "get_event_classes", reclassify)
+
+    num_added = [0]
+    add_pair = InterfaceIndex._add_pair
+    def counting_add_pair(self, pair):
+        num_added[0] += 1
+        add_pair(self, pair)
+    monkeypatch.setattr(InterfaceIndex, "_add_pair", counting_add_pair)
+
+    recipe = _recipe([HeatingStep(1, 1200)], size=20)
+    result = run_single_sim(recipe, reaction_lib=batio3_lib, phase_set=batio3_lib.phases, seed=0, gillespie=GillespieRunner(time_resolution=0.5)).results[0]
+
+    # An event changes at most two sites, each of which is in 2 * 6 pairs
+    num_events = result.stages[0].metadata["gillespie"]["events"]
+    assert num_events > 0
+    assert num_added[0] <= num_events * 2 * 2 * 6
@@ -0,0 +1,51 @@
+import pytest
+
+from rxn_ca.core.heating import HeatingSchedule, HeatingStep, HeatingSegment, RegrindStep
+
+def test_compile_merges_same_temperature_steps():
+    sched = HeatingSchedule.build(
+        HeatingStep.hold(1000, 3),
+        HeatingStep.hold(1200, 2),
+        RegrindStep(),
+        HeatingStep.hold(1200, 1),
+    )
+    segments = sched.compile()
+
+    assert [type(s) for s in segments] == [HeatingSegment, HeatingSegment, RegrindStep, HeatingSegment]
+    assert segments[0].temperature == 1000
+    assert segments[0].duration == 3
+    assert segments[0].step_indices == [0, 1, 2]
+    assert segments[1].step_indices == [3, 4]
+    assert segments[3].step_indices == [6]
+
+    assert len(sched.compile(merge=False)) == len(sched)
+
+def test_temp_at():
+    sched = HeatingSchedule.build(
+        HeatingStep.sweep(600, 900, stage_length=2),
+        HeatingStep.hold(900, 3),
+    )
+
+    assert sched.temp_at(0) == 600
+    assert sched.temp_at(1) == 600
+    assert sched.temp_at(2) == 700
+    assert sched.temp_at(6) == 900
+    assert sched.temp_at(10) == 900
+    assert sched.temp_at(11) is None
+
+def test_temp_at_follows_new_steps():
+    sched = HeatingSchedule.build(HeatingStep.hold(900, 3))
+    assert sched.temp_at(2) == 900
+
+    sched.steps = HeatingStep.hold(1100, 3)
+    assert sched.temp_at(2) == 1100
+
+    with pytest.raises(AttributeError):
+        sched.steps.append(HeatingStep(1, 1200))
+
+def test_serialization_round_trip():
+    sched = HeatingSchedule.build(HeatingStep.hold(900, 3), RegrindStep(), HeatingStep.hold(1000, 2))
+    reloaded = HeatingSchedule.from_dict(sched.as_dict())
+
+    assert len(reloaded) == len(sched)
+    assert reloaded.temp_at(4) == 1000
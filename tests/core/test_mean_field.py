@@ -0,0 +1,106 @@
+import pytest
+
+from rxn_ca.core.heating import HeatingSchedule, HeatingStep, RegrindStep
+from rxn_ca.core.recipe import ReactionRecipe
+from rxn_ca.phases import SolidPhaseSet
+from rxn_ca.reactions import ReactionLibrary, ScoredReaction, ScoredReactionSet
+from rxn_ca.core.mean_field import MeanFieldSolver, get_calibration_report
+from rxn_ca.analysis.reaction_step_analyzer import AnalysisQuantity, AnalysisMode
+from rxn_ca.analysis.visualization.phase_trace_calculator import PhaseTraceConfig
+from rxn_ca.utilities.single_sim import run_single_sim
+
+def _recipe(temp, duration=4, **kwargs):
+    sched = HeatingSchedule.build(HeatingStep.hold(temp, duration))
+    return ReactionRecipe(heating_schedule=sched, reactant_amounts={ "BaO": 1, "TiO2": 1 }, simulation_size=4, **kwargs)
+
+def test_initial_state_matches_precursor_volumes(batio3_lib):
+    solver = MeanFieldSolver(batio3_lib)
+    state = solver.get_initial_state({ "BaO": 1, "TiO2": 1 }, packing_fraction=0.8)
+
+    assert sum(state.site_fractions.values()) == pytest.approx(1)
+    assert state.site_fractions[SolidPhaseSet.FREE_SPACE] == pytest.approx(0.2)
+
+    result = solver.run_schedule(state, HeatingSchedule.build(HeatingStep.hold(1000, 0)))
+    moles = result.get_values()[0]
+    assert moles["BaO"] == pytest.approx(0.5)
+    assert moles["TiO2"] == pytest.approx(0.5)
+
+def test_product_grows_and_sites_are_conserved(batio3_lib):
+    result = MeanFieldSolver(batio3_lib).run(_recipe(1000))
+
+    assert result.times[-1] == pytest.approx(4)
+    for state in result.states:
+        assert sum(state.site_fractions.values()) == pytest.approx(1)
+
+    moles = result.get_values(AnalysisQuantity.MOLES, AnalysisMode.FRACTIONAL)
+    product = [m.get("BaTiO3", 0) for m in moles]
+    assert product[0] == 0
+    assert product[-1] > 0
+    assert all([b >= a for a, b in zip(product, product[1:])])
+
+    # BaO and TiO2 are consumed in equal amounts
+    assert moles[-1]["BaO"] == pytest.approx(moles[-1]["TiO2"], rel=1e-6)
+
+def test_inertia_slows_reaction(batio3_lib):
+    fast = MeanFieldSolver(batio3_lib, inertia=1).run(_recipe(1000)).get_values()[-1]
+    slow = MeanFieldSolver(batio3_lib, inertia=10).run(_recipe(1000)).get_values()[-1]
+    assert fast["BaTiO3"] > slow["BaTiO3"]
+
+def test_atmosphere_comes_from_recipe():
+    phases = ["BaO", "BaO2", "O2"]
+    phase_set = SolidPhaseSet(
+        phases,
+        volumes={ p: 1.0 for p in phases },
+        densities={ p: 1.0 for p in phases },
+        melting_points={ p: 2000 for p in phases },
+        experimentally_observed={ p: True for p in phases },
+    )
+    lib = ReactionLibrary(phase_set)
+    rxns = [ScoredReaction({ "BaO": 2, "O2": 1 }, { "BaO2": 2 }, 1.0, energy_per_atom=-0.1)]
+    lib.add_rxns_at_temp(ScoredReactionSet(rxns, phase_set), 1000)
+
+    def recipe(atmosphere):
+        sched = HeatingSchedule.build(HeatingStep.hold(1000, 4))
+        return ReactionRecipe(heating_schedule=sched, reactant_amounts={ "BaO": 1 }, simulation_size=4, atmospheric_phases=atmosphere)
+
+    solver = MeanFieldSolver(lib)
+    assert solver.run(recipe(["O2"])).get_values()[-1]["BaO2"] > 0
+    assert "BaO2" not in solver.run(recipe([])).get_values()[-1]
+
+    with pytest.raises(ValueError):
+        MeanFieldSolver(lib, atmospheric_species=[]).run(recipe(["O2"]))
+
+def test_regrind_keeps_composition(batio3_lib):
+    sched = HeatingSchedule([HeatingStep(2, 1000), RegrindStep(), HeatingStep(2, 1000)])
+    recipe = ReactionRecipe(heating_schedule=sched, reactant_amounts={ "BaO": 1, "TiO2": 1 }, simulation_size=4, packing_fraction=0.8)
+    solver = MeanFieldSolver(batio3_lib)
+    result = solver.run(recipe)
+
+    assert result.times[-1] == pytest.approx(4)
+    before, after = [i for i, t in enumerate(result.times) if t == pytest.approx(2)]
+    assert result.get_values()[after]["BaTiO3"] == pytest.approx(result.get_values()[before]["BaTiO3"], abs=0.05)
+    assert result.states[-1].site_fractions.get(SolidPhaseSet.FREE_SPACE, 0) == 0
+
+def test_traces(batio3_lib):
+    result = MeanFieldSolver(batio3_lib).run(_recipe(1200), samples_per_step=4)
+    traces = result.get_traces(PhaseTraceConfig(minimum_required_prevalence=0.01))
+
+    assert sorted([t.name for t in traces]) == ["BaO", "BaTiO3", "TiO2"]
+    for trace in traces:
+        assert len(trace.ys) == len(result)
+
+def test_calibration_report(batio3_lib):
+    recipe = _recipe(1200)
+    lattice = [
+        run_single_sim(recipe, reaction_lib=batio3_lib, phase_set=batio3_lib.phases, seed=i).results[0]
+        for i in range(2)
+    ]
+    result = MeanFieldSolver(batio3_lib).run(recipe, samples_per_step=4)
+
+    report = get_calibration_report(result, lattice, batio3_lib.phases, num_points=10)
+    assert report["num_realizations"] == 2
+    assert set(report["phases"].keys()) == { "BaO", "TiO2", "BaTiO3" }
+    for phase, entry in report["phases"].items():
+        assert 0 <= entry["rmse"] <= entry["max_abs_error"] <= 1
+    assert report["max_rmse"] == max([e["rmse"] for e in report["phases"].values()])
+    assert report["max_rmse"] < 0.15
@@ -0,0 +1,70 @@
+from rxn_ca.core.random_streams import RandomStreams, STREAM_NAMES, SITE_SELECTION, REACTIONS
+
+def test_same_seed_same_draws():
+    a = RandomStreams(3)
+    b = RandomStreams(3)
+    for name in STREAM_NAMES:
+        assert a.get(name).random() == b.get(name).random()
+
+def test_streams_are_independent():
+    a = RandomStreams(3)
+    b = RandomStreams(3)
+
+    # Drawing from one stream does not shift the others
+    a.get(REACTIONS).random(100)
+    assert a.get(SITE_SELECTION).integers(1000, size=10).tolist() == b.get(SITE_SELECTION).integers(1000, size=10).tolist()
+
+    assert RandomStreams(3).get(SITE_SELECTION).random() != RandomStreams(4).get(SITE_SELECTION).random()
+
+def test_state_roundtrip():
+    streams = RandomStreams(7)
+    state = streams.get_state()
+    expected = [streams.get(name).random() for name in STREAM_NAMES]
+
+    streams.set_state(state)
+    assert [streams.get(name).random() for name in STREAM_NAMES] == expected
+
+def test_forked_realizations_draw_differently(batio3_lib, monkeypatch):
+    import numpy as np
+    from rxn_ca.core.heating import HeatingSchedule, HeatingStep
+    from rxn_ca.core.recipe import ReactionRecipe
+    from rxn_ca.utilities import parallel_sim
+
+    # Records the first value each realization would draw from numpy's global generator
+    run_single_sim = parallel_sim.run_single_sim
+    def recording_run(*args, **kwargs):
+        first_draw = np.random.get_state()[1][:4].tolist()
+        doc = run_single_sim(*args, **kwargs)
+        doc.results[0].metadata["first_draw"] = first_draw
+        return doc
+    monkeypatch.setattr(parallel_sim, "run_single_sim", recording_run)
+
+    recipe = ReactionRecipe(
+        heating_schedule=HeatingSchedule.build(HeatingStep.hold(1000, 1)),
+        reactant_amounts={ "BaO": 1, "TiO2": 1 },
+        simulation_size=4,
+        num_realizations=3,
+    )
+    doc = parallel_sim.run_sim_parallel(recipe, reaction_lib=batio3_lib)
+    draws = [tuple(r.metadata["first_draw"]) for r in doc.results]
+    assert len(set(draws)) == 3
+
+    # With a seed, the draws are reproducible
+    seeded = [tuple(r.metadata["first_draw"]) for r in parallel_sim.run_sim_parallel(recipe, reaction_lib=batio3_lib, seed=5).results]
+    again = [tuple(r.metadata["first_draw"]) for r in parallel_sim.run_sim_parallel(recipe, reaction_lib=batio3_lib, seed=5).results]
+    assert seeded == again
+    assert len(set(seeded)) == 3
+
+def test_seeded_single_runs_are_reproducible(batio3_lib):
+    from rxn_ca.core.heating import HeatingSchedule, HeatingStep
+    from rxn_ca.core.recipe import ReactionRecipe
+    from rxn_ca.utilities.single_sim import run_single_sim
+
+    recipe = ReactionRecipe(
+        heating_schedule=HeatingSchedule.build(HeatingStep.hold(1200, 1)),
+        reactant_amounts={ "BaO": 1, "TiO2": 1 },
+        simulation_size=4,
+    )
+    first = run_single_sim(recipe, reaction_lib=batio3_lib, seed=2).results[0]
+    second = run_single_sim(recipe, reaction_lib=batio3_lib, seed=2).results[0]
+    assert first.stages[0]._diffs == second.stages[0]._diffs
@@ -0,0 +1,18 @@
+from rxn_ca.core.heating import HeatingSchedule, HeatingStep
+from rxn_ca.core.recipe import ReactionRecipe
+from rxn_ca.core.reaction_calculator import ReactionCalculator
+from rxn_ca.core.liquid_swap_controller import LiquidSwapController
+from rxn_ca.utilities.microstructure_cache import get_initial_simulation
+
+def test_neighbors_are_sorted_once(batio3_lib):
+    sched = HeatingSchedule.build(HeatingStep.hold(1200, 4))
+    recipe = ReactionRecipe(heating_schedule=sched, reactant_amounts={ "BaO": 1, "TiO2": 1 }, simulation_size=6, packing_fraction=0.8)
+    simulation = get_initial_simulation(recipe, batio3_lib.phases, seed=0, use_cache=False)
+
+    graph = LiquidSwapController.get_neighborhood_from_structure(simulation.structure)
+    calculator = ReactionCalculator(graph)
+
+    for site_id in simulation.state.site_ids():
+        neighbors = calculator.neighbors_of(site_id)
+        assert list(neighbors) == sorted(graph.neighbors_of(site_id, include_weights=True))
+        assert calculator.neighbors_of(site_id) is neighbors
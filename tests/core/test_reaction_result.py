@@ -0,0 +1,82 @@
+import pytest
+
+from pylattica.core import SimulationState
+from pylattica.core.simulation_result import compress_result
+
+from rxn_ca.core.reaction_result import ReactionResult, ChainedReactionResult
+
+def _stage(start: int, num_steps: int) -> ReactionResult:
+    state = SimulationState()
+    state.set_site_state(0, { "val": start })
+    result = ReactionResult(state)
+    for i in range(num_steps):
+        result.add_step({ 0: { "val": start + i + 1 } })
+    return result
+
+def _copied(stages):
+    # The timeline that concatenating the stages by copying diffs produces
+    copied = ReactionResult(stages[0].initial_state)
+    for idx, stage in enumerate(stages):
+        if idx > 0:
+            copied.add_step(stage.first_step.as_state_update())
+        for d in stage._diffs:
+            copied.add_step(d)
+    return copied
+
+@pytest.fixture
+def stages():
+    return [_stage(0, 3), _stage(100, 2), _stage(200, 4)]
+
+def test_matches_copied_timeline(stages):
+    chained = ChainedReactionResult(stages)
+    copied = _copied(stages)
+
+    assert len(chained) == len(copied)
+    assert len(chained._diffs) == len(copied._diffs)
+    assert list(chained._diffs) == list(copied._diffs)
+    assert [chained._diffs[i] for i in range(len(copied._diffs))] == list(copied._diffs)
+
+    expected = [s.get_site_state(0)["val"] for s in copied.steps()]
+    assert [s.get_site_state(0)["val"] for s in chained.steps()] == expected
+    assert [chained.get_step(i).get_site_state(0)["val"] for i in range(len(chained))] == expected
+    assert chained.last_step.get_site_state(0)["val"] == 204
+    assert chained.stage_offset(2) == 7
+
+    chained.load_steps(2)
+    assert chained.get_step(4).get_site_state(0)["val"] == expected[4]
+
+def test_references_stages(stages):
+    chained = ChainedReactionResult(stages)
+    assert chained.stages[1] is stages[1]
+    assert chained.output is stages[-1].output
+
+def test_serialization(stages):
+    chained = ChainedReactionResult(stages)
+    chained.metadata["segments"] = [{ "start_step": 0 }]
+
+    d = chained.as_dict()
+    assert len(d["stages"]) == 3
+    reloaded = ChainedReactionResult.from_dict(d)
+    assert reloaded.metadata == chained.metadata
+    assert [s.get_site_state(0)["val"] for s in reloaded.steps()] == [s.get_site_state(0)["val"] for s in chained.steps()]
+
+def test_compress(stages):
+    compressed = compress_result(ChainedReactionResult(stages), 4)
+    assert compressed.last_step.get_site_state(0)["val"] <= 204
+
+def test_held_steps(stages):
+    chained = ChainedReactionResult(stages, held_steps=[2, 0, 3])
+
+    assert len(chained) == sum(len(s) for s in stages) + 5
+    assert chained.stage_offset(1) == len(stages[0]) + 2
+    assert len(list(chained._diffs)) == len(chained._diffs)
+    assert chained._diffs[3] == {}
+
+    vals = [s.get_site_state(0)["val"] for s in chained.steps()]
+    assert vals[:6] == [0, 1, 2, 3, 3, 3]
+    assert vals[-4:] == [204, 204, 204, 204]
+    assert [chained.get_step(i).get_site_state(0)["val"] for i in range(len(chained))] == vals
+
+    reloaded = ChainedReactionResult.from_dict(chained.as_dict())
+    assert reloaded.held_steps == [2, 0, 3]
+    assert len(reloaded) == len(chained)
@@ -0,0 +1,94 @@
+import pytest
+
+import numpy as np
+
+from pylattica.discrete.state_constants import DISCRETE_OCCUPANCY
+
+from rxn_ca.core.heating import HeatingSchedule, HeatingStep
+from rxn_ca.core.recipe import ReactionRecipe
+from rxn_ca.core.reaction_calculator import ReactionCalculator
+from rxn_ca.core.liquid_swap_controller import LiquidSwapController, swap_chance
+from rxn_ca.core.tau_leaping_runner import TauLeapingRunner, LatticeIndex
+from rxn_ca.analysis.reaction_step_analyzer import ReactionStepAnalyzer
+from rxn_ca.utilities.microstructure_cache import get_initial_simulation
+from rxn_ca.utilities.single_sim import run_single_sim
+
+def _recipe(size=6, temp=1200):
+    sched = HeatingSchedule.build(HeatingStep.hold(temp, 4))
+    return ReactionRecipe(heating_schedule=sched, reactant_amounts={ "BaO": 1, "TiO2": 1 }, simulation_size=size, packing_fraction=0.8)
+
+def _controller(simulation, lib, temp=1200):
+    calculator = ReactionCalculator(LiquidSwapController.get_neighborhood_from_structure(simulation.structure))
+    controller = LiquidSwapController(simulation.structure, rxn_calculator=calculator)
+    controller.set_rxn_set(lib.get_rxns_at_temp(temp))
+    controller.set_temperature(temp)
+    return controller
+
+def _count(state, phase):
+    return len([sid for sid in state.site_ids() if state.get_site_state(sid)[DISCRETE_OCCUPANCY] == phase])
+
+def test_event_classes_count_interfaces(batio3_lib):
+    simulation = get_initial_simulation(_recipe(), batio3_lib.phases, seed=0, use_cache=False)
+    controller = _controller(simulation, batio3_lib)
+    lattice = LatticeIndex(controller.reaction_calculator.neighborhood_graph, simulation.state.site_ids())
+
+    classes, counts = TauLeapingRunner().get_event_classes(simulation.state, controller, lattice)
+
+    assert counts["BaO"] == _count(simulation.state, "BaO")
+    assert sum(counts.values()) == len(lattice)
+
+    # Only BaO and TiO2 next to each other can react, and well below the melting
+    # point swaps are negligible
+    rxn_classes = [c for c in classes if not c.is_swap]
+    assert set([(c.site_phase, c.nb_phase) for c in rxn_classes]) == { ("BaO", "TiO2"), ("TiO2", "BaO") }
+    assert sum([c.rate for c in classes if c.is_swap]) < 0.01
+
+    bao_class = [c for c in rxn_classes if c.site_phase == "BaO"][0]
+    num_interfaces = len(bao_class.sites)
+    total, _ = controller.reaction_calculator.phase_interactions("BaO", "TiO2")
+    react_prob = 1 - swap_chance(1200 / 2000)
+    assert bao_class.rate == pytest.approx(num_interfaces / 6 / len(lattice) * react_prob / total)
+    for site_id, nb_id in zip(bao_class.sites, bao_class.nbs):
+        assert simulation.state.get_site_state(int(site_id))[DISCRETE_OCCUPANCY] == "BaO"
+        assert simulation.state.get_site_state(int(nb_id))[DISCRETE_OCCUPANCY] == "TiO2"
+
+def test_leaping_keeps_one_step_per_visit(batio3_lib):
+    simulation = get_initial_simulation(_recipe(), batio3_lib.phases, seed=0, use_cache=False)
+    controller = _controller(simulation, batio3_lib)
+    runner = TauLeapingRunner(epsilon=0.2, min_leap_events=2)
+
+    result = runner.run(simulation.state, controller, 800)
+
+    assert len(result) == 801
+    stats = result.metadata["tau_leaping"]
+    assert stats["leaps"] > 0
+    assert stats["leaped_visits"] + stats["exact_visits"] == 800
+
+    # Every reaction turns one solid site into another
+    solids = _count(simulation.state, "BaO") + _count(simulation.state, "TiO2")
+    final = result.output
+    assert _count(final, "BaO") + _count(final, "TiO2") + _count(final, "BaTiO3") == solids
+    assert _count(final, "BaTiO3") > 0
+
+def test_falls_back_to_exact_stepping(batio3_lib):
+    recipe = _recipe()
+    runner = TauLeapingRunner(min_leap_events=float("inf"))
+
+    exact = run_single_sim(recipe, reaction_lib=batio3_lib, phase_set=batio3_lib.phases, seed=0, stream_seed=3).results[0]
+    fallback = run_single_sim(recipe, reaction_lib=batio3_lib, phase_set=batio3_lib.phases, seed=0, stream_seed=3, tau_leaping=runner).results[0]
+
+    assert list(fallback.get_diffs()) == list(exact.get_diffs())
+
+def test_leaping_matches_exact_runner(batio3_lib):
+    recipe = _recipe(size=8)
+    analyzer = ReactionStepAnalyzer(batio3_lib.phases)
+
+    def final_fractions(tau_leaping):
+        return [
+            analyzer.set_step_group(run_single_sim(recipe, reaction_lib=batio3_lib, phase_set=batio3_lib.phases, seed=i, tau_leaping=tau_leaping).results[0].output).get_all_mole_fractions().get("BaTiO3", 0)
+            for i in range(3)
+        ]
+
+    exact = final_fractions(None)
+    leaped = final_fractions(TauLeapingRunner(epsilon=0.1, min_leap_events=5))
+    assert np.mean(leaped) == pytest.approx(np.mean(exact), abs=0.08)
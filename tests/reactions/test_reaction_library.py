@@ -0,0 +1,96 @@
+import pytest
+
+from rxn_ca.phases import SolidPhaseSet
+from rxn_ca.reactions import ReactionLibrary, ScoredReaction, ScoredReactionSet
+
+BA_O = "BaO"
+TI_O2 = "TiO2"
+BA_TI_O3 = "BaTiO3"
+BA2_TI_O4 = "Ba2TiO4"
+
+@pytest.fixture
+def batio_phase_set():
+    phases = [BA_O, TI_O2, BA_TI_O3, BA2_TI_O4]
+    return SolidPhaseSet(
+        phases,
+        volumes={ p: 1.0 for p in phases },
+        densities={ p: 1.0 for p in phases },
+        melting_points={ p: 2000 for p in phases },
+        experimentally_observed={ p: True for p in phases },
+    )
+
+def _rxns(score):
+    return [
+        ScoredReaction({ BA_O: 1, TI_O2: 1 }, { BA_TI_O3: 1 }, score, energy_per_atom=-0.1),
+        ScoredReaction({ BA_O: 2, TI_O2: 1 }, { BA2_TI_O4: 1 }, score, energy_per_atom=-0.05),
+        ScoredReaction({ BA2_TI_O4: 1, TI_O2: 1 }, { BA_TI_O3: 2 }, score, energy_per_atom=-0.02),
+    ]
+
+def test_ids_consistent_across_temps(batio_phase_set):
+    lib = ReactionLibrary(batio_phase_set)
+    lib.add_rxns_at_temp(ScoredReactionSet(_rxns(1.0), batio_phase_set), 1000)
+    lib.add_rxns_at_temp(ScoredReactionSet(_rxns(2.0)[::-1], batio_phase_set), 1200)
+
+    for rxn in lib.get_rxns_at_temp(1000).reactions:
+        other = lib.get_rxns_at_temp(1200).get_rxn_by_id(rxn.rxn_id)
+        assert other.canonical_key == rxn.canonical_key
+        assert other.competitiveness == 2.0
+
+def test_ids_survive_filtering_and_serialization(batio_phase_set):
+    lib = ReactionLibrary(batio_phase_set)
+    lib.add_rxns_at_temp(ScoredReactionSet(_rxns(1.0), batio_phase_set), 1000)
+    ids = { r.canonical_key: r.rxn_id for r in lib.get_rxns_at_temp(1000).reactions }
+
+    filtered = lib.exclude_phases([BA2_TI_O4])
+    remaining = filtered.get_rxns_at_temp(1000).reactions
+    assert len(remaining) == 1
+    assert remaining[0].rxn_id == ids[remaining[0].canonical_key]
+
+    reloaded = ReactionLibrary.from_dict(lib.as_dict())
+    for r in reloaded.get_rxns_at_temp(1000).reactions:
+        assert r.rxn_id == ids[r.canonical_key]
+
+def test_shared_reactions_are_not_renumbered(batio_phase_set):
+    rxns = _rxns(1.0)
+    first = ReactionLibrary(batio_phase_set)
+    first.add_rxns_at_temp(ScoredReactionSet(rxns, batio_phase_set), 1000)
+    first_set = first.get_rxns_at_temp(1000)
+    ids = { r.canonical_key: r.rxn_id for r in first_set.reactions }
+
+    # The second library registers the last reaction first, so it numbers the
+    # reactions differently
+    second = ReactionLibrary(batio_phase_set)
+    second.add_rxns_at_temp(ScoredReactionSet(_rxns(2.0)[2:], batio_phase_set), 1000)
+    second.add_rxns_at_temp(first_set, 1200)
+
+    assert any([r.rxn_id != ids[r.canonical_key] for r in second.get_rxns_at_temp(1200).reactions])
+    for r in first.get_rxns_at_temp(1000).reactions:
+        assert r.rxn_id == ids[r.canonical_key]
+        assert first_set.get_rxn_by_id(r.rxn_id) is r
+    for r in second.get_rxns_at_temp(1200).reactions:
+        assert r.rxn_id == second.get_rxn_id(r)
+
+def test_prune_unreachable(batio_phase_set):
+    lib = ReactionLibrary(batio_phase_set)
+    lib.add_rxns_at_temp(ScoredReactionSet(_rxns(1.0), batio_phase_set), 1000)
+    lib.add_rxns_at_temp(ScoredReactionSet(_rxns(1.0), batio_phase_set), 1200)
+
+    # BaTiO3 is only reachable through the Ba2TiO4 intermediate if TiO2 is present
+    assert lib.get_reachable_phases([BA_O]) == set([BA_O])
+    assert lib.get_reachable_phases([BA_O, TI_O2]) == set([BA_O, TI_O2, BA_TI_O3, BA2_TI_O4])
+
+    pruned = lib.prune_unreachable([BA2_TI_O4, TI_O2], temps=[1000])
+    assert pruned.temps == [1000]
+    kept = pruned.get_rxns_at_temp(1000).reactions
+    assert len(kept) == 1
+    assert kept[0].reactants == frozenset([BA2_TI_O4, TI_O2])
+
+def test_prune_respects_min_score(batio_phase_set):
+    rxns = _rxns(1.0)
+    rxns[1].competitiveness = 0.0
+    lib = ReactionLibrary(batio_phase_set)
+    lib.add_rxns_at_temp(ScoredReactionSet(rxns, batio_phase_set), 1000)
+
+    # Without the BaO + TiO2 -> Ba2TiO4 route, Ba2TiO4 can't be formed
+    assert BA2_TI_O4 not in lib.get_reachable_phases([BA_O, TI_O2])
+    assert lib.prune_unreachable([BA_O, TI_O2]).num_rxns == 1
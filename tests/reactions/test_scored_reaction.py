@@ -0,0 +1,66 @@
+import pickle
+
+import pytest
+
+from rxn_ca.reactions import ScoredReaction
+
+BA_O = "BaO"
+TI_O2 = "TiO2"
+BA_TI_O3 = "BaTiO3"
+O2 = "O2"
+
+@pytest.fixture
+def basic_rxn():
+    return ScoredReaction({ BA_O: 1.5, TI_O2: 0.5 }, { BA_TI_O3: 1.8, O2: 0.2 }, 2.0, energy_per_atom=-0.1, rxn_id=4)
+
+def test_public_api(basic_rxn):
+    assert basic_rxn.reactants == frozenset([BA_O, TI_O2])
+    assert basic_rxn.products == frozenset([BA_TI_O3, O2])
+    assert basic_rxn.solid_products == frozenset([BA_TI_O3])
+    assert basic_rxn.product_stoich(BA_TI_O3) == 1.8
+    assert basic_rxn.reactant_stoich(TI_O2) == 0.5
+    assert basic_rxn.solid_reactant_stoich_fraction(BA_O) == pytest.approx(0.75)
+    assert basic_rxn.convert_reactant_amt_to_product_amt(BA_O, 2.0, BA_TI_O3) == pytest.approx(1.8)
+
+def test_dict_round_trip(basic_rxn):
+    d = basic_rxn.as_dict()
+    assert d["reactants"] == { BA_O: 1.5, TI_O2: 0.5 }
+    assert d["products"] == { BA_TI_O3: 1.8, O2: 0.2 }
+
+    reloaded = ScoredReaction.from_dict(d)
+    assert reloaded.rxn_id == 4
+    assert str(reloaded) == str(basic_rxn)
+
+def test_stoichiometry_is_shared(basic_rxn):
+    at_other_temp = ScoredReaction({ TI_O2: 0.5, BA_O: 1.5 }, { O2: 0.2, BA_TI_O3: 1.8 }, 3.0)
+    assert at_other_temp._stoich is basic_rxn._stoich
+    assert at_other_temp.competitiveness == 3.0
+
+    unpickled = pickle.loads(pickle.dumps(basic_rxn))
+    assert unpickled._stoich is basic_rxn._stoich
+    assert unpickled.competitiveness == basic_rxn.competitiveness
+
+def test_totals_and_lookups(basic_rxn):
+    assert basic_rxn.total_reactant_stoich == pytest.approx(2.0)
+    assert basic_rxn.total_product_stoich == pytest.approx(2.0)
+    assert basic_rxn.total_solid_product_stoich == pytest.approx(1.8)
+    assert basic_rxn.stoich_ratio(BA_TI_O3, BA_O) == pytest.approx(1.2)
+    with pytest.raises(KeyError):
+        basic_rxn.product_stoich(BA_O)
+
+def test_smaller_than_dicts():
+    import tracemalloc
+
+    # The same reactions at ten temperatures, as in a typical library
+    names = [(f"A{i}", f"B{i % 7}", f"C{i}") for i in range(1000)]
+
+    def per_reaction(make):
+        tracemalloc.start()
+        rxns = [make(a, b, c, t) for t in range(10) for a, b, c in names]
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return size / len(rxns)
+
+    compact = per_reaction(lambda a, b, c, t: ScoredReaction({ a: 1.0, b: 2.0 }, { c: 3.0 }, t * 0.1))
+    as_dicts = per_reaction(lambda a, b, c, t: { "reactants": { a: 1.0, b: 2.0 }, "products": { c: 3.0 }, "competitiveness": t * 0.1 })
+    assert compact < 0.6 * as_dicts
@@ -0,0 +1,50 @@
+from collections import Counter
+
+import pytest
+
+from pylattica.discrete.state_constants import DISCRETE_OCCUPANCY
+
+from rxn_ca.core.constants import VOLUME
+from rxn_ca.phases import SolidPhaseSet
+from rxn_ca.setup.noise_setup import SetupRandomNoise
+
+PHASES = ["BaO", "TiO2"]
+
+@pytest.fixture
+def phase_set():
+    return SolidPhaseSet(
+        PHASES,
+        volumes={ "BaO": 2.0, "TiO2": 1.0 },
+        densities={ p: 1.0 for p in PHASES },
+        melting_points={ p: 2000 for p in PHASES },
+        experimentally_observed={ p: True for p in PHASES },
+    )
+
+def test_phase_amounts(phase_set):
+    sim = SetupRandomNoise(phase_set).setup({ "BaO": 1, "TiO2": 1 }, size=10, packing_efficiency=0.9, rng=0)
+    counts = Counter([s[DISCRETE_OCCUPANCY] for s in sim.state.all_site_states()])
+
+    assert counts["BaO"] == 600
+    assert counts["TiO2"] == 300
+    assert counts[phase_set.FREE_SPACE] == 100
+    assert all([s[VOLUME] == 1.0 for s in sim.state.all_site_states()])
+
+def test_rng_is_reproducible(phase_set):
+    def _occupancies(rng):
+        sim = SetupRandomNoise(phase_set).setup({ "BaO": 1, "TiO2": 1 }, size=8, rng=rng)
+        return [sim.state.get_site_state(sid)[DISCRETE_OCCUPANCY] for sid in sim.structure.site_ids]
+
+    assert _occupancies(3) == _occupancies(3)
+    assert _occupancies(3) != _occupancies(4)
+
+def test_defaults_to_global_generator(phase_set):
+    import numpy as np
+
+    def _occupancies():
+        sim = SetupRandomNoise(phase_set).setup({ "BaO": 1, "TiO2": 1 }, size=8)
+        return [sim.state.get_site_state(sid)[DISCRETE_OCCUPANCY] for sid in sim.structure.site_ids]
+
+    np.random.seed(3)
+    first = _occupancies()
+    np.random.seed(3)
+    assert _occupancies() == first
@@ -0,0 +1,51 @@
+import pytest
+
+from pylattica.core import AsynchronousRunner, SimulationState
+from pylattica.discrete.state_constants import DISCRETE_OCCUPANCY
+from pylattica.structures.square_grid import DiscreteGridSetup
+
+from rxn_ca.analysis.reaction_step_analyzer import ReactionStepAnalyzer
+from rxn_ca.core.constants import VOLUME
+from rxn_ca.phases import SolidPhaseSet
+from rxn_ca.setup.phase_growth_controller import PhaseGrowthController
+
+PHASES = ["BaO", "TiO2"]
+
+@pytest.fixture
+def phase_set():
+    return SolidPhaseSet(
+        PHASES,
+        volumes={ p: 1.0 for p in PHASES },
+        densities={ p: 1.0 for p in PHASES },
+        melting_points={ p: 2000 for p in PHASES },
+        experimentally_observed={ p: True for p in PHASES },
+    )
+
+def test_growth_tracks_volumes(phase_set):
+    size = 8
+    setup = DiscreteGridSetup(phase_set, dim=3)
+    struct = setup.build_structure(size)
+    state: SimulationState = setup.setup_solid_phase(struct, phase_set.FREE_SPACE)
+    for sid in struct.site_ids:
+        state.set_site_state(sid, { VOLUME: 1.0 })
+
+    site_ids = struct.site_ids
+    state.set_site_state(site_ids[0], { DISCRETE_OCCUPANCY: "BaO" })
+    state.set_site_state(site_ids[len(site_ids) // 2], { DISCRETE_OCCUPANCY: "TiO2" })
+
+    desired = { "BaO": 0.75 * size ** 3, "TiO2": 0.25 * size ** 3 }
+    controller = PhaseGrowthController(phase_set, struct, desired, background_phase=phase_set.FREE_SPACE)
+
+    analyzer = ReactionStepAnalyzer(phase_set)
+    runner = AsynchronousRunner()
+    for _ in range(20):
+        res = runner.run(state, controller, num_steps=size ** 3)
+        state = res.last_step
+        if len(controller.known_empty_ids) == 0:
+            break
+
+    actual = analyzer.set_step_group(state).get_all_absolute_phase_volumes()
+    assert actual.get(phase_set.FREE_SPACE) is None
+    assert sum(actual.values()) == size ** 3
+    assert controller._phase_vols == actual
+    assert len(controller._empty_id_positions) == 0
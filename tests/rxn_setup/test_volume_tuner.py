@@ -0,0 +1,56 @@
+import pytest
+
+from pylattica.discrete.state_constants import DISCRETE_OCCUPANCY
+
+from rxn_ca.analysis.reaction_step_analyzer import ReactionStepAnalyzer
+from rxn_ca.core.constants import VOLUME
+from rxn_ca.phases import SolidPhaseSet
+from rxn_ca.setup.noise_setup import SetupRandomNoise
+from rxn_ca.setup.volume_tuner import VolumeTuner
+from rxn_ca.utilities.setup_reaction import setup_reaction
+
+PHASES = ["BaO", "TiO2"]
+
+@pytest.fixture
+def phase_set():
+    return SolidPhaseSet(
+        PHASES,
+        volumes={ p: 1.0 for p in PHASES },
+        densities={ p: 1.0 for p in PHASES },
+        melting_points={ p: 2000 for p in PHASES },
+        experimentally_observed={ p: True for p in PHASES },
+    )
+
+@pytest.fixture
+def state(phase_set):
+    return SetupRandomNoise(phase_set).setup({ "BaO": 1, "TiO2": 1 }, size=10, packing_efficiency=1.0, rng=0).state
+
+def test_tune_hits_targets(phase_set, state):
+    targets = { "BaO": 420.0, "TiO2": 610.5 }
+    VolumeTuner(phase_set, targets).tune(state)
+
+    vols = ReactionStepAnalyzer(phase_set).set_step_group(state).get_all_absolute_phase_volumes()
+    for phase, target in targets.items():
+        assert vols[phase] == pytest.approx(target)
+
+def test_noise_is_bounded(phase_set, state):
+    targets = { "BaO": 500.0, "TiO2": 500.0 }
+    VolumeTuner(phase_set, targets, noise=0.1, rng=1).tune(state)
+
+    vols = ReactionStepAnalyzer(phase_set).set_step_group(state).get_all_absolute_phase_volumes()
+    # The bound applies between cells of the same phase
+    cell_vols = [s[VOLUME] for s in state.all_site_states() if s[DISCRETE_OCCUPANCY] == "BaO"]
+    assert vols["BaO"] == pytest.approx(500.0)
+    assert len(set(cell_vols)) > 2
+    assert max(cell_vols) / min(cell_vols) <= 1.1 / 0.9 + 1e-9
+
+def test_invalid_noise(phase_set):
+    with pytest.raises(ValueError):
+        VolumeTuner(phase_set, {}, noise=1.0)
+
+def test_setup_reaction_passes_noise_through(phase_set):
+    sim = setup_reaction(phase_set, { "BaO": 1, "TiO2": 1 }, size=8, volume_noise=0.1, rng=0)
+
+    cell_vols = [s[VOLUME] for s in sim.state.all_site_states() if s[DISCRETE_OCCUPANCY] == "BaO"]
+    assert len(set(cell_vols)) > 2
+    assert max(cell_vols) / min(cell_vols) <= 1.1 / 0.9 + 1e-9
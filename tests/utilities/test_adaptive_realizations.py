@@ -0,0 +1,57 @@
+import math
+
+import pytest
+
+from rxn_ca.core.heating import HeatingSchedule, HeatingStep
+from rxn_ca.core.recipe import ReactionRecipe
+from rxn_ca.utilities.parallel_sim import run_sim_parallel, get_final_fraction_half_widths
+
+def _recipe(num_realizations):
+    sched = HeatingSchedule.build(HeatingStep.hold(1000, 1))
+    return ReactionRecipe(
+        heating_schedule=sched,
+        reactant_amounts={ "BaO": 1, "TiO2": 1 },
+        simulation_size=4,
+        num_realizations=num_realizations
+    )
+
+def test_stops_once_precise(batio3_lib):
+    doc = run_sim_parallel(_recipe(6), reaction_lib=batio3_lib, ci_tolerance=1.0, min_realizations=2, wave_size=2)
+
+    adaptive = doc.metadata["adaptive"]
+    assert adaptive["converged"]
+    assert adaptive["num_realizations"] == 2
+    assert len(doc.results) == 2
+    assert adaptive["precision"] <= 1.0
+
+def test_respects_budget(batio3_lib):
+    doc = run_sim_parallel(_recipe(5), reaction_lib=batio3_lib, ci_tolerance=0.0, wave_size=2)
+
+    adaptive = doc.metadata["adaptive"]
+    assert not adaptive["converged"]
+    assert adaptive["num_realizations"] == 5
+    assert len(doc.results) == 5
+
+def test_target_phase(batio3_lib):
+    doc = run_sim_parallel(_recipe(4), reaction_lib=batio3_lib, ci_tolerance=0.0, target_phase="BaTiO3", min_realizations=2, wave_size=2)
+    adaptive = doc.metadata["adaptive"]
+    assert adaptive["precision"] == adaptive["half_widths"]["BaTiO3"]
+
+def test_unknown_target_phase(batio3_lib):
+    with pytest.raises(ValueError):
+        run_sim_parallel(_recipe(4), reaction_lib=batio3_lib, ci_tolerance=0.0, target_phase="Ba2TiO4")
+
+def test_absent_phase_counts_as_zero(batio3_lib):
+    doc = run_sim_parallel(_recipe(2), reaction_lib=batio3_lib)
+    half_widths = get_final_fraction_half_widths(doc.results, batio3_lib.phases, include_phases=["Ba2TiO4"])
+    assert half_widths["Ba2TiO4"] == 0.0
+    assert math.isinf(get_final_fraction_half_widths(doc.results[:1], batio3_lib.phases, include_phases=["Ba2TiO4"])["Ba2TiO4"])
+
+def test_half_widths(batio3_lib):
+    doc = run_sim_parallel(_recipe(2), reaction_lib=batio3_lib)
+    assert doc.metadata is None
+
+    half_widths = get_final_fraction_half_widths(doc.results, batio3_lib.phases)
+    assert set(half_widths.keys()) <= { "BaO", "TiO2", "BaTiO3" }
+    assert all(hw >= 0 for hw in half_widths.values())
+    assert all(math.isinf(hw) for hw in get_final_fraction_half_widths(doc.results[:1], batio3_lib.phases).values())
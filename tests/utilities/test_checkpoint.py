@@ -0,0 +1,116 @@
+import numpy as np
+import pytest
+import random
+
+from pylattica.core import AsynchronousRunner
+from pylattica.discrete.state_constants import DISCRETE_OCCUPANCY
+
+from rxn_ca.core.heating import HeatingSchedule, HeatingStep
+from rxn_ca.core.liquid_swap_controller import LiquidSwapController
+from rxn_ca.core.reaction_calculator import ReactionCalculator
+from rxn_ca.core.recipe import ReactionRecipe
+from rxn_ca.utilities.checkpoint import RunCheckpoint, get_rng_state, set_rng_state
+from rxn_ca.utilities.heating_schedule_runner import HeatingScheduleRunner
+from rxn_ca.utilities.microstructure_cache import get_initial_simulation
+from rxn_ca.utilities.single_sim import run_single_sim
+
+def _recipe():
+    sched = HeatingSchedule.build(HeatingStep.hold(1000, 3), HeatingStep.hold(1200, 2))
+    return ReactionRecipe(heating_schedule=sched, reactant_amounts={ "BaO": 1, "TiO2": 1 }, simulation_size=4)
+
+def _occupancies(state):
+    return [state.get_site_state(sid)[DISCRETE_OCCUPANCY] for sid in sorted(state.site_ids())]
+
+@pytest.fixture
+def controller(batio3_lib):
+    simulation = get_initial_simulation(_recipe(), batio3_lib.phases, seed=0)
+    calculator = ReactionCalculator(LiquidSwapController.get_neighborhood_from_structure(simulation.structure))
+    return LiquidSwapController(simulation.structure, rxn_calculator=calculator)
+
+def _run(lib, controller, checkpoint_dir, resume=False):
+    random.seed(0)
+    np.random.seed(0)
+    recipe = _recipe()
+    return HeatingScheduleRunner().run_multi(
+        get_initial_simulation(recipe, lib.phases, seed=0),
+        lib,
+        recipe.heating_schedule,
+        controller,
+        verbose=False,
+        checkpoint=RunCheckpoint(checkpoint_dir),
+        checkpoint_every=1,
+        resume=resume
+    )
+
+def test_rng_state_roundtrip():
+    state = get_rng_state()
+    expected = (random.random(), np.random.random())
+    random.random()
+    np.random.random()
+
+    set_rng_state(state)
+    assert (random.random(), np.random.random()) == expected
+
+@pytest.mark.parametrize("fail_on_call", [2, 4])
+def test_resume_matches_uninterrupted(batio3_lib, controller, tmp_path, monkeypatch, fail_on_call):
+    expected = _run(batio3_lib, controller, str(tmp_path / "uninterrupted"))
+
+    original_run = AsynchronousRunner.run
+    calls = { "n": 0 }
+
+    def failing_run(self, *args, **kwargs):
+        calls["n"] += 1
+        if calls["n"] == fail_on_call:
+            raise KeyboardInterrupt()
+        return original_run(self, *args, **kwargs)
+
+    checkpoint_dir = str(tmp_path / "interrupted")
+    monkeypatch.setattr(AsynchronousRunner, "run", failing_run)
+    with pytest.raises(KeyboardInterrupt):
+        _run(batio3_lib, controller, checkpoint_dir)
+    monkeypatch.setattr(AsynchronousRunner, "run", original_run)
+
+    assert RunCheckpoint(checkpoint_dir).exists()
+
+    # Scramble the generators, the checkpoint restores them
+    random.seed(1)
+    np.random.seed(1)
+    resumed = _run(batio3_lib, controller, checkpoint_dir, resume=True)
+
+    assert len(resumed) == len(expected)
+    assert resumed.metadata["segments"] == expected.metadata["segments"]
+    assert _occupancies(resumed.last_step) == _occupancies(expected.last_step)
+
+def test_resume_rejects_other_schedule(batio3_lib, controller, tmp_path):
+    checkpoint_dir = str(tmp_path / "checkpoint")
+    _run(batio3_lib, controller, checkpoint_dir)
+
+    recipe = _recipe()
+    recipe.heating_schedule = HeatingSchedule.build(HeatingStep.hold(1000, 2))
+    with pytest.raises(ValueError):
+        run_single_sim(recipe, reaction_lib=batio3_lib, seed=0, checkpoint_dir=checkpoint_dir, resume=True)
+
+def test_resume_restores_random_streams(batio3_lib, tmp_path, monkeypatch):
+    def run(checkpoint_dir, resume=False):
+        return run_single_sim(_recipe(), reaction_lib=batio3_lib, seed=0, stream_seed=3,
+                              checkpoint_dir=checkpoint_dir, checkpoint_every=1, resume=resume).results[0]
+
+    expected = run(str(tmp_path / "uninterrupted"))
+
+    original_run = AsynchronousRunner.run
+    calls = { "n": 0 }
+
+    def failing_run(self, *args, **kwargs):
+        calls["n"] += 1
+        if calls["n"] == 3:
+            raise KeyboardInterrupt()
+        return original_run(self, *args, **kwargs)
+
+    checkpoint_dir = str(tmp_path / "interrupted")
+    monkeypatch.setattr(AsynchronousRunner, "run", failing_run)
+    with pytest.raises(KeyboardInterrupt):
+        run(checkpoint_dir)
+    monkeypatch.setattr(AsynchronousRunner, "run", original_run)
+
+    resumed = run(checkpoint_dir, resume=True)
+    assert _occupancies(resumed.last_step) == _occupancies(expected.last_step)
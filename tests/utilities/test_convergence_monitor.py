@@ -0,0 +1,27 @@
+from rxn_ca.core.heating import HeatingSchedule, HeatingStep
+from rxn_ca.core.recipe import ReactionRecipe
+from rxn_ca.utilities.convergence_monitor import ConvergenceMonitor
+from rxn_ca.utilities.single_sim import run_single_sim
+
+def _run(lib, reactants, monitor):
+    sched = HeatingSchedule.build(HeatingStep.hold(1000, 6), HeatingStep.hold(1200, 2))
+    recipe = ReactionRecipe(heating_schedule=sched, reactant_amounts=reactants, simulation_size=4)
+    return run_single_sim(recipe, reaction_lib=lib, seed=0, convergence_monitor=monitor).results[0]
+
+def test_quiescent_segment_is_cut_short(batio3_lib):
+    # Nothing can react with only the product present
+    result = _run(batio3_lib, { "BaTiO3": 1 }, ConvergenceMonitor(window=1, patience=2))
+    full = _run(batio3_lib, { "BaTiO3": 1 }, None)
+
+    segments = result.metadata["segments"]
+    assert segments[0]["skipped_steps"] == 4 * 4 ** 3
+    assert segments[1]["skipped_steps"] == 0
+    assert len(result) == len(full)
+    assert [s["start_step"] for s in segments] == [s["start_step"] for s in full.metadata["segments"]]
+    assert sum(len(stage) for stage in result.stages) < len(full)
+
+def test_active_segment_runs(batio3_lib):
+    monitor = ConvergenceMonitor(window=1, event_rate_tol=0.0, fraction_tol=0.0, patience=6)
+    result = _run(batio3_lib, { "BaO": 1, "TiO2": 1 }, monitor)
+    assert result.metadata["segments"][0]["skipped_steps"] == 0
+    assert result.metadata["segments"][0]["num_steps"] == 6 * 4 ** 3
@@ -0,0 +1,60 @@
+import json
+
+import numpy as np
+import pytest
+
+from rxn_network.reactions.computed import ComputedReaction
+from rxn_network.reactions.reaction_set import ReactionSet
+
+from rxn_ca.phases import SolidPhaseSet
+from rxn_ca.reactions.scorers import GibbsErfScore, TammanScore
+from rxn_ca.utilities.energy_cache import EnergyCache
+from rxn_ca.utilities.get_scored_rxns import get_scored_rxns
+
+@pytest.fixture
+def rxn_set(get_test_file_path):
+    with open(get_test_file_path("integration/batio_enumeration.json"), "r+") as f:
+        d = json.load(f)
+    return ReactionSet.from_rxns(list(ReactionSet.from_dict(d["rxn_set"]).get_rxns())[:25])
+
+@pytest.fixture
+def phase_set(rxn_set):
+    phases = set([c.reduced_formula for r in rxn_set.get_rxns() for c in r.compositions])
+    return SolidPhaseSet(
+        list(phases),
+        volumes={ p: 1.0 for p in phases },
+        densities={ p: 1.0 for p in phases },
+        melting_points={ p: 2000 for p in phases },
+        experimentally_observed={ p: True for p in phases },
+    )
+
+def test_put_merges_with_existing(tmp_path):
+    cache = EnergyCache(str(tmp_path))
+    assert np.all(np.isnan(cache.get_energies("abc", 1000, 3)))
+
+    cache.put_energies("abc", 1000, np.array([1.0, np.nan, np.nan]))
+    cache.put_energies("abc", 1000, np.array([np.nan, 2.0, np.nan]))
+    energies = cache.get_energies("abc", 1000, 3)
+    assert energies[0] == 1.0
+    assert energies[1] == 2.0
+    assert np.isnan(energies[2])
+
+def test_energies_reused_across_scorers(tmp_path, rxn_set, phase_set, monkeypatch):
+    cache = EnergyCache(str(tmp_path))
+    first = get_scored_rxns(rxn_set, temps=[1000], phase_set=phase_set, scorer_class=TammanScore,
+                            parallel=False, energy_cache=cache)
+
+    def _fail(*args, **kwargs):
+        raise AssertionError("Energy should have been read from the cache")
+
+    monkeypatch.setattr(ComputedReaction, "get_new_temperature", _fail)
+    second = get_scored_rxns(rxn_set, temps=[1000], phase_set=phase_set, scorer_class=GibbsErfScore,
+                             parallel=False, energy_cache=cache)
+
+    for a, b in zip(first.get_rxns_at_temp(1000).reactions, second.get_rxns_at_temp(1000).reactions):
+        assert a.canonical_key == b.canonical_key
+        assert a.energy_per_atom == pytest.approx(b.energy_per_atom)
+
+    # A new temperature still has to be computed
+    with pytest.raises(AssertionError):
+        get_scored_rxns(rxn_set, temps=[1100], phase_set=phase_set, parallel=False, energy_cache=cache)
@@ -0,0 +1,95 @@
+import json
+
+import pytest
+
+from rxn_network.reactions.reaction_set import ReactionSet
+
+from rxn_ca.phases import SolidPhaseSet
+from rxn_ca.utilities.get_scored_rxns import get_scored_rxns
+from rxn_ca.utilities.hashing import hash_rxn_set
+from rxn_ca.reactions.scorers import TammanScore
+
+@pytest.fixture
+def batio_rxns(get_test_file_path):
+    with open(get_test_file_path("integration/batio_enumeration.json"), "r+") as f:
+        d = json.load(f)
+    rxns = list(ReactionSet.from_dict(d["rxn_set"]).get_rxns())
+    return rxns
+
+@pytest.fixture
+def batio_phases(batio_rxns):
+    phases = set([c.reduced_formula for r in batio_rxns for c in r.compositions])
+    return SolidPhaseSet(
+        list(phases),
+        volumes={ p: 1.0 for p in phases },
+        densities={ p: 1.0 for p in phases },
+        melting_points={ p: 2000 for p in phases },
+        experimentally_observed={ p: True for p in phases },
+    )
+
+def test_extend_with_new_temperature(batio_rxns, batio_phases):
+    rxn_set = ReactionSet.from_rxns(batio_rxns[:30])
+    lib = get_scored_rxns(rxn_set, temps=[800, 1000], phase_set=batio_phases, parallel=False)
+    assert lib.get_provenance(800)["enumeration"] == hash_rxn_set(rxn_set)
+
+    old_800 = lib.get_rxns_at_temp(800)
+    extended = get_scored_rxns(rxn_set, temps=[1000, 1350], phase_set=batio_phases, parallel=False, existing_lib=lib)
+
+    assert sorted(extended.temps) == [800, 1000, 1350]
+    # Untouched temperatures are carried over rather than recomputed
+    assert extended.get_rxns_at_temp(800) is old_800
+    for rxn in extended.get_rxns_at_temp(1350).reactions:
+        assert rxn.rxn_id == lib.get_rxn_id(rxn)
+
+def test_extend_with_new_reactions(batio_rxns, batio_phases):
+    small = ReactionSet.from_rxns(batio_rxns[:20])
+    large = ReactionSet.from_rxns(batio_rxns[:30])
+    lib = get_scored_rxns(small, temps=[1000], phase_set=batio_phases, parallel=False)
+    ids = { r.canonical_key: r.rxn_id for r in lib.get_rxns_at_temp(1000).reactions }
+
+    extended = get_scored_rxns(large, temps=[1000], phase_set=batio_phases, parallel=False, existing_lib=lib)
+    from_scratch = get_scored_rxns(large, temps=[1000], phase_set=batio_phases, parallel=False)
+
+    assert len(extended.get_rxns_at_temp(1000)) == len(from_scratch.get_rxns_at_temp(1000))
+    for rxn in extended.get_rxns_at_temp(1000).reactions:
+        if rxn.canonical_key in ids:
+            assert rxn.rxn_id == ids[rxn.canonical_key]
+    assert extended.get_provenance(1000)["enumeration"] == hash_rxn_set(large)
+
+def test_parallel_tiles_match_serial(batio_rxns, batio_phases):
+    rxn_set = ReactionSet.from_rxns(batio_rxns[:40])
+    serial = get_scored_rxns(rxn_set, temps=[1000], phase_set=batio_phases, parallel=False)
+    tiled = get_scored_rxns(rxn_set, temps=[1000], phase_set=batio_phases, processes=3, chunk_size=7)
+
+    serial_rxns = serial.get_rxns_at_temp(1000).reactions
+    tiled_rxns = tiled.get_rxns_at_temp(1000).reactions
+    assert len(serial_rxns) == len(tiled_rxns)
+    for s, t in zip(serial_rxns, tiled_rxns):
+        assert s.canonical_key == t.canonical_key
+        assert t.competitiveness == pytest.approx(s.competitiveness)
+        assert t.energy_per_atom == pytest.approx(s.energy_per_atom)
+
+def test_extend_drops_removed_reactions(batio_rxns, batio_phases):
+    old = ReactionSet.from_rxns(batio_rxns[:30])
+    new = ReactionSet.from_rxns(batio_rxns[10:40])
+    lib = get_scored_rxns(old, temps=[1000], phase_set=batio_phases, parallel=False)
+
+    extended = get_scored_rxns(new, temps=[1000], phase_set=batio_phases, processes=2, chunk_size=3, existing_lib=lib)
+    from_scratch = get_scored_rxns(new, temps=[1000], phase_set=batio_phases, parallel=False)
+
+    expected = { r.canonical_key: r for r in from_scratch.get_rxns_at_temp(1000).reactions }
+    actual = extended.get_rxns_at_temp(1000).reactions
+    assert set([r.canonical_key for r in actual]) == set(expected.keys())
+    for rxn in actual:
+        assert rxn.competitiveness == pytest.approx(expected[rxn.canonical_key].competitiveness)
+
+def test_does_not_modify_temps(batio_rxns, batio_phases):
+    rxn_set = ReactionSet.from_rxns(batio_rxns[:10])
+    lib = get_scored_rxns(rxn_set, temps=[800], phase_set=batio_phases, parallel=False)
+
+    class OtherScore(TammanScore):
+        pass
+
+    temps = [1000]
+    get_scored_rxns(rxn_set, temps=temps, scorer_class=OtherScore, phase_set=batio_phases, parallel=False, existing_lib=lib)
+    assert temps == [1000]
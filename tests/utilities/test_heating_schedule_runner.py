@@ -0,0 +1,26 @@
+from rxn_ca.core.heating import HeatingSchedule, HeatingStep, RegrindStep
+from rxn_ca.core.recipe import ReactionRecipe
+from rxn_ca.utilities.single_sim import run_single_sim
+
+def test_segments_recorded(batio3_lib):
+    sched = HeatingSchedule.build(HeatingStep.hold(1000, 3), RegrindStep(), HeatingStep.hold(1200, 2))
+    recipe = ReactionRecipe(heating_schedule=sched, reactant_amounts={ "BaO": 1, "TiO2": 1 }, simulation_size=4)
+
+    result = run_single_sim(recipe, reaction_lib=batio3_lib, seed=0).results[0]
+    segments = result.metadata["segments"]
+
+    assert [s["temperature"] for s in segments] == [1000, 1200]
+    assert segments[0]["schedule_steps"] == [0, 1, 2]
+    assert segments[0]["num_steps"] == 3 * 4 ** 3
+    assert segments[1]["start_step"] == segments[0]["num_steps"] + 1
+    assert len(result._diffs) == segments[1]["start_step"] + segments[1]["num_steps"]
+
+def test_regrind_is_reproducible_with_streams(batio3_lib):
+    sched = HeatingSchedule.build(HeatingStep.hold(1200, 1), RegrindStep(), HeatingStep.hold(1200, 1))
+    recipe = ReactionRecipe(heating_schedule=sched, reactant_amounts={ "BaO": 1, "TiO2": 1 }, simulation_size=4)
+
+    def run():
+        result = run_single_sim(recipe, reaction_lib=batio3_lib, seed=0, stream_seed=1).results[0]
+        return result.stages[1].first_step.as_dict(), result.output.as_dict()
+
+    assert run() == run()
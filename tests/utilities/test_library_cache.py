@@ -0,0 +1,114 @@
+import os
+
+import pytest
+
+from rxn_ca.phases import SolidPhaseSet
+from rxn_ca.reactions import ReactionLibrary, ScoredReaction, ScoredReactionSet
+from rxn_ca.utilities.library_cache import LibraryCache
+
+PHASES = ["BaO", "TiO2", "BaTiO3"]
+
+@pytest.fixture
+def phase_set():
+    return SolidPhaseSet(
+        PHASES,
+        volumes={ p: 1.0 for p in PHASES },
+        densities={ p: 1.0 for p in PHASES },
+        melting_points={ p: 2000 for p in PHASES },
+        experimentally_observed={ p: True for p in PHASES },
+    )
+
+def _lib(phase_set, temp):
+    lib = ReactionLibrary(phase_set)
+    rxns = [ScoredReaction({ "BaO": 1, "TiO2": 1 }, { "BaTiO3": 1 }, 1.0, energy_per_atom=-0.1)]
+    lib.add_rxns_at_temp(ScoredReactionSet(rxns, phase_set), temp)
+    return lib
+
+def test_round_trip(tmp_path, phase_set):
+    cache = LibraryCache(str(tmp_path))
+    assert cache.get("abc") is None
+
+    cache.put("abc", _lib(phase_set, 1000))
+    cached = cache.get("abc")
+    assert cached.temps == [1000]
+    assert len(cached.get_rxns_at_temp(1000)) == 1
+
+def test_lru_eviction(tmp_path, phase_set):
+    cache = LibraryCache(str(tmp_path))
+    cache.put("a", _lib(phase_set, 1000))
+    entry_size = os.path.getsize(os.path.join(str(tmp_path), "a.json"))
+    cache.max_size = int(entry_size * 2.5)
+
+    cache.put("b", _lib(phase_set, 1000))
+    os.utime(os.path.join(str(tmp_path), "a.json"), (0, 0))
+    os.utime(os.path.join(str(tmp_path), "b.json"), (1, 1))
+    # Reading "a" makes it the most recently used, so "b" is evicted next
+    cache.get("a")
+    cache.put("c", _lib(phase_set, 1000))
+
+    assert cache.get("a") is not None
+    assert cache.get("b") is None
+    assert cache.get("c") is not None
+
+def test_corrupt_entry_is_a_miss(tmp_path):
+    cache = LibraryCache(str(tmp_path))
+    with open(os.path.join(str(tmp_path), "bad.json"), "w+") as f:
+        f.write("{ not json")
+
+    assert cache.get("bad") is None
+    assert not os.path.exists(os.path.join(str(tmp_path), "bad.json"))
+
+def test_enumeration_is_hashed_once(tmp_path, monkeypatch, get_test_file_path):
+    import json
+    from rxn_network.reactions.reaction_set import ReactionSet
+    from rxn_ca.core.heating import HeatingSchedule, HeatingStep
+    from rxn_ca.core.recipe import ReactionRecipe
+    from rxn_ca.utilities import library_cache, get_scored_rxns, hashing
+
+    with open(get_test_file_path("integration/batio_enumeration.json"), "r+") as f:
+        rxns = list(ReactionSet.from_dict(json.load(f)["rxn_set"]).get_rxns())[:10]
+    phases = set([c.reduced_formula for r in rxns for c in r.compositions])
+    phases = SolidPhaseSet(
+        list(phases),
+        volumes={ p: 1.0 for p in phases },
+        densities={ p: 1.0 for p in phases },
+        melting_points={ p: 2000 for p in phases },
+        experimentally_observed={ p: True for p in phases },
+    )
+
+    calls = []
+    def counting_hash(rxn_set):
+        calls.append(1)
+        return hashing.hash_rxn_set(rxn_set)
+    monkeypatch.setattr(library_cache, "hash_rxn_set", counting_hash)
+    monkeypatch.setattr(get_scored_rxns, "hash_rxn_set", counting_hash)
+
+    recipe = ReactionRecipe(heating_schedule=HeatingSchedule.build(HeatingStep.hold(1000, 1)), reactant_amounts={ "BaO": 1, "TiO2": 1 })
+    library_cache.get_library_for_recipe(recipe, ReactionSet.from_rxns(rxns), phases, cache=LibraryCache(str(tmp_path)))
+    assert len(calls) == 1
+
+def test_enumeration_hash_is_memoized(monkeypatch, get_test_file_path):
+    import json
+    from rxn_network.reactions.reaction_set import ReactionSet
+    from rxn_ca.utilities.hashing import hash_rxn_set
+
+    with open(get_test_file_path("integration/batio_enumeration.json"), "r+") as f:
+        rxns = list(ReactionSet.from_dict(json.load(f)["rxn_set"]).get_rxns())[:10]
+    rxn_set = ReactionSet.from_rxns(rxns[:5])
+
+    digest = hash_rxn_set(rxn_set)
+    calls = []
+    as_dict = rxn_set.as_dict
+    def counting_as_dict():
+        calls.append(1)
+        return as_dict()
+    monkeypatch.setattr(rxn_set, "as_dict", counting_as_dict)
+
+    assert hash_rxn_set(rxn_set) == digest
+    assert len(calls) == 0
+
+    # Replacing the reactions invalidates the memoized digest
+    larger = ReactionSet.from_rxns(rxns)
+    rxn_set.indices, rxn_set.coeffs, rxn_set.all_data = larger.indices, larger.coeffs, larger.all_data
+    assert hash_rxn_set(rxn_set) != digest
+    assert len(calls) == 1
@@ -0,0 +1,81 @@
+import pytest
+
+from rxn_ca.core.heating import HeatingSchedule, HeatingStep
+from rxn_ca.core.recipe import ReactionRecipe
+from rxn_ca.phases import SolidPhaseSet
+from rxn_ca.utilities import microstructure_cache
+from rxn_ca.utilities.microstructure_cache import MicrostructureCache, get_initial_simulation
+
+PHASES = ["BaO", "TiO2"]
+
+@pytest.fixture
+def phase_set():
+    return SolidPhaseSet(
+        PHASES,
+        volumes={ "BaO": 2.0, "TiO2": 1.0 },
+        densities={ p: 1.0 for p in PHASES },
+        melting_points={ p: 2000 for p in PHASES },
+        experimentally_observed={ p: True for p in PHASES },
+    )
+
+@pytest.fixture
+def recipe():
+    return ReactionRecipe(
+        heating_schedule=HeatingSchedule.build(HeatingStep.hold(1000, 2)),
+        reactant_amounts={ "BaO": 1, "TiO2": 1 },
+        simulation_size=6,
+        packing_fraction=0.9,
+    )
+
+def test_round_trip(tmp_path, recipe, phase_set):
+    cache = MicrostructureCache(str(tmp_path))
+    sim = get_initial_simulation(recipe, phase_set, seed=0, use_cache=False)
+
+    cache.put("abc", sim)
+    loaded = cache.get("abc", phase_set)
+
+    assert loaded.state == sim.state
+    assert loaded.structure.site_ids == sim.structure.site_ids
+
+def test_seeded_setups_are_cached(tmp_path, recipe, phase_set, monkeypatch):
+    cache = MicrostructureCache(str(tmp_path))
+    first = get_initial_simulation(recipe, phase_set, seed=1, cache=cache)
+    other_seed = get_initial_simulation(recipe, phase_set, seed=2, cache=cache)
+    assert first.state != other_seed.state
+
+    def _fail(*args, **kwargs):
+        raise AssertionError("Microstructure should have been read from the cache")
+
+    monkeypatch.setattr(microstructure_cache, "_build_initial_simulation", _fail)
+    assert get_initial_simulation(recipe, phase_set, seed=1, cache=cache).state == first.state
+
+def test_unseeded_parallel_runs_use_fresh_setups(tmp_path, batio3_lib):
+    import os
+    from rxn_ca.utilities.parallel_sim import run_sim_parallel
+
+    recipe = ReactionRecipe(
+        heating_schedule=HeatingSchedule.build(HeatingStep.hold(1000, 1)),
+        reactant_amounts={ "BaO": 1, "TiO2": 1 },
+        simulation_size=4,
+        num_realizations=2,
+    )
+    cache = MicrostructureCache(str(tmp_path / "microstructures"))
+    first = run_sim_parallel(recipe, reaction_lib=batio3_lib, microstructure_cache=cache)
+    second = run_sim_parallel(recipe, reaction_lib=batio3_lib, microstructure_cache=cache)
+
+    assert os.listdir(cache.cache_dir) == []
+    assert first.results[0].first_step != second.results[0].first_step
+
+def test_evicts_least_recently_used(tmp_path, recipe, phase_set):
+    import os
+
+    sim = get_initial_simulation(recipe, phase_set, seed=0, use_cache=False)
+    cache = MicrostructureCache(str(tmp_path))
+    cache.put("a", sim)
+    cache.max_size = int(os.path.getsize(os.path.join(str(tmp_path), "a.npz")) * 1.5)
+
+    os.utime(os.path.join(str(tmp_path), "a.npz"), (0, 0))
+    cache.put("b", sim)
+
+    assert not cache.has("a")
+    assert cache.get("b", phase_set).state == sim.state
@@ -0,0 +1,75 @@
+import pytest
+
+from rxn_ca.core.heating import HeatingSchedule, HeatingStep, RegrindStep
+from rxn_ca.core.recipe import ReactionRecipe
+from rxn_ca.utilities.microstructure_cache import get_initial_simulation
+from rxn_ca.utilities.multi_resolution import (
+    coarsen_simulation,
+    refine_simulation,
+    get_phase_volumes,
+    get_volume_errors,
+    split_schedule,
+    run_multi_resolution_sim,
+)
+
+def _recipe(steps, size=8):
+    return ReactionRecipe(heating_schedule=HeatingSchedule(steps), reactant_amounts={ "BaO": 1, "TiO2": 1 }, simulation_size=size, packing_fraction=0.8)
+
+def test_coarsen_and_refine_preserve_volumes(batio3_lib):
+    phases = batio3_lib.phases
+    simulation = get_initial_simulation(_recipe([HeatingStep(1, 1000)]), phases, seed=0, use_cache=False)
+    fine_volumes = get_phase_volumes(simulation.state)
+
+    coarse = coarsen_simulation(simulation, phases, 2, rng=0)
+    assert len(coarse.structure.site_ids) == 4 ** 3
+    assert get_volume_errors({ p: v / 8 for p, v in fine_volumes.items() }, get_phase_volumes(coarse.state)) == {}
+
+    refined = refine_simulation(coarse, phases, 2, rng=0)
+    assert len(refined.structure.site_ids) == 8 ** 3
+    assert get_volume_errors(fine_volumes, get_phase_volumes(refined.state)) == {}
+
+def test_coarsen_requires_divisible_size(batio3_lib):
+    simulation = get_initial_simulation(_recipe([HeatingStep(1, 1000)], size=6), batio3_lib.phases, seed=0, use_cache=False)
+    with pytest.raises(ValueError):
+        coarsen_simulation(simulation, batio3_lib.phases, 4)
+
+def test_split_schedule_keeps_regrind_with_next_step():
+    sched = HeatingSchedule([HeatingStep(1, 1000), RegrindStep(), HeatingStep(1, 1200)])
+    head, tail = split_schedule(sched, 2)
+    assert len(head.steps) == 1
+    assert isinstance(tail.steps[0], RegrindStep)
+
+def test_fixed_refine_point(batio3_lib):
+    recipe = _recipe([HeatingStep(1, 1000), HeatingStep(1, 1200), HeatingStep(1, 1200)])
+    doc = run_multi_resolution_sim(recipe, reaction_lib=batio3_lib, refine_at=2, seed=0)
+
+    result = doc.results[0]
+    info = result.metadata["multi_resolution"]
+    assert info["refined_at"] == 2
+    assert info["coarse_size"] == 4
+    assert len(info["coarse_event_rates"]) == 1
+    assert len(result.output.site_ids()) == 8 ** 3
+
+    # The document's schedule is the part its results cover
+    assert [s.temperature for s in doc.recipe.heating_schedule.steps] == [1200]
+    assert [seg["schedule_steps"] for seg in result.metadata["segments"]] == [[0]]
+    assert doc.metadata["multi_resolution"]["refined_at"] == 2
+    assert len(doc.metadata["multi_resolution"]["heating_schedule"]["steps"]) == 3
+
+def test_refines_when_reactions_start(batio3_lib):
+    recipe = _recipe([HeatingStep(1, 1200)] * 4)
+
+    eager = run_multi_resolution_sim(recipe, reaction_lib=batio3_lib, refine_event_rate=0.0, seed=0).results[0]
+    assert eager.metadata["multi_resolution"]["refined_at"] == 1
+
+    never = run_multi_resolution_sim(recipe, reaction_lib=batio3_lib, refine_event_rate=1.1, seed=0).results[0]
+    assert never.metadata["multi_resolution"]["refined_at"] == 3
+    assert len(never.metadata["multi_resolution"]["coarse_event_rates"]) == 3
+
+def test_realizations_share_refine_point(batio3_lib):
+    recipe = _recipe([HeatingStep(1, 1200)] * 4)
+    recipe.num_realizations = 2
+    doc = run_multi_resolution_sim(recipe, reaction_lib=batio3_lib, refine_event_rate=0.0, seed=0)
+
+    assert [r.metadata["multi_resolution"]["refined_at"] for r in doc.results] == [1, 1]
+    assert len(doc.recipe.heating_schedule.steps) == 3
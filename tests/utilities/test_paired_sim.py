@@ -0,0 +1,60 @@
+import pytest
+import random
+
+import numpy as np
+
+from pylattica.discrete.state_constants import DISCRETE_OCCUPANCY
+
+from rxn_ca.core.heating import HeatingSchedule, HeatingStep
+from rxn_ca.core.recipe import ReactionRecipe
+from rxn_ca.utilities.paired_sim import run_paired_sims, get_paired_differences
+from rxn_ca.utilities.single_sim import run_single_sim
+
+def _recipe(temp, name=None, **kwargs):
+    sched = HeatingSchedule.build(HeatingStep.hold(temp, 2))
+    return ReactionRecipe(heating_schedule=sched, reactant_amounts={ "BaO": 1, "TiO2": 1 }, simulation_size=4, num_realizations=3, name=name, **kwargs)
+
+def _occupancies(state):
+    return [state.get_site_state(sid)[DISCRETE_OCCUPANCY] for sid in sorted(state.site_ids())]
+
+def test_stream_seed_makes_runs_reproducible(batio3_lib):
+    recipe = _recipe(1000)
+    docs = []
+    for global_seed in [1, 2]:
+        # The global generators play no part once a stream seed is given
+        random.seed(global_seed)
+        np.random.seed(global_seed)
+        docs.append(run_single_sim(recipe, reaction_lib=batio3_lib, phase_set=batio3_lib.phases, seed=0, stream_seed=5))
+
+    a, b = [d.results[0] for d in docs]
+    assert list(a.get_diffs()) == list(b.get_diffs())
+    assert _occupancies(a.output) == _occupancies(b.output)
+
+def test_paired_realizations_share_microstructures(batio3_lib):
+    recipes = [_recipe(1000, name="low"), _recipe(1200, name="high")]
+    docs = run_paired_sims(recipes, reaction_lib=batio3_lib, seed=0, parallel=False)
+
+    assert [len(d.results) for d in docs] == [3, 3]
+    for low, high in zip(docs[0].results, docs[1].results):
+        assert low.metadata["pairing"] == high.metadata["pairing"]
+        assert _occupancies(low.first_step) == _occupancies(high.first_step)
+
+    starts = [_occupancies(r.first_step) for r in docs[0].results]
+    assert starts[0] != starts[1]
+
+    assert docs[0].metadata["paired"]["group"] == ["low", "high"]
+
+def test_paired_runs_of_one_recipe_match(batio3_lib):
+    docs = run_paired_sims([_recipe(1000), _recipe(1000)], reaction_lib=batio3_lib, num_realizations=2, seed=0, parallel=False)
+
+    for a, b in zip(docs[0].results, docs[1].results):
+        assert list(a.get_diffs()) == list(b.get_diffs())
+
+    diff = get_paired_differences(docs[0], docs[1], "BaTiO3")
+    assert diff["num_pairs"] == 2
+    assert diff["mean_difference"] == 0
+    assert diff["paired_half_width"] == 0
+
+def test_paired_recipes_must_share_setup(batio3_lib):
+    with pytest.raises(ValueError):
+        run_paired_sims([_recipe(1000), _recipe(1000, packing_fraction=0.8)], reaction_lib=batio3_lib)
@@ -0,0 +1,112 @@
+import pytest
+
+from rxn_ca.core.heating import HeatingSchedule, HeatingStep, RegrindStep
+from rxn_ca.core.recipe import ReactionRecipe
+from rxn_ca.utilities.prefix_sim import build_schedule_tree, get_prefix_groups, run_shared_prefix_sims
+
+def _ramp_and_hold(hold_temp, hold_duration=2):
+    return HeatingSchedule.build(HeatingStep.hold(1000, 2), HeatingStep.hold(hold_temp, hold_duration))
+
+def _recipe(schedule, name=None, **kwargs):
+    return ReactionRecipe(
+        heating_schedule=schedule,
+        reactant_amounts={ "BaO": 1, "TiO2": 1 },
+        simulation_size=4,
+        name=name,
+        **{ "num_realizations": 2, **kwargs }
+    )
+
+def test_tree_shares_common_prefix():
+    tree = build_schedule_tree([_ramp_and_hold(1000), _ramp_and_hold(1200), _ramp_and_hold(1200, 3)])
+
+    assert tree.start_idx == 0
+    assert tree.end_idx == 2
+    assert tree.duration == 2
+    assert tree.recipe_idxs == []
+    assert len(tree.children) == 2
+
+    same_temp, hotter = tree.children
+    assert same_temp.recipe_idxs == [0]
+    assert (same_temp.start_idx, same_temp.end_idx) == (2, 4)
+
+    # The 1200 K holds share their first two steps
+    assert (hotter.start_idx, hotter.end_idx) == (2, 4)
+    assert hotter.recipe_idxs == [1]
+    assert len(hotter.children) == 1
+    assert hotter.children[0].recipe_idxs == [2]
+    assert (hotter.children[0].start_idx, hotter.children[0].end_idx) == (4, 5)
+
+    assert tree.all_recipe_idxs() == [0, 1, 2]
+    assert sum([n.duration for n in tree.iter_nodes()]) == 7
+
+def test_tree_keeps_regrind_with_next_step():
+    with_regrind = HeatingSchedule.build(HeatingStep.hold(1000, 2), RegrindStep(), HeatingStep.hold(1200, 1))
+    without = HeatingSchedule.build(HeatingStep.hold(1000, 2), HeatingStep.hold(1200, 1))
+    tree = build_schedule_tree([with_regrind, without])
+
+    assert tree.end_idx == 2
+    regrind_branch = tree.children[0]
+    assert isinstance(regrind_branch.steps[0], RegrindStep)
+    assert regrind_branch.duration == 1
+
+def test_tree_without_shared_prefix_has_empty_root():
+    tree = build_schedule_tree([
+        HeatingSchedule.build(HeatingStep.hold(1000, 1)),
+        HeatingSchedule.build(HeatingStep.hold(1200, 1)),
+    ])
+    assert tree.steps == []
+    assert tree.duration == 0
+    assert len(tree.children) == 2
+
+def test_prefix_groups():
+    recipes = [
+        _recipe(_ramp_and_hold(1000)),
+        _recipe(_ramp_and_hold(1200), num_realizations=5),
+        _recipe(_ramp_and_hold(1200), packing_fraction=0.8),
+    ]
+    assert get_prefix_groups(recipes) == [[0, 1], [2]]
+
+def test_incompatible_recipes_are_rejected(batio3_lib):
+    recipes = [_recipe(_ramp_and_hold(1000)), _recipe(_ramp_and_hold(1200), packing_fraction=0.8)]
+    with pytest.raises(ValueError):
+        run_shared_prefix_sims(recipes, reaction_lib=batio3_lib)
+
+def test_shared_prefix_results(batio3_lib):
+    recipes = [_recipe(_ramp_and_hold(1000), name="low"), _recipe(_ramp_and_hold(1200), name="high")]
+    docs = run_shared_prefix_sims(recipes, reaction_lib=batio3_lib, seed=0, parallel=False)
+
+    assert len(docs) == 2
+    sites = 4 ** 3
+    for doc, recipe in zip(docs, recipes):
+        assert doc.recipe is recipe
+        assert len(doc.results) == 2
+        assert doc.metadata["prefix_sharing"]["simulated_steps"] == 6
+        assert doc.metadata["prefix_sharing"]["unshared_steps"] == 8
+
+        for result in doc.results:
+            assert len(result) == 4 * sites + 2
+
+            lineage = result.metadata["lineage"]
+            assert [l["schedule_steps"] for l in lineage] == [[0, 2], [2, 4]]
+            assert lineage[0]["shared_by"] == ["low", "high"]
+            assert lineage[1]["shared_by"] == [recipe.name]
+
+            segments = result.metadata["segments"]
+            assert [s["schedule_steps"] for s in segments][-1] == [2, 3]
+
+    # Both recipes continue from the same simulated prefix
+    for low, high in zip(docs[0].results, docs[1].results):
+        assert low.stages[0] is high.stages[0]
+        assert low.metadata["lineage"][0]["node_id"] == high.metadata["lineage"][0]["node_id"]
+
+def test_branch_starting_with_regrind(batio3_lib):
+    recipes = [
+        _recipe(HeatingSchedule.build(HeatingStep.hold(1000, 1), RegrindStep(), HeatingStep.hold(1200, 1))),
+        _recipe(HeatingSchedule.build(HeatingStep.hold(1000, 1), HeatingStep.hold(1200, 1))),
+    ]
+    docs = run_shared_prefix_sims(recipes, reaction_lib=batio3_lib, seed=0, parallel=False)
+
+    for doc in docs:
+        for result in doc.results:
+            assert len(result.stages) == 2
+            assert [l["schedule_steps"][0] for l in result.metadata["lineage"]] == [0, 1]
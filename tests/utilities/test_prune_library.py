@@ -0,0 +1,16 @@
+from rxn_ca.core.heating import HeatingSchedule, HeatingStep
+from rxn_ca.core.recipe import ReactionRecipe
+from rxn_ca.utilities.single_sim import run_single_sim
+
+def _recipe():
+    sched = HeatingSchedule.build(HeatingStep.hold(1000, 1))
+    return ReactionRecipe(heating_schedule=sched, reactant_amounts={ "BaO": 1 }, simulation_size=4)
+
+def test_given_library_is_kept_by_default(batio3_lib):
+    doc = run_single_sim(_recipe(), reaction_lib=batio3_lib, seed=0)
+    assert doc.reaction_library is batio3_lib
+
+def test_prunes_on_request(batio3_lib):
+    # BaO + TiO2 cannot happen without TiO2
+    doc = run_single_sim(_recipe(), reaction_lib=batio3_lib, seed=0, prune_library=True)
+    assert len(doc.reaction_library.get_rxns_at_temp(1000)) == 0
@@ -0,0 +1,66 @@
+import os
+
+import pytest
+
+from rxn_ca.core.heating import HeatingSchedule, HeatingStep
+from rxn_ca.core.recipe import ReactionRecipe
+from rxn_ca.utilities.run_cache import RunCache
+from rxn_ca.utilities.single_sim import run_single_sim
+
+def _recipe(size=4):
+    sched = HeatingSchedule.build(HeatingStep.hold(1000, 2))
+    return ReactionRecipe(heating_schedule=sched, reactant_amounts={ "BaO": 1, "TiO2": 1 }, simulation_size=size)
+
+def test_key_is_stable(batio3_lib):
+    assert RunCache.get_key(_recipe(), batio3_lib, seed=0) == RunCache.get_key(_recipe(), batio3_lib, seed=0)
+
+def test_key_changes_with_inputs(batio3_lib):
+    key = RunCache.get_key(_recipe(), batio3_lib, seed=0)
+
+    assert key != RunCache.get_key(_recipe(size=5), batio3_lib, seed=0)
+    assert key != RunCache.get_key(_recipe(), batio3_lib, seed=1)
+    assert key != RunCache.get_key(_recipe(), batio3_lib, seed=0, options={ "single": True })
+
+def test_unseeded_runs_are_not_cached(batio3_lib):
+    with pytest.raises(ValueError):
+        RunCache.get_key(_recipe(), batio3_lib)
+
+def test_key_ignores_library_provenance(batio3_lib):
+    key = RunCache.get_key(_recipe(), batio3_lib, seed=0)
+    batio3_lib.set_provenance(1000, built="yesterday")
+    assert key == RunCache.get_key(_recipe(), batio3_lib, seed=0)
+
+def test_put_and_get(batio3_lib, tmp_path):
+    cache = RunCache(str(tmp_path))
+    recipe = _recipe()
+    key = RunCache.get_key(recipe, batio3_lib, seed=0)
+
+    assert not cache.has(key)
+    assert cache.get(key) is None
+
+    doc = run_single_sim(recipe, reaction_lib=batio3_lib, phase_set=batio3_lib.phases, seed=0)
+    cache.put(key, doc)
+
+    assert cache.has(key)
+    cached = cache.get(key)
+    assert len(cached.results) == 1
+    assert len(cached.results[0]) == len(doc.results[0])
+    assert cached.results[0].output.as_dict() == doc.results[0].output.as_dict()
+
+def test_evicts_least_recently_used(batio3_lib, tmp_path):
+    recipe = _recipe()
+    doc = run_single_sim(recipe, reaction_lib=batio3_lib, phase_set=batio3_lib.phases, seed=0)
+
+    cache = RunCache(str(tmp_path))
+    cache.put("a", doc)
+    entry_size = os.path.getsize(os.path.join(str(tmp_path), "a.json.gz"))
+
+    cache.max_size = int(entry_size * 2.5)
+    cache.put("b", doc)
+    os.utime(os.path.join(str(tmp_path), "a.json.gz"), (0, 0))
+    os.utime(os.path.join(str(tmp_path), "b.json.gz"), (1, 1))
+    cache.put("c", doc)
+
+    assert not cache.has("a")
+    assert cache.has("b")
+    assert cache.has("c")
@@ -0,0 +1,75 @@
+import pytest
+
+from rxn_ca.analysis.reaction_step_analyzer import AnalysisQuantity
+from rxn_ca.core.heating import HeatingSchedule, HeatingStep, RegrindStep
+from rxn_ca.core.recipe import ReactionRecipe
+from rxn_ca.utilities.screening import PhaseAmountMetric, get_round_budgets, scale_schedule, screen_recipes
+
+def _recipe(name, amounts, duration=2):
+    sched = HeatingSchedule.build(HeatingStep.hold(1000, duration))
+    return ReactionRecipe(heating_schedule=sched, reactant_amounts=amounts, simulation_size=4, num_realizations=2, name=name)
+
+def test_scale_schedule():
+    sched = HeatingSchedule.build(HeatingStep.hold(1000, 2), RegrindStep(), HeatingStep.hold(1200, 1, stage_length=4))
+    scaled = scale_schedule(sched, 0.5)
+
+    assert [s.duration for s in scaled.temperature_steps] == [0.5, 0.5, 2]
+    assert [s.temperature for s in scaled.temperature_steps] == [1000, 1000, 1200]
+    assert isinstance(scaled.steps[2], RegrindStep)
+    # The original is untouched
+    assert [s.duration for s in sched.temperature_steps] == [1, 1, 4]
+
+def test_round_budgets_grow_to_full_run():
+    budgets = get_round_budgets(3, 0.25, 1, 4)
+
+    assert budgets[0] == { "schedule_fraction": 0.25, "num_realizations": 1 }
+    assert budgets[1] == { "schedule_fraction": 0.5, "num_realizations": 2 }
+    assert budgets[2] == { "schedule_fraction": 1.0, "num_realizations": 4 }
+
+def test_phase_amount_metric(batio3_lib):
+    from rxn_ca.utilities.single_sim import run_single_sim
+
+    doc = run_single_sim(_recipe("a", { "BaO": 1, "TiO2": 1 }), reaction_lib=batio3_lib, phase_set=batio3_lib.phases, seed=0)
+    metric = PhaseAmountMetric("BaTiO3", quantity=AnalysisQuantity.MOLES)
+
+    score = metric(doc)
+    assert 0 < score <= 1
+    assert PhaseAmountMetric("BaO")(doc) < 1
+
+def test_screening_promotes_best_candidates(batio3_lib):
+    recipes = [
+        _recipe("excess_bao", { "BaO": 3, "TiO2": 1 }),
+        _recipe("balanced", { "BaO": 1, "TiO2": 1 }),
+        _recipe("excess_tio2", { "BaO": 1, "TiO2": 3 }),
+        _recipe("mostly_bao", { "BaO": 8, "TiO2": 1 }),
+    ]
+    result = screen_recipes(
+        recipes,
+        PhaseAmountMetric("BaO", quantity=AnalysisQuantity.MOLES),
+        reaction_lib=batio3_lib,
+        phase_set=batio3_lib.phases,
+        seed=0,
+        parallel=False
+    )
+
+    # 4 -> 2 -> 1 candidates
+    assert [len(r) for r in result.rounds] == [4, 2, 1]
+    assert result.rounds[0][0]["schedule_fraction"] == 0.25
+    assert result.rounds[-1][0]["schedule_fraction"] == 1.0
+    assert result.rounds[-1][0]["num_realizations"] == 2
+
+    assert result.finalists == [3]
+    assert result.finalist_docs[3].recipe is recipes[3]
+    assert len(result.finalist_docs[3].results) == 2
+
+    ranking = result.ranking()
+    assert [e["recipe_idx"] for e in ranking][:2] == [3, 0]
+    assert [e["rank"] for e in ranking] == [1, 2, 3, 4]
+
+    table = result.to_dataframe()
+    assert list(table["recipe"])[:2] == ["mostly_bao", "excess_bao"]
+    assert list(table["rounds_reached"]) == [3, 2, 1, 1]
+
+def test_invalid_keep_fraction(batio3_lib):
+    with pytest.raises(ValueError):
+        screen_recipes([_recipe("a", { "BaO": 1, "TiO2": 1 })], PhaseAmountMetric("BaO"), reaction_lib=batio3_lib, keep_fraction=1.0)